@@ -0,0 +1,113 @@
+import os
+import json
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Literal
+
+from pydantic import BaseModel, Field, ValidationError
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from catalog import load_catalog
+from streaming import strip_json_blocks
+import telemetry
+from buddy_core import (
+    CONCURRENT_PIPELINES, VOICE_OPTIONS, BRAND_OPTIONS, INSTALLMENT_OPTIONS, UserPrefs, get_candidate_backend, recommend,
+)
+
+# -------------------------
+# API: 제휴 채널용 JSON HTTP 엔드포인트 (streamlit 없이 buddy_core 사용)
+# 실행: python api.py  (API_WORKERS 개수만큼 uvicorn 워커 프로세스 실행)
+# -------------------------
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+
+
+class RecommendRequest(BaseModel):
+    """
+    추천 요청 본문. 범위/선택지는 streamlit 사이드바 입력과 동일 (UI에서 보낼 수 없는 값은 캐시 키만 늘리므로 거절)
+    """
+    data_unlimited: bool = False
+    data_gb: int | None = Field(50, ge=1, le=150)
+    voice: Literal[VOICE_OPTIONS] = "무제한"
+    budget: int = Field(90000, ge=10000, le=200000)
+    brand_pref: List[Literal[BRAND_OPTIONS]] = ["Samsung"]
+    device_budget: int = Field(1500000, ge=100000, le=3500000)
+    installment_months: Literal[INSTALLMENT_OPTIONS] = 12
+    notes: str = Field("", max_length=500)
+
+
+def section(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    파이프라인 결과를 응답 형식으로 변환 (내부 점수 필드 제외)
+    """
+    parsed = result["parsed"] or {}
+    return {
+        "candidates": [{k: v for k, v in d.items() if not k.startswith("__")} for d in result["candidates"]],
+        "recommendations": parsed.get("recommendations", []),
+        "alternatives": parsed.get("alternatives", []),
+        "explanation": strip_json_blocks(result["reply"]),
+        "errors": result["errors"],
+    }
+
+
+async def healthz(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", "catalog_version": load_catalog().version})
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    # 워커 프로세스별 누적 지표 (여러 워커 실행 시 스크레이프마다 응답한 워커의 값)
+    return PlainTextResponse(telemetry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def traced_recommend(prefs: UserPrefs) -> tuple[Dict[str, Any], str]:
+    with telemetry.trace("api") as t:
+        return recommend(prefs, None, CONCURRENT_PIPELINES), t.id
+
+
+async def recommend_endpoint(request: Request) -> JSONResponse:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return JSONResponse({"error": "요청 본문이 올바른 JSON이 아니에요."}, status_code=400)
+    try:
+        req = RecommendRequest.model_validate(body)
+    except ValidationError as e:
+        return JSONResponse({"error": "요청 값 검증 오류", "detail": e.errors(include_url=False, include_input=False)}, status_code=422)
+
+    prefs = UserPrefs(**req.model_dump())
+    # 검색/LLM 호출은 블로킹이므로 스레드풀에서 실행
+    result, trace_id = await run_in_threadpool(traced_recommend, prefs)
+    return JSONResponse({
+        "catalog_version": load_catalog().version,
+        "prefs": result["prefs"],
+        "plan": section(result["plan"]),
+        "device": section(result["device"]),
+        "combinations": result["combinations"],
+    }, headers={"X-Trace-Id": trace_id})
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # 워커 시작 시 카탈로그/백엔드를 미리 로드하여 첫 요청 지연 방지
+    get_candidate_backend()
+    load_catalog().devices.dedupe_indices
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/v1/recommend", recommend_endpoint, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
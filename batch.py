@@ -0,0 +1,271 @@
+import os
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Dict, Any, List, Iterator, Iterable, Set, Tuple
+
+from catalog import load_catalog
+from buddy_core import (
+    UserPrefs, search_plan_candidates, search_device_candidates,
+    recommend_joint, combinations_for,
+)
+
+# -------------------------
+# Batch: 고객 프로필(CSV/JSONL) 일괄 추천
+# 후보 조회/점수/조합은 프로세스 풀, LLM 단계(--llm)는 동시 호출 수를 제한한 스레드 풀에서 실행하고
+# 결과는 JSONL로 한 줄씩 바로 기록 (출력 파일이 체크포인트: 재실행 시 이미 기록된 id는 건너뜀)
+# 실행: python batch.py profiles.csv -o results.jsonl --workers 8 [--llm --llm-concurrency 4]
+# -------------------------
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "200"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+TRUE_TEXTS = {"1", "true", "y", "yes", "o", "무제한"}
+# 읽을 수 없는 입력 줄 표시 (값은 오류 메세지)
+INVALID_ROW = "__invalid__"
+
+
+# -------------------------
+# 입력: 프로필 읽기/변환
+# -------------------------
+def iter_profiles(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    CSV 또는 JSONL 파일을 한 줄씩 읽어 (행 번호, 원본 딕셔너리) 반환. 파일 전체를 메모리에 올리지 않음
+    JSON으로 읽을 수 없는 줄은 작업을 중단하지 않고 {INVALID_ROW: 오류 메세지}로 반환 (score_chunk에서 invalid로 기록)
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith((".jsonl", ".json")):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, {INVALID_ROW: f"{line_no}행 JSON 오류: {e}"}
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, {INVALID_ROW: f"{line_no}행 JSON 오류: 객체가 아니에요 ({type(row).__name__})"}
+                    continue
+                yield line_no, row
+        else:
+            for line_no, row in enumerate(csv.DictReader(f), 1):
+                yield line_no, row
+
+
+def _int(x: Any) -> int | None:
+    if x is None or str(x).strip() == "":
+        return None
+    return int(float(str(x).replace(",", "")))
+
+
+def profile_id(line_no: int, row: Dict[str, Any]) -> str:
+    return str(row.get("id") or row.get("profile_id") or line_no)
+
+
+def to_prefs(row: Dict[str, Any]) -> UserPrefs:
+    """
+    프로필 행을 UserPrefs로 변환. 없는 값은 UserPrefs 기본값(사이드바 기본값) 사용
+    brand_pref는 리스트 또는 ,|/ 로 구분된 문자열
+    """
+    kwargs: Dict[str, Any] = {}
+    if row.get("data_unlimited") not in (None, ""):
+        v = row["data_unlimited"]
+        kwargs["data_unlimited"] = v if isinstance(v, bool) else str(v).strip().lower() in TRUE_TEXTS
+    for key in ("data_gb", "budget", "device_budget", "installment_months"):
+        v = _int(row.get(key))
+        if v is not None:
+            kwargs[key] = v
+    if row.get("voice"):
+        kwargs["voice"] = str(row["voice"])
+    brands = row.get("brand_pref")
+    if brands is not None:
+        if isinstance(brands, str):
+            brands = [b.strip() for b in brands.replace("|", ",").replace("/", ",").split(",")]
+        kwargs["brand_pref"] = [b for b in brands if b]
+    if row.get("notes"):
+        kwargs["notes"] = str(row["notes"])
+    return UserPrefs(**kwargs)
+
+
+# -------------------------
+# 체크포인트: 출력 JSONL
+# -------------------------
+def load_done_ids(path: str) -> Set[str]:
+    """
+    기존 출력 파일에서 완료된 id 조회. 중단으로 마지막 줄이 잘린 경우 해당 줄은 파일에서 잘라냄
+    줄바꿈까지 기록된 줄만 완료로 봄 (JSON은 완전하지만 줄바꿈 전에 중단된 줄 뒤에 이어 쓰면 두 줄이 합쳐지므로)
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    good_end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                break
+            good_end += len(line)
+    if good_end != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_end)
+    return done
+
+
+# -------------------------
+# 프로세스 풀 단계: 후보 조회 + 점수 + (LLM 없는) Top3 + 조합
+# -------------------------
+def _init_worker() -> None:
+    # 워커마다 카탈로그/중복제거 인덱스를 1회만 준비
+    load_catalog().devices.dedupe_indices
+
+
+def _needs_llm(prefs: UserPrefs, use_llm: bool) -> bool:
+    return use_llm and bool(prefs.notes.strip())
+
+
+def score_chunk(items: List[Tuple[str, Dict[str, Any]]], use_llm: bool) -> List[Dict[str, Any]]:
+    """
+    프로필 묶음 처리. LLM이 필요한 프로필은 후보만 조회하여 반환 (LLM 단계는 메인 프로세스에서 실행)
+    """
+    out = []
+    for pid, row in items:
+        if INVALID_ROW in row:
+            out.append({"id": pid, "status": "invalid", "errors": [row[INVALID_ROW]]})
+            continue
+        try:
+            prefs = to_prefs(row)
+        except (TypeError, ValueError) as e:
+            out.append({"id": pid, "status": "invalid", "errors": [f"프로필 값 오류: {e}"]})
+            continue
+        plan_candidates, plan_errors = search_plan_candidates(prefs)
+        device_candidates, device_errors = search_device_candidates(prefs)
+        rec = {
+            "id": pid,
+            "prefs": prefs,
+            "plan_candidates": plan_candidates,
+            "device_candidates": device_candidates,
+            "errors": plan_errors + device_errors,
+        }
+        if not _needs_llm(prefs, use_llm):
+            rec = finish(rec, use_llm=False)
+        out.append(rec)
+    return out
+
+
+def finish(rec: Dict[str, Any], use_llm: bool) -> Dict[str, Any]:
+    """
+    Top3 추천과 조합을 계산하여 출력 레코드 생성 (후보 원본은 출력에서 제외)
+    """
+    prefs: UserPrefs = rec["prefs"]
+    recs = recommend_joint(prefs, rec["plan_candidates"], rec["device_candidates"], use_llm=use_llm)
+    plan, device = recs["plan"], recs["device"]
+    combos = combinations_for(prefs, plan["parsed"], device["parsed"]) if rec["device_candidates"] else []
+    errors = rec["errors"] + plan["errors"] + device["errors"]
+    return {
+        "id": rec["id"],
+        "status": "error" if errors else "ok",
+        "mode": "llm" if use_llm else "rank",
+        "prefs": prefs.to_dict(),
+        "plan": plan["parsed"],
+        "device": device["parsed"],
+        "combinations": combos,
+        "errors": errors,
+    }
+
+
+# -------------------------
+# 실행
+# -------------------------
+def chunked(items: Iterable[Tuple[str, Dict[str, Any]]], size: int) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def run_batch(input_path: str, output_path: str, workers: int = BATCH_WORKERS, chunk_size: int = BATCH_CHUNK_SIZE,
+              use_llm: bool = False, llm_concurrency: int = BATCH_LLM_CONCURRENCY, resume: bool = True) -> Dict[str, int]:
+    """
+    프로필 파일 전체를 처리하여 결과를 output_path에 JSONL로 추가 기록. 처리 건수 요약 반환
+    프로세스 풀과 LLM 단계 모두 제출 개수를 제한하여 입력 크기와 무관하게 메모리 사용량 유지
+    """
+    done = load_done_ids(output_path) if resume else set()
+    todo = ((pid, row) for pid, row in (
+        (profile_id(line_no, row), row) for line_no, row in iter_profiles(input_path)
+    ) if pid not in done)
+    stats = {"skipped": len(done), "written": 0, "llm": 0, "errors": 0}
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as procs, \
+            ThreadPoolExecutor(max_workers=llm_concurrency) as llm:
+
+        def write(rec: Dict[str, Any]) -> None:
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            stats["written"] += 1
+            stats["errors"] += rec["status"] != "ok"
+
+        def drain(futs: Set[Future], block: bool) -> Set[Future]:
+            # 완료된 작업 결과 기록 후 남은 작업 반환
+            if not futs:
+                return futs
+            done_f, rest = wait(futs, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for f in done_f:
+                result = f.result()
+                for rec in (result if isinstance(result, list) else [result]):
+                    if "plan_candidates" in rec:
+                        # LLM 단계 대기열이 가득 차면 빈 자리가 생길 때까지 대기
+                        while len(llm_futs) >= llm_concurrency * 2:
+                            drain_llm(block=True)
+                        llm_futs.add(llm.submit(finish, rec, True))
+                        stats["llm"] += 1
+                    else:
+                        write(rec)
+            out.flush()
+            return rest
+
+        llm_futs: Set[Future] = set()
+
+        def drain_llm(block: bool) -> None:
+            nonlocal llm_futs
+            llm_futs = drain(llm_futs, block)
+
+        proc_futs: Set[Future] = set()
+        for chunk in chunked(todo, chunk_size):
+            while len(proc_futs) >= workers * 2:
+                proc_futs = drain(proc_futs, block=True)
+            proc_futs.add(procs.submit(score_chunk, chunk, use_llm))
+            drain_llm(block=False)
+        while proc_futs:
+            proc_futs = drain(proc_futs, block=True)
+        while llm_futs:
+            drain_llm(block=True)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KTShop Buddy 고객 프로필 일괄 추천")
+    parser.add_argument("input", help="프로필 파일 (.csv 또는 .jsonl)")
+    parser.add_argument("-o", "--output", required=True, help="결과 JSONL 파일 (체크포인트로도 사용)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="후보 조회/점수 계산 프로세스 수")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE, help="프로세스에 한번에 전달할 프로필 수")
+    parser.add_argument("--llm", action="store_true", help="기타 요구사항(notes)이 있는 프로필은 LLM으로 Top3 추천")
+    parser.add_argument("--llm-concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="LLM 동시 호출 수")
+    parser.add_argument("--no-resume", action="store_true", help="기존 출력 파일을 덮어쓰고 처음부터 실행")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    stats = run_batch(
+        args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+        use_llm=args.llm, llm_concurrency=args.llm_concurrency, resume=not args.no_resume,
+    )
+    print(f"완료: 기록 {stats['written']}건 (LLM {stats['llm']}건, 오류 {stats['errors']}건), "
+          f"건너뜀 {stats['skipped']}건, {time.monotonic() - started:.1f}초")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from typing import Dict, Any, List, Callable
+
+# 벤치마크는 응답 캐시 없이 매번 호출 비용을 측정
+os.environ.setdefault("COMPLETION_CACHE_PATH", "")
+
+import numpy as np
+
+import buddy_core
+from catalog import SEARCH_MODE, AzureSearchBackend, load_catalog
+from combos import build_combinations, catalog_combinations
+from fakes import Latency, FakeOpenAI, FakeServiceError, fake_search_clients
+
+# -------------------------
+# Bench: 로컬 대체 Search/OpenAI로 단계별 지연(p50/p95/p99)과 메모리 할당 측정, 기준선과 비교
+# 실행: python bench.py [--save-baseline] [--fail-on-regression]
+# -------------------------
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+REGRESSION_THRESHOLD = 0.2
+# 기준선에 기록하지 않는 실행 옵션 (측정 대상/조건과 무관)
+NON_WORKLOAD_ARGS = ("stage", "baseline", "save_baseline", "threshold", "fail_on_regression")
+
+Stage = Callable[[random.Random], Any]
+
+
+def random_prefs(rng: random.Random, notes: str = "") -> buddy_core.UserPrefs:
+    return buddy_core.UserPrefs(
+        data_unlimited=rng.random() < 0.2,
+        data_gb=rng.randint(1, 150),
+        budget=rng.randint(2, 20) * 5000,
+        brand_pref=rng.choice([["Samsung"], ["Apple"], ["Samsung", "Apple"], []]),
+        device_budget=rng.randint(2, 30) * 50000,
+        installment_months=rng.choice([0, 12, 24]),
+        notes=notes,
+    )
+
+
+def install_fakes(search_latency: Latency, llm_latency: Latency, chunk_ms: float, search_mode: str = SEARCH_MODE,
+                  llm_tpm: int = 0) -> FakeOpenAI:
+    """
+    buddy_core가 Azure 대신 로컬 대체 클라이언트를 사용하도록 교체 (검색 결과 캐시는 사용하지 않음)
+    """
+    plan_client, device_client = fake_search_clients(search_latency)
+    backend = AzureSearchBackend(lambda: plan_client, lambda: device_client,
+                                 mode=search_mode, min_results=buddy_core.CANDIDATE_TOPN)
+    llm = FakeOpenAI(llm_latency, chunk_ms=chunk_ms, tpm=llm_tpm)
+    buddy_core.get_candidate_backend = lambda: backend
+    buddy_core.get_openai = lambda: llm
+    return llm
+
+
+def build_stages(iterations_e2e: int) -> Dict[str, tuple[Stage, int | None]]:
+    """
+    측정 단계 이름 -> (1회 실행 함수, 반복 횟수 재정의)
+    """
+    cat = load_catalog()
+    plan_docs, device_docs = cat.plans.docs, cat.devices.docs
+    plan_cands = buddy_core.fetch_plan_candidates(50, 90000, False, topn=10)
+    text_reply = (
+        "설명입니다.\n```json\n"
+        + json.dumps({"recommendations": [{"rank": i, "plan": d} for i, d in enumerate(plan_cands[:3], 1)], "alternatives": []}, ensure_ascii=False)
+        + "\n```"
+    )
+    top_plans = [{"planId": str(i), "name": f"p{i}", "monthly_fee": float(30000 + i * 7000)} for i in range(3)]
+    top_devices = [{"prodNo": str(i), "sntyNo": str(i), "price": float(500000 + i * 250000)} for i in range(3)]
+
+    def fetch_plans(rng: random.Random) -> Any:
+        p = random_prefs(rng)
+        return buddy_core.fetch_plan_candidates(p.data_gb, p.budget, p.data_unlimited, topn=10)
+
+    def fetch_devices(rng: random.Random) -> Any:
+        p = random_prefs(rng)
+        return buddy_core.fetch_device_candidates(p.device_budget, list(p.brand_pref), topn=10)
+
+    def score_plan_loop(rng: random.Random) -> Any:
+        p = random_prefs(rng)
+        return [buddy_core.score_plan(d, p.data_gb, p.budget, p.data_unlimited) for d in plan_docs]
+
+    def dedupe(rng: random.Random) -> Any:
+        return buddy_core.dedupe_devices_by_model_storage(device_docs)
+
+    def parse(rng: random.Random) -> Any:
+        return buddy_core.safe_parse_json(text_reply)
+
+    def combos(rng: random.Random) -> Any:
+        return build_combinations(top_plans, top_devices, rng.choice([0, 12, 24]))
+
+    def catalog_combos(rng: random.Random) -> Any:
+        p = random_prefs(rng)
+        return catalog_combinations(cat.plans, cat.devices, p.installment_months, max_plan_fee=p.budget,
+                                    max_device_price=p.device_budget, brand_pref=list(p.brand_pref))
+
+    def e2e_rank(rng: random.Random) -> Any:
+        return buddy_core.recommend(random_prefs(rng))
+
+    def e2e_llm(rng: random.Random) -> Any:
+        return buddy_core.recommend(random_prefs(rng, notes="가벼운 휴대폰"))
+
+    return {
+        "fetch_plan_candidates": (fetch_plans, None),
+        "fetch_device_candidates": (fetch_devices, None),
+        "score_plan (per-doc)": (score_plan_loop, None),
+        "dedupe_devices_by_model_storage": (dedupe, None),
+        "safe_parse_json": (parse, None),
+        "build_combinations": (combos, None),
+        "catalog_combinations": (catalog_combos, None),
+        "e2e recommend (rank)": (e2e_rank, iterations_e2e),
+        "e2e recommend (llm)": (e2e_llm, iterations_e2e),
+    }
+
+
+def has_errors(result: Any) -> bool:
+    return isinstance(result, dict) and bool(result.get("plan", {}).get("errors") or result.get("device", {}).get("errors"))
+
+
+def measure(fn: Stage, iterations: int, alloc_iterations: int, seed: int) -> Dict[str, float]:
+    """
+    iterations회 실행 시간(ms) 백분위와, 별도 alloc_iterations회 tracemalloc으로 측정한 호출당 최대 할당량(KB)
+    """
+    def call(rng: random.Random) -> bool:
+        # 주입된 오류로 단계가 실패해도 측정은 계속 진행. 실패 여부 반환
+        try:
+            return has_errors(fn(rng))
+        except FakeServiceError:
+            return True
+
+    rng = random.Random(seed)
+    call(rng)  # warm-up
+    times, errors = [], 0
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        failed = call(rng)
+        times.append((time.perf_counter() - t0) * 1000)
+        errors += failed
+
+    # 반복 횟수와 무관하게 같은 입력으로 할당량을 비교하도록 별도 시드 사용
+    rng = random.Random(seed + 1)
+    peaks = []
+    tracemalloc.start()
+    for _ in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        call(rng)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak - base) / 1024)
+    tracemalloc.stop()
+
+    arr = np.array(times)
+    return {
+        "n": iterations,
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+        "peak_alloc_kb": float(np.median(peaks)) if peaks else 0.0,
+        "errors": errors,
+    }
+
+
+def bench_conditions(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    측정 결과에 영향을 주는 조건: 실행 옵션 + 카탈로그 버전 + 파이프라인 설정
+    """
+    return {
+        "args": {k: v for k, v in vars(args).items() if k not in NON_WORKLOAD_ARGS},
+        "config": {
+            "catalog_version": load_catalog().version,
+            "stream": buddy_core.STREAM_COMPLETIONS,
+            "structured": buddy_core.STRUCTURED_OUTPUT,
+            "joint": buddy_core.JOINT_RECOMMENDATION,
+            "hybrid": buddy_core.HYBRID_RETRIEVAL,
+            "fast_path": buddy_core.FAST_PATH,
+            "single_flight": buddy_core.SINGLE_FLIGHT,
+        },
+    }
+
+
+def condition_mismatches(current: Dict[str, Any], saved: Dict[str, Any]) -> List[str]:
+    """
+    기준선과 조건이 다른 항목 목록 (기록되지 않은 항목도 다른 것으로 봄)
+    """
+    out = []
+    for section in ("args", "config"):
+        now = current[section]
+        base = {k: v for k, v in (saved.get(section) or {}).items() if k not in NON_WORKLOAD_ARGS}
+        for key in sorted(set(now) | set(base)):
+            if key not in base:
+                out.append(f"{section}.{key}: (기록 없음) -> {now[key]}")
+            elif base[key] != now.get(key):
+                out.append(f"{section}.{key}: {base[key]} -> {now.get(key)}")
+    return out
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """
+    기준선 대비 p50/p95/할당량이 threshold 비율 이상 증가한 항목 목록
+    """
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        for key in ("p50_ms", "p95_ms", "peak_alloc_kb"):
+            if b[key] > 0 and (r[key] - b[key]) / b[key] > threshold:
+                regressions.append(f"{name} {key}: {b[key]:.3f} -> {r[key]:.3f} (+{(r[key] - b[key]) / b[key]:.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'stage':34} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'alloc KB':>9} {'err':>4} {'p50 vs base':>12}")
+    for name, r in results.items():
+        b = baseline.get(name)
+        delta = f"{(r['p50_ms'] - b['p50_ms']) / b['p50_ms']:+.0%}" if b and b["p50_ms"] > 0 else "-"
+        print(f"{name:34} {r['n']:>5} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+              f"{r['peak_alloc_kb']:>9.1f} {r['errors']:>4} {delta:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KTShop Buddy 오프라인 벤치마크")
+    parser.add_argument("--iterations", type=int, default=200, help="단계별 반복 횟수")
+    parser.add_argument("--e2e-iterations", type=int, default=30, help="end-to-end 반복 횟수")
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="할당량 측정 반복 횟수")
+    parser.add_argument("--search-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=150.0, help="LLM 첫 응답까지 지연")
+    parser.add_argument("--llm-chunk-ms", type=float, default=1.0, help="스트리밍 조각 간 지연")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="검색/LLM 호출 오류 주입 비율")
+    parser.add_argument("--llm-tpm", type=int, default=0, help="가짜 LLM 배포의 분당 토큰 한도 (0이면 429 없음)")
+    parser.add_argument("--search-mode", choices=["keyword", "filter"], default=SEARCH_MODE, help="Azure Search 후보 조회 방식")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stage", action="append", help="지정한 단계만 실행 (여러번 지정 가능)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="이번 결과를 기준선으로 저장")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="회귀로 판단할 증가 비율")
+    parser.add_argument("--fail-on-regression", action="store_true", help="회귀가 있으면 종료 코드 1")
+    args = parser.parse_args()
+
+    install_fakes(
+        Latency(args.search_latency_ms, args.jitter_ms, args.error_rate, seed=args.seed),
+        Latency(args.llm_latency_ms, args.jitter_ms, args.error_rate, seed=args.seed + 1),
+        args.llm_chunk_ms,
+        args.search_mode,
+        args.llm_tpm,
+    )
+    stages = build_stages(args.e2e_iterations)
+    results = {}
+    for name, (fn, n) in stages.items():
+        if args.stage and name not in args.stage:
+            continue
+        results[name] = measure(fn, n or args.iterations, args.alloc_iterations, args.seed)
+
+    conditions = bench_conditions(args)
+    baseline: Dict[str, Dict[str, float]] = {}
+    mismatches: List[str] = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            saved = json.load(f)
+        mismatches = condition_mismatches(conditions, saved)
+        if not mismatches:
+            baseline = saved["stages"]
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**conditions, "stages": results}, f, ensure_ascii=False, indent=2)
+        print(f"기준선 저장: {args.baseline}")
+        return
+    if mismatches:
+        # 조건이 다른 기준선과 비교하면 잘못된 회귀가 보고되므로 비교하지 않음
+        print("⚠️ 기준선과 측정 조건이 달라 비교하지 않았어요. 같은 조건으로 실행하거나 --save-baseline으로 다시 저장하세요.")
+        for m in mismatches:
+            print(f"  - {m}")
+        if args.fail_on_regression:
+            raise SystemExit(1)
+        return
+    regressions = compare(results, baseline, args.threshold)
+    for r in regressions:
+        print(f"⚠️ 회귀: {r}")
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1043 @@
+import os
+import json
+import re
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple, Callable
+from azure.search.documents import SearchClient
+from openai import AzureOpenAI
+from clients import get_openai_client, get_search_client
+from catalog import (
+    CATALOG_BACKEND, SEARCH_MODE, CandidateBackend, LocalCatalogBackend, AzureSearchBackend, DeviceTable,
+    load_catalog, device_group_key,
+)
+from scoring import score_plans, score_devices, top_k
+from streaming import RecommendationStreamParser, iter_stream_text
+from completion_cache import make_cache_key, open_completion_cache
+from search_cache import get_search_cache
+from ranker import rank_plans, rank_devices, describe
+from combos import build_combinations
+import telemetry
+import hybrid
+from singleflight import SingleFlight
+from ratelimit import get_llm_limiter
+from history import message_tokens
+from embeddings import CachedEmbedder, HashEmbedder, AzureOpenAIEmbedder, open_embedding_cache
+from structured import (
+    PlanRecommendations, DeviceRecommendations, JointRecommendations, STRUCTURED_HINT,
+    ValidationError, response_format, parse_structured, repair_messages,
+)
+
+# -------------------------
+# Core: 화면(streamlit) 없이 사용하는 추천 엔진 (검색/점수/중복제거/프롬프트/파싱/조합)
+# 사용자 조건은 UserPrefs로 명시적으로 전달하며, streamlit 앱과 HTTP API가 함께 사용
+# -------------------------
+
+# -------------------------
+# Azure Client
+# -------------------------
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+AZURE_AI_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
+AZURE_AI_SEARCH_API_KEY = os.getenv("AZURE_SEARCH_KEY")
+PLANS_INDEX = os.getenv("PLANS_INDEX")
+DEVICES_INDEX = os.getenv("DEVICES_INDEX")
+# 요금제/단말 파이프라인 병렬 실행 여부 (BUDDY_CONCURRENT=0 이면 순차 실행)
+CONCURRENT_PIPELINES = os.getenv("BUDDY_CONCURRENT", "1") != "0"
+# LLM 응답 스트리밍 여부 (BUDDY_STREAM=0 이면 전체 응답 생성 후 한번에 표시)
+STREAM_COMPLETIONS = os.getenv("BUDDY_STREAM", "1") != "0"
+# 기타 요구사항이 비어있으면 LLM 없이 점수 기반으로 Top3 생성 (BUDDY_FAST_PATH=0 이면 항상 LLM 호출)
+FAST_PATH = os.getenv("BUDDY_FAST_PATH", "1") != "0"
+# JSON 스키마 기반 structured output 사용 여부 (BUDDY_STRUCTURED=0 이면 응답 텍스트에서 ```json 블록 추출)
+STRUCTURED_OUTPUT = os.getenv("BUDDY_STRUCTURED", "1") != "0"
+# structured output 검증 실패 시 해당 단계만 재요청하는 최대 횟수
+STRUCTURED_MAX_REPAIRS = int(os.getenv("BUDDY_STRUCTURED_MAX_REPAIRS", "1"))
+# 스트리밍 응답에서 토큰 사용량 수신 여부 (stream_options 미지원 API 버전이면 BUDDY_STREAM_USAGE=0)
+STREAM_USAGE = os.getenv("BUDDY_STREAM_USAGE", "1") != "0"
+# 요금제/단말 후보 개수 (프롬프트/화면에 사용하는 상위 N개)
+CANDIDATE_TOPN = 10
+# 기타 요구사항이 있으면 키워드(점수) + 벡터 하이브리드 검색으로 후보 선택 (BUDDY_HYBRID=0 이면 점수만 사용)
+HYBRID_RETRIEVAL = os.getenv("BUDDY_HYBRID", "1") != "0"
+# 임베딩 배포명. 비어있으면 로컬 해시 임베딩 사용
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+# 동시에 들어온 같은 조건의 후보 검색/LLM 추천을 1회 실행으로 합침 (BUDDY_SINGLE_FLIGHT=0 이면 요청마다 실행)
+SINGLE_FLIGHT = os.getenv("BUDDY_SINGLE_FLIGHT", "1") != "0"
+SEARCH_FLIGHTS = SingleFlight("search")
+# 요금제/단말 Top3를 structured output 한 번의 호출로 받음 (BUDDY_JOINT=0 이면 요금제/단말 각각 호출)
+JOINT_RECOMMENDATION = os.getenv("BUDDY_JOINT", "1") != "0"
+COMPLETION_FLIGHTS = SingleFlight("completion")
+
+# 클라이언트는 프로세스당 1회 생성 후 재사용 (rerun/요청마다 새 연결/TLS 세션을 만들지 않도록)
+def get_openai() -> AzureOpenAI:
+    return get_openai_client(AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_API_VERSION)
+
+# 요금제 검색 
+def get_plan_search_client() -> SearchClient:
+    return get_search_client(AZURE_AI_SEARCH_ENDPOINT, PLANS_INDEX, AZURE_AI_SEARCH_API_KEY)
+
+# 단말 검색
+def get_device_search_client() -> SearchClient:
+    return get_search_client(AZURE_AI_SEARCH_ENDPOINT, DEVICES_INDEX, AZURE_AI_SEARCH_API_KEY)
+
+# 하이브리드 검색용 임베딩 (메모리/디스크 캐시 적용, 프로세스당 1개)
+@lru_cache(maxsize=None)
+def get_embedder() -> CachedEmbedder:
+    if AZURE_OPENAI_EMBEDDING_DEPLOYMENT:
+        base = AzureOpenAIEmbedder(lambda: get_openai(), AZURE_OPENAI_EMBEDDING_DEPLOYMENT)
+    else:
+        base = HashEmbedder()
+    return CachedEmbedder(base, open_embedding_cache())
+
+# 후보 조회 백엔드: 기본은 로컬 카탈로그(CSV), CATALOG_BACKEND=azure 인 경우 Azure AI Search (검색 결과 캐시 적용)
+def get_candidate_backend() -> CandidateBackend:
+    if CATALOG_BACKEND == "azure":
+        return AzureSearchBackend(
+            get_plan_search_client, get_device_search_client,
+            cache=get_search_cache(), catalog_version=load_catalog().version,
+            mode=SEARCH_MODE, min_results=CANDIDATE_TOPN,
+        )
+    return LocalCatalogBackend(load_catalog())
+
+
+# -------------------------
+# 사용자 조건 / 기본 대화
+# -------------------------
+SYSTEM_PROMPT = (
+    "너는 KT의 요금제/단말 추천 어시스턴트다. "
+    "사용자 조건(데이터/통화/예산/브랜드/기타)을 분석하고, "
+    "지나치게 확신하지 말고 근거 중심으로 간결히 설명한다. "
+    "반드시 JSON도 함께 출력한다."
+)
+
+
+def initial_messages() -> List[Dict[str, Any]]:
+    return [{"role": "system", "content": SYSTEM_PROMPT}]
+
+
+# 사이드바 선택지 (API 요청 검증에도 사용)
+VOICE_OPTIONS = ("60분", "120분", "300분", "무제한")
+BRAND_OPTIONS = ("Samsung", "Apple", "Xiaomi")
+INSTALLMENT_OPTIONS = (0, 12, 24)
+
+
+@dataclass(frozen=True)
+class UserPrefs:
+    """
+    사이드바 입력과 동일한 사용자 조건. 데이터 무제한이면 data_gb는 None
+    """
+    data_unlimited: bool = False
+    data_gb: int | None = 50
+    voice: str = "무제한"
+    budget: int = 90000
+    brand_pref: Tuple[str, ...] = ("Samsung",)
+    device_budget: int = 1500000
+    installment_months: int = 12
+    notes: str = ""
+
+    def __post_init__(self):
+        object.__setattr__(self, "brand_pref", tuple(self.brand_pref))
+        if self.data_unlimited:
+            object.__setattr__(self, "data_gb", None)
+
+    def plan_prefs(self) -> Dict[str, Any]:
+        """
+        요금제 프롬프트에 전달할 사용자 조건 (캐시 키에도 사용)
+        """
+        return {
+            "data_gb": self.data_gb,
+            "voice": self.voice,
+            "budget": self.budget,
+            "notes": self.notes,
+        }
+
+    def device_prefs(self) -> Dict[str, Any]:
+        """
+        단말 프롬프트에 전달할 사용자 조건 (캐시 키에도 사용)
+        """
+        return {
+            "device_budget": self.device_budget,
+            "brand_pref": list(self.brand_pref),
+            "notes": self.notes,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "brand_pref": list(self.brand_pref)}
+
+
+# -------------------------
+# Util: 공통
+# -------------------------
+NUM_RE = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+def to_float_safe(x: Any) -> float | None:
+    """
+    문자열에서 숫자 찾아서 실수형으로 변환하는 함수
+    """
+    if x is None:
+        return None
+    if isinstance(x, (int, float)):
+        return float(x)
+    s = str(x).replace(",", "")
+    m = NUM_RE.search(s)
+    if not m:
+        return None
+    try:
+        return float(m.group())
+    except:
+        return None
+
+def format_currency(value: Any, show_unit: bool = True, decimals: int = 0, dash: str = "-") -> str:
+    """
+    금액/숫자 문자열을 안전하게 포맷팅: 1200000 -> '1,200,000원'
+    - 콤마/한글/기호 섞여도 숫자만 추출(to_float_safe 활용 가정)
+    - None이나 파싱 실패 시 dash 반환
+    - decimals로 소수 표시 자리수 제어(기본 0)
+    """
+    num = to_float_safe(value)
+    if num is None:
+        return dash
+    if decimals <= 0:
+        s = f"{int(round(num)):,}"
+    else:
+        s = f"{num:,.{decimals}f}"
+    return f"{s}" if show_unit else s
+
+# -------------------------
+# Util: 요금제 관련 함수
+# -------------------------
+def score_plan(doc: Dict[str, Any], target_gb: float | None, target_price: float | None, want_unlimited: bool) -> float:
+    """
+    사용자 조건과 비교하여 점수 매기는 함수. 요금제별 score가 낮을수록 조건에 적합
+    무제한 요청이면 '무제한' 문자열 매칭을 최우선 가점.
+    아니면 기존 데이터/가격 편차 가중치(0.6/0.4).
+    """
+    # 데이터 중요도는 60%, 가격은 중요도 40%. 요금제 금액 숫자화 적용
+    w_gb, w_price = 0.6, 0.4
+    price = to_float_safe(doc.get("monthly_fee"))
+
+    # 요금제가 무제한인지 판단
+    data_field = (doc.get("data_gb") or "").lower()
+    is_unlimited_doc = any(k in data_field for k in ["무제한", "unlimited", "완전무제한"])
+
+    # 고객은 무제한 요금제를 원하나, 요금제에 무제한 문구가 없으면 추천 대상에서 제외. 그 외의 경우 요금제 금액 차이만 비교하여 계산
+    if want_unlimited:
+        if not is_unlimited_doc:
+            return math.inf
+        price_gap = abs((price or 0) - (target_price or 0)) if (price is not None and target_price is not None) else 10000.0
+        return w_price * (price_gap / 10000.0)
+    else:
+        # 데이터 숫자화 적용
+        gb = to_float_safe(doc.get("data_gb"))
+        # 사용자 조건과 비교하여 차이 계산. 데이터나 가격 정보가 없는 경우 디폴트 패널티(5GB/10000원 차이) 부여
+        gb_gap = abs((gb or 0) - (target_gb or 0)) if (gb is not None and target_gb is not None) else 5.0
+        price_gap = abs((price or 0) - (target_price or 0)) if (price is not None and target_price is not None) else 10000.0
+        # 데이터, 가격 비교 최종 점수 계산
+        return w_gb * gb_gap + w_price * (price_gap / 10000.0)
+
+
+def fetch_plan_candidates(data_gb: int | None, budget: int, data_unlimited: bool, topn, notes: str = "") -> List[Dict[str, Any]]:
+    """
+    사용자 조건에 맞는 요금제 후보를 가져와 점수로 정렬 후 상위 N개를 반환하는 함수
+    후보 조회는 get_candidate_backend() (로컬 카탈로그 또는 Azure Search keyword 검색) 사용.
+    기타 요구사항(notes)이 있으면 혜택 텍스트 벡터 유사도 순위와 합친 하이브리드 검색으로 선택
+    """
+    with telemetry.span("search", kind="plan"):
+        table = get_candidate_backend().search_plans(data_gb, budget, data_unlimited)
+    telemetry.inc("buddy_search_requests_total", kind="plan")
+    telemetry.inc("buddy_search_docs_total", len(table), kind="plan")
+    # 요금제 점수 일괄 계산 후 상위 N개 선택 (점수 규칙은 score_plan과 동일)
+    target_gb = float(data_gb) if data_gb is not None else None
+    with telemetry.span("score", kind="plan"):
+        scores = score_plans(table, target_gb, float(budget), data_unlimited)
+        if not (HYBRID_RETRIEVAL and notes.strip()):
+            # 카탈로그 원본이 변경되지 않도록 복사본 반환
+            return [dict(table.docs[i]) for i in top_k(scores, topn)]
+        keyword = [(table.docs[i], float(scores[i])) for i in top_k(scores, hybrid.HYBRID_POOL)]
+    with telemetry.span("semantic", kind="plan"):
+        cat = load_catalog()
+        selected = hybrid.hybrid_select(
+            "plan", notes, "planId", keyword, cat.plans.docs,
+            score_plans(cat.plans, target_gb, float(budget), data_unlimited), cat.version, get_embedder(), topn,
+        )
+    return [dict(d) for d, _ in selected]
+
+
+def compact_plan_json(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    검색된 요금제 리스트 중 필요한 항목만 추출하여 모델 프롬프트에 전달하거나 표로 노출하기 위함
+    """
+    out = []
+    for d in docs:
+        out.append({
+            "번호": d.get("planId"),
+            "요금제": d.get("plan_name"),
+            "요금(월)": format_currency(d.get("monthly_fee")),
+            "데이터(GB)": d.get("data_gb"),
+            "데이터 초과시": d.get("throttling"),
+            "전화": d.get("voice"),
+            "멤버십": d.get("membership"),
+            "혜택1": d.get("benefit_1"),
+            "혜택2": d.get("benefit_2"),
+        })
+    return out
+
+
+# -------------------------
+# Util: 단말 관련 함수
+# -------------------------
+def score_device(doc: Dict[str, Any], target_price: float | None, brand_pref: List[str]) -> float:
+    """
+    사용자 조건과 비교하여 점수 매기는 함수. 단말별 score가 낮을수록 조건에 적합.
+    가격 차이를 기본으로 하며, 브랜드 선호 매칭여부에 따라 보너스 점수 부여
+    """
+    # 가격 차이 계산. 가격 정보가 없는 경우 후보에서 제외될 수 있도록 큰 값 부여.
+    price = to_float_safe(doc.get("price"))
+    price_gap = abs((price or 0) - (target_price or 0)) if (price is not None and target_price is not None) else 5e5
+
+    # 선호 브랜드 매칭 점수 계산
+    bonus = 0.0
+    brand = (doc.get("brand") or "").lower()
+    if brand_pref:
+        if brand in [b.lower() for b in brand_pref]:
+            bonus -= 0.5  # 가벼운 가점
+
+    # 가격 갭을 만원 단위로 대략 정규화 + 보너스 반영
+    return (price_gap / 10000.0) + bonus
+
+
+def dedupe_devices_by_model_storage(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    동일 모델과 동일 용량인 경우, sntyNo 기준으로 값이 가장 작은 단말 1개만 유지하여 중복 제거
+    """
+    return [docs[i] for i in DeviceTable.from_docs(docs).dedupe_indices]
+
+
+def fetch_device_candidates(device_budget: int, brand_pref: List[str], topn, notes: str = "") -> List[Dict[str, Any]]:
+    """
+    사용자 조건에 맞는 단말 후보를 가져와 점수로 정렬 후 상위 N개를 반환하는 함수.
+    예산과 브랜드 선호도를 바탕으로 중복 제거 후 스코어링. 후보마다 같은 (모델, 용량)의 색상 목록(colors) 포함
+    기타 요구사항(notes)이 있으면 스펙 텍스트 벡터 유사도 순위와 합친 하이브리드 검색으로 선택
+    """
+    with telemetry.span("search", kind="device"):
+        table = get_candidate_backend().search_devices(device_budget, brand_pref)
+    telemetry.inc("buddy_search_requests_total", kind="device")
+    telemetry.inc("buddy_search_docs_total", len(table), kind="device")
+    hybrid_mode = HYBRID_RETRIEVAL and bool(notes.strip())
+    with telemetry.span("score", kind="device"):
+        # 동일 모델 및 용량 중복 제거 (대표 단말 인덱스)
+        idx = table.dedupe_indices
+        # 단말 점수 일괄 계산 후 상위 N개 선택 (점수 규칙은 score_device와 동일)
+        scores = score_devices(table, float(device_budget), brand_pref)[idx]
+        ranked = [(table.docs[idx[j]], float(scores[j])) for j in top_k(scores, hybrid.HYBRID_POOL if hybrid_mode else topn)]
+    colors = table.group_colors
+    if hybrid_mode:
+        with telemetry.span("semantic", kind="device"):
+            cat = load_catalog()
+            reps = hybrid.device_representatives(cat)
+            cat_scores = score_devices(cat.devices, float(device_budget), brand_pref)[cat.devices.dedupe_indices]
+            ranked = hybrid.hybrid_select("device", notes, "sntyNo", ranked, reps, cat_scores, cat.version, get_embedder(), topn)
+        # 벡터 검색으로 추가된 단말은 검색 결과에 없으므로 카탈로그의 색상 사용
+        colors = {**cat.devices.group_colors, **colors}
+    topk = []
+    for doc, score in ranked:
+        d = dict(doc)
+        d["__score"] = score
+        d["colors"] = colors.get(device_group_key(doc)) or ([doc["color"]] if doc.get("color") else [])
+        topk.append(d)
+    return topk
+
+
+def compact_device_json(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    검색된 단말 리스트 중 필요한 항목만 추출하여 모델 프롬프트에 전달하거나 표로 노출하기 위함
+    """
+    rows = []
+    for d in docs:
+        rows.append({
+            "브랜드": d.get("brand"),
+            "모델": d.get("model"),
+            "용량(GB)": d.get("storage_gb"),
+            "색상": ", ".join(d["colors"]) if d.get("colors") else d.get("color"),
+            "가격(원)": format_currency(d.get("price")),
+            "무게(g)": d.get("weight_g"),
+            "디스플레이(cm)": d.get("display_size_cm"),
+        })
+    return rows
+
+
+# -------------------------
+# Prompt: ai 모델에게 적용할 프롬프트
+# -------------------------
+# 텍스트 응답 모드에서 프롬프트에 포함하는 결과 JSON 스키마 (structured output 모드에서는 response_format으로 대체)
+PLAN_SCHEMA_TEXT = (
+    "반드시 아래 JSON 스키마를 포함한 결과를 생성하고, 근거가 되는 필드(월정액/데이터/음성 등)를 간단히 설명해줘.\n"
+    "```json\n"
+    "{\n"
+    '  "recommendations": [\n'
+    "    {\n"
+    '      "rank": 1,\n'
+    '      "plan": {"planId": "0946", "name": "요금제명", "monthly_fee": 69000, "data_gb": "무제한 또는 수치", "voice": "무제한 또는 분수"},\n'
+    '      "monthly_total": 69000,\n'
+    '      "tco": 69000,\n'
+    '      "reasons": ["이유1", "이유2"],\n'
+    '      "caveats": ["주의1"]\n'
+    "    }\n"
+    "  ],\n"
+    '  "alternatives": ["대안1", "대안2"]\n'
+    "}\n"
+    "```\n"
+)
+
+DEVICE_SCHEMA_TEXT = (
+    "아래 JSON 스키마로 결과를 생성하고, 선택 근거와 유의사항을 간단히 설명해줘.\n"
+    "```json\n"
+    "{\n"
+    '  "recommendations": [\n'
+    "    {\n"
+    '      "rank": 1,\n'
+    '      "device": {\n'
+    '        "prodNo": "string", "sntyNo": "string",\n'
+    '        "brand": "Samsung", "model": "Galaxy S24", "storage_gb": "256", "color": "Green",\n'
+    '        "price": "1250000", "weight_g": "167", "display_size_cm": "15.7"\n'
+    "      },\n"
+    '      "reasons": ["예산과의 적합성", "브랜드/모델 선호 일치", "용량/무게/디스플레이 균형"],\n'
+    '      "caveats": ["가격 변동 가능성"]\n'
+    "    }\n"
+    "  ],\n"
+    '  "alternatives": ["대안1 간단 사유", "대안2 간단 사유"]\n'
+    "}\n"
+    "```\n"
+)
+
+# 작업 지시/결과 스키마는 사용자마다 달라지지 않으므로 system 프롬프트 뒤에 붙여 모든 요청에서 바이트 단위로 같은 앞부분을 만듦
+# (Azure OpenAI 프롬프트 캐싱은 1024토큰 이상 같은 앞부분에 적용). 히스토리/사용자 조건/후보는 그 뒤에 배치
+PLAN_TASK = (
+    "[요금제 추천] 사용자 조건에 맞춰 **KT 요금제** TOP3를 추천해줘. "
+    "주어진 plan_candidates 중에서만 선택하고, 가정은 최소화해.\n"
+    "주의: 가격 등 숫자는 후보의 값을 그대로 사용하고, 후보에 없는 정보는 임의로 만들지 마. "
+    "사용자가 데이터 무제한을 원하면 무제한 요금제를 우선 추천해. "
+    "사용자가 이해하기 쉽게 설명해줘.\n"
+)
+
+DEVICE_TASK = (
+    "[단말 추천] 사용자 조건에 맞춰 **단말(스마트폰)** Top3를 추천해줘. "
+    "반드시 주어진 device_candidates **내에서만 선택**하고, 임의로 새로운 정보를 만들지 마.\n"
+    "주의: 가격 등 숫자는 후보의 값을 그대로 사용하고, 후보에 없는 값은 추정하지 마. "
+    "colors는 같은 모델/용량에서 고를 수 있는 색상이야. "
+    "사용자가 이해하기 쉽게 설명해줘.\n"
+)
+
+JOINT_TASK = "[요금제+단말 추천] 아래 두 가지 추천을 한 번에 해줘. 결과의 plan에는 요금제 추천, device에는 단말 추천을 넣어줘.\n"
+
+
+def static_prompt(kind: str) -> str:
+    """
+    kind(plan/device/joint)별로 모든 요청에서 같은 system 메세지: 기본 system 프롬프트 + 작업 지시 + 결과 스키마
+    """
+    plan = PLAN_TASK + ("" if STRUCTURED_OUTPUT else PLAN_SCHEMA_TEXT)
+    device = DEVICE_TASK + ("" if STRUCTURED_OUTPUT else DEVICE_SCHEMA_TEXT)
+    parts = {"plan": [plan], "device": [device], "joint": [JOINT_TASK, plan, device]}[kind]
+    if STRUCTURED_OUTPUT:
+        parts.append(STRUCTURED_HINT)
+    return "\n".join([SYSTEM_PROMPT, *parts])
+
+
+def prompt_messages(kind: str, user_text: str, history: List[Dict[str, Any]] | None = None) -> List[Dict[str, Any]]:
+    """
+    [고정 system 메세지] + 히스토리(기본 system 메세지 제외, 요약 포함) + [사용자 조건/후보]
+    """
+    prior = [m for m in history or [] if not (m.get("role") == "system" and m.get("content") == SYSTEM_PROMPT)]
+    return [{"role": "system", "content": static_prompt(kind)}, *prior, {"role": "user", "content": user_text}]
+
+
+def prefs_context(prefs: Dict[str, Any]) -> str:
+    return f"조건(JSON): ```json\n{json.dumps(prefs, ensure_ascii=False)}\n```\n"
+
+
+def plan_context(plan_candidates: List[Dict[str, Any]]) -> str:
+    # LLM이 참고할 요금제를 컨텍스트로 제공
+    plan_ctx = {"plan_candidates": compact_plan_json(plan_candidates)}
+    return f"plan_candidates(JSON): ```json\n{json.dumps(plan_ctx, ensure_ascii=False)}\n```\n"
+
+
+def device_context(device_candidates: List[Dict[str, Any]]) -> str:
+    # LLM이 참고할 단말을 컨텍스트로 제공
+    device_ctx = {
+        "device_candidates": [
+            {
+                "prodNo": d.get("prodNo"),
+                "sntyNo": d.get("sntyNo"),
+                "brand": d.get("brand"),
+                "model": d.get("model"),
+                "storage_gb": d.get("storage_gb"),
+                "color": d.get("color"),
+                "colors": d.get("colors") or [],
+                "price": d.get("price"),
+                "weight_g": d.get("weight_g"),
+                "display_size_cm": d.get("display_size_cm"),
+            }
+            for d in device_candidates
+        ]
+    }
+    return f"device_candidates(JSON): ```json\n{json.dumps(device_ctx, ensure_ascii=False)}\n```\n"
+
+
+def build_plan_prompt(prefs: UserPrefs, plan_candidates: List[Dict[str, Any]], history: List[Dict[str, Any]] | None = None) -> List[Dict[str, Any]]:
+    """
+    사용자 입력과 요금제 후보를 정리하여 LLM에 전달할 프롬프트
+    history가 없으면 기본 system 메세지만 사용
+    """
+    return prompt_messages("plan", prefs_context(prefs.plan_prefs()) + plan_context(plan_candidates), history)
+
+
+def build_device_prompt(prefs: UserPrefs, device_candidates: List[Dict[str, Any]], history: List[Dict[str, Any]] | None = None) -> List[Dict[str, Any]]:
+    """
+    사용자 입력과 단말 후보를 정리하여 LLM에 전달할 프롬프트
+    history가 없으면 기본 system 메세지만 사용
+    """
+    return prompt_messages("device", prefs_context(prefs.device_prefs()) + device_context(device_candidates), history)
+
+
+def build_joint_prompt(prefs: UserPrefs, plan_candidates: List[Dict[str, Any]], device_candidates: List[Dict[str, Any]],
+                       history: List[Dict[str, Any]] | None = None) -> List[Dict[str, Any]]:
+    """
+    요금제/단말 후보를 한 번에 전달하는 joint 모드 프롬프트
+    """
+    user_text = prefs_context(joint_prefs(prefs)) + plan_context(plan_candidates) + device_context(device_candidates)
+    return prompt_messages("joint", user_text, history)
+
+
+def joint_prefs(prefs: UserPrefs) -> Dict[str, Any]:
+    return {**prefs.plan_prefs(), **prefs.device_prefs()}
+
+
+# -------------------------
+# Util: LLM 결과를 테이블로 변환
+# -------------------------
+def to_device_rows_from_llm(rec_json: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for item in rec_json.get("recommendations", []):
+        d = item.get("device", {})
+        rows.append(
+            {
+                "순위": item.get("rank"),
+                "브랜드": d.get("brand"),
+                "모델": d.get("model"),
+                "용량(GB)": d.get("storage_gb"),
+                "색상": d.get("color"),
+                "가격(원)": format_currency(d.get("price")),
+                "이유": ". ".join(item.get("reasons", [])),
+                "주의": ". ".join(item.get("caveats", [])),
+            }
+        )
+    return rows
+
+def to_plan_rows_from_llm(rec_json: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for item in rec_json.get("recommendations", []):
+        plan = item.get("plan", {})
+        rows.append(
+            {
+                "순위": item.get("rank"),
+                "요금제": plan.get("name"),
+                "요금(월)": format_currency(plan.get("monthly_fee")),
+                "데이터(GB)": plan.get("data_gb"),
+                "통화": plan.get("voice"),
+                "이유": ". ".join(item.get("reasons", [])),
+                "주의": ". ".join(item.get("caveats", [])),
+            }
+        )
+    return rows
+
+# 상위 3개 결과만 적재
+def extract_top_devices_from_llm(parsed_device: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+    out = []
+    for item in (parsed_device or {}).get("recommendations", [])[:k]:
+        d = item.get("device", {})
+        out.append({
+            "prodNo": d.get("prodNo"),
+            "sntyNo": d.get("sntyNo"),
+            "brand": d.get("brand"),
+            "model": d.get("model"),
+            "storage_gb": d.get("storage_gb"),
+            "color": d.get("color"),
+            "price": to_float_safe(d.get("price")),
+            "weight_g": d.get("weight_g"),
+            "display_size_cm": d.get("display_size_cm"),
+            "reasons": item.get("reasons", []),
+            "caveats": item.get("caveats", []),
+        })
+    return [x for x in out if x.get("price") is not None]
+
+def extract_top_plans_from_llm(parsed_plan: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+    out = []
+    for item in (parsed_plan or {}).get("recommendations", [])[:k]:
+        p = item.get("plan", {})
+        out.append({
+            "planId": p.get("planId"),
+            "name": p.get("name"),
+            "monthly_fee": to_float_safe(p.get("monthly_fee")),
+            "data_gb": p.get("data_gb"),
+            "voice": p.get("voice"),
+            "reasons": item.get("reasons", []),
+            "caveats": item.get("caveats", []),
+        })
+    return [x for x in out if x.get("monthly_fee") is not None]
+
+
+# -------------------------
+# Util: JSON 파싱 + 테이블 준비
+# -------------------------
+def safe_parse_json(txt: str) -> Dict[str, Any]:
+    """
+    LLM이 생성한 응답 문자열에서 json 데이터 추출
+    """
+    candidates = re.findall(r"```json\s*(.*?)\s*```", txt, flags=re.DOTALL | re.IGNORECASE)
+    # LLM 모델이 json 을 여러번 출력하거나 불완전한 json을 만드는 경우를 대비하여 가장 마지막 json 파싱
+    if candidates:
+        for c in reversed(candidates):
+            try:
+                return json.loads(c)
+            except Exception:
+                continue
+    # 코드블록이 없는 경우 전체에서 직접 파싱 시도
+    try:
+        return json.loads(txt)
+    except Exception:
+        return {}
+
+
+# -------------------------
+# Util: 요금제 + 단말 결합 상품 계산 함수
+# -------------------------
+def combo_rows(combos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    요금제+단말 추천 조합 리스트 표기위한 함수
+    """
+    rows = []
+    for i, c in enumerate(combos, 1):
+        p, d = c["plan"], c["device"]
+        plan_id = p.get("planId") or ""
+        prod_no = d.get("prodNo") or ""
+        snty_no = d.get("sntyNo") or ""
+        # KT샵 구매 링크 생성
+        buy_url = (
+            f"https://shop.kt.com/mobile/view.do?prodNo={prod_no}&sntyNo={snty_no}&pplId={plan_id}"
+            if plan_id and prod_no and snty_no else ""
+        )
+        rows.append({
+            "순위": i,
+            "요금제": p.get("name"),
+            "요금제 월정액": format_currency(int(round(p.get("monthly_fee") or 0))),
+            "단말": f"{d.get('brand','')} {d.get('model','')} {d.get('storage_gb','')}".strip(),
+            "단말가(일시불)": format_currency(int(round(d.get("price") or 0))),
+            "할부개월": c["assumption_months"],
+            "단말 월납부금액": format_currency(int(round(c["monthly_device_payment"] or 0))),
+            "월 총 납부금액": format_currency(int(round(c["monthly_total"] or 0))),
+            "총 비용": format_currency(int(round(c["tco"] or 0))),
+            "구매 링크": buy_url,
+        })
+    return rows
+
+
+# -------------------------
+# Pipeline: 요금제 / 단말 파이프라인 (검색 + LLM, 화면 출력 없이 결과만 반환)
+# -------------------------
+ProgressFn = Callable[[Dict[str, Any]], None]
+# joint 모드: (섹션 이름 plan/device, 중간 결과)
+SectionProgressFn = Callable[[str, Dict[str, Any]], None]
+LLM_TEMPERATURE = 0.4
+MAX_COMPLETION_TOKENS = 2000
+
+
+def completion_cache_key(kind: str, prefs: Dict[str, Any], candidates: List[Dict[str, Any]], id_field: str) -> str:
+    """
+    LLM 응답 캐시 키: 정규화된 조건 + 후보 ID(planId/sntyNo) + 배포명 + temperature + 카탈로그 버전
+    """
+    return make_cache_key(
+        f"{kind}:structured" if STRUCTURED_OUTPUT else kind, prefs, [d.get(id_field) for d in candidates],
+        AZURE_OPENAI_DEPLOYMENT, LLM_TEMPERATURE, load_catalog().version,
+    )
+
+
+def joint_cache_key(prefs: UserPrefs, plan_candidates: List[Dict[str, Any]], device_candidates: List[Dict[str, Any]]) -> str:
+    ids = [f"plan:{d.get('planId')}" for d in plan_candidates] + [f"device:{d.get('sntyNo')}" for d in device_candidates]
+    return make_cache_key("joint:structured", joint_prefs(prefs), ids, AZURE_OPENAI_DEPLOYMENT, LLM_TEMPERATURE,
+                          load_catalog().version)
+
+
+def complete_chat(msgs: List[Dict[str, Any]], on_delta: Callable[[str], None] | None = None, cache_key: str | None = None,
+                  response_format: Dict[str, Any] | None = None, kind: str = "chat") -> str:
+    """
+    LLM 호출 후 응답 텍스트 반환. on_delta가 있고 스트리밍 모드면 stream=True로 받아 조각마다 on_delta 호출
+    cache_key가 있으면 캐시된 응답을 먼저 확인 (응답 저장은 파싱 성공 후 호출하는 쪽에서 수행)
+    kind는 telemetry 라벨 (plan/device)
+    """
+    extra: Dict[str, Any] = {"response_format": response_format} if response_format else {}
+    cache = open_completion_cache(load_catalog().version)
+    if cache is not None and cache_key is not None:
+        cached = cache.get(cache_key)
+        telemetry.record_cache("completion", cached is not None)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached)
+            return cached
+
+    # 분당 토큰 한도 예약량: 프롬프트 추정 + 최대 응답 토큰 (응답의 실제 사용량으로 정산)
+    limiter = get_llm_limiter()
+    reserved = sum(message_tokens(m) for m in msgs) + MAX_COMPLETION_TOKENS
+    telemetry.inc("buddy_llm_calls_total", kind=kind)
+    with telemetry.span("llm", kind=kind):
+        if on_delta is None or not STREAM_COMPLETIONS:
+            create = lambda: get_openai().chat.completions.create(
+                model=AZURE_OPENAI_DEPLOYMENT,
+                messages=msgs,
+                temperature=LLM_TEMPERATURE,
+                max_tokens=MAX_COMPLETION_TOKENS,
+                **extra,
+            )
+            with limiter.request(create, reserved) as completion:
+                usage = getattr(completion, "usage", None)
+                telemetry.record_usage(usage, kind=kind)
+                limiter.settle(reserved, usage)
+                return completion.choices[0].message.content or ""
+
+        if STREAM_USAGE:
+            extra["stream_options"] = {"include_usage": True}
+        create = lambda: get_openai().chat.completions.create(
+            model=AZURE_OPENAI_DEPLOYMENT,
+            messages=msgs,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=MAX_COMPLETION_TOKENS,
+            stream=True,
+            **extra,
+        )
+
+        def on_usage(usage: Any) -> None:
+            telemetry.record_usage(usage, kind=kind)
+            limiter.settle(reserved, usage)
+
+        # 스트림을 다 읽을 때까지 동시 호출 자리 유지
+        with limiter.request(create, reserved) as stream:
+            parts = []
+            for delta in iter_stream_text(stream, on_usage=on_usage):
+                parts.append(delta)
+                on_delta(delta)
+            return "".join(parts)
+
+
+def store_completion(cache_key: str, reply: str) -> None:
+    cache = open_completion_cache(load_catalog().version)
+    if cache is not None:
+        cache.put(cache_key, reply, catalog_version=load_catalog().version)
+
+
+def progress_update(candidates: List[Dict[str, Any]], reply: str, recommendations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"candidates": candidates, "reply": reply, "recommendations": list(recommendations)}
+
+
+def parser_reply(parser: RecommendationStreamParser) -> str:
+    # structured output 응답은 ```json 펜스 없이 JSON만 오므로 explanation 필드 값을 버디의 생각으로 사용
+    return parser.explanation if STRUCTURED_OUTPUT else parser.text
+
+
+def stream_progress(kind: str, candidates: Any, on_progress: ProgressFn | None) -> Callable[[str], None] | None:
+    """
+    스트리밍 조각을 파싱하여 on_progress로 중간 결과(후보/응답 텍스트/완성된 추천 항목) 전달하는 콜백 생성
+    joint 모드는 candidates가 {"plan": 후보, "device": 후보}이고 on_progress에 {"plan": 중간 결과, "device": 중간 결과} 전달
+    """
+    if on_progress is None:
+        return None
+    if kind == "joint":
+        parsers = {k: RecommendationStreamParser(fenced=False, section=k) for k in candidates}
+        on_progress({k: progress_update(candidates[k], "", []) for k in candidates})
+
+        def on_joint_delta(delta: str) -> None:
+            for parser in parsers.values():
+                parser.feed(delta)
+            on_progress({k: progress_update(candidates[k], p.explanation, p.recommendations) for k, p in parsers.items()})
+        return on_joint_delta
+
+    on_progress(progress_update(candidates, "", []))
+    parser = RecommendationStreamParser(fenced=not STRUCTURED_OUTPUT)
+
+    def on_delta(delta: str) -> None:
+        parser.feed(delta)
+        on_progress(progress_update(candidates, parser_reply(parser), parser.recommendations))
+    return on_delta
+
+
+STRUCTURED_MODELS = {"plan": PlanRecommendations, "device": DeviceRecommendations, "joint": JointRecommendations}
+
+
+@lru_cache(maxsize=None)
+def structured_format(kind: str) -> Dict[str, Any]:
+    # 스키마도 프롬프트 캐싱 대상인 앞부분에 포함되므로 한 번 만든 값을 그대로 사용 (호출 측에서 수정하지 않음)
+    return response_format(STRUCTURED_MODELS[kind], f"{kind}_recommendations")
+
+def llm_recommend(kind: str, msgs: List[Dict[str, Any]], candidates: List[Dict[str, Any]], cache_key: str,
+                  on_progress: ProgressFn | None = None) -> tuple[str, Dict[str, Any]]:
+    """
+    LLM 추천 단계를 실행하여 (버디의 생각 텍스트, 파싱 결과) 반환
+    같은 캐시 키(조건 + 후보 ID)로 진행 중인 요청이 있으면 새로 호출하지 않고 그 결과(또는 예외)를 함께 받음
+    """
+    if not SINGLE_FLIGHT:
+        return _llm_recommend(kind, msgs, candidates, cache_key, on_progress)
+    (reply, parsed), shared = COMPLETION_FLIGHTS.do(
+        cache_key, lambda: _llm_recommend(kind, msgs, candidates, cache_key, on_progress))
+    if shared and on_progress is not None:
+        # 스트리밍 조각은 먼저 요청한 쪽에만 전달되므로 완성된 결과를 한번에 전달
+        if kind == "joint":
+            on_progress({k: progress_update(candidates[k], parsed[k]["explanation"], parsed[k]["recommendations"]) for k in candidates})
+        else:
+            on_progress(progress_update(candidates, reply, parsed.get("recommendations", [])))
+    return reply, parsed
+
+
+def _llm_recommend(kind: str, msgs: List[Dict[str, Any]], candidates: List[Dict[str, Any]], cache_key: str,
+                   on_progress: ProgressFn | None = None) -> tuple[str, Dict[str, Any]]:
+    """
+    파싱에 성공한 응답만 캐시에 저장
+    structured output 모드에서는 스키마 검증에 실패하면 오류를 알려주고 이 단계만 최대 STRUCTURED_MAX_REPAIRS회 재요청
+    """
+    on_delta = stream_progress(kind, candidates, on_progress)
+    if not STRUCTURED_OUTPUT:
+        reply = complete_chat(msgs, on_delta, cache_key, kind=kind)
+        parsed = safe_parse_json(reply)
+        if parsed:
+            store_completion(cache_key, reply)
+        return reply, parsed
+
+    model = STRUCTURED_MODELS[kind]
+    fmt = structured_format(kind)
+    raw = complete_chat(msgs, on_delta, cache_key, response_format=fmt, kind=kind)
+    for attempt in range(STRUCTURED_MAX_REPAIRS + 1):
+        try:
+            parsed = parse_structured(model, raw)
+            break
+        except ValidationError as e:
+            if attempt == STRUCTURED_MAX_REPAIRS:
+                raise
+            telemetry.inc("buddy_structured_repairs_total", kind=kind)
+            raw = complete_chat(repair_messages(msgs, raw, e), response_format=fmt, kind=kind)
+    store_completion(cache_key, raw)
+    if kind == "joint":
+        # joint 응답은 plan/device별 explanation만 있으므로 두 설명을 이어서 사용
+        return "\n\n".join(parsed[k]["explanation"] for k in ("plan", "device") if parsed[k]["explanation"]), parsed
+    return parsed.get("explanation", ""), parsed
+
+
+def coalesced(key: tuple, fetch: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    같은 조건으로 진행 중인 후보 검색이 있으면 그 결과를 함께 사용. 호출한 쪽마다 문서 복사본 반환
+    """
+    if not SINGLE_FLIGHT:
+        return fetch()
+    docs, shared = SEARCH_FLIGHTS.do(key, fetch)
+    return [dict(d) for d in docs] if shared else docs
+
+
+def search_plan_candidates(prefs: UserPrefs) -> tuple[List[Dict[str, Any]], List[str]]:
+    """
+    요금제 후보 조회. (후보, 오류 메세지) 반환
+    """
+    try:
+        return coalesced(
+            ("plan", prefs.data_unlimited, prefs.data_gb, prefs.budget, prefs.notes),
+            lambda: fetch_plan_candidates(data_gb=prefs.data_gb, budget=prefs.budget, data_unlimited=prefs.data_unlimited,
+                                          topn=CANDIDATE_TOPN, notes=prefs.notes),
+        ), []
+    except Exception as e:
+        return [], [f"Azure Search 오류: {e}"]
+
+
+def search_device_candidates(prefs: UserPrefs) -> tuple[List[Dict[str, Any]], List[str]]:
+    """
+    단말 후보 조회. (후보, 오류 메세지) 반환
+    """
+    try:
+        return coalesced(
+            ("device", prefs.device_budget, prefs.brand_pref, prefs.notes),
+            lambda: fetch_device_candidates(device_budget=prefs.device_budget, brand_pref=list(prefs.brand_pref),
+                                            topn=CANDIDATE_TOPN, notes=prefs.notes),
+        ), []
+    except Exception as e:
+        return [], [f"Azure Search(Devices) 오류: {e}"]
+
+
+def recommend_plans(prefs: UserPrefs, plan_candidates: List[Dict[str, Any]], history: List[Dict[str, Any]] | None = None,
+                    on_progress: ProgressFn | None = None, use_llm: bool = True) -> Dict[str, Any]:
+    """
+    요금제 후보 중 Top3 추천 -> {"reply", "parsed", "errors"} 반환.
+    해석할 요구사항이 없거나(FAST_PATH) use_llm=False 이면 LLM 없이 점수 순서로 추천
+    """
+    # 해석할 요구사항이 없으면 LLM은 재정렬만 하므로 점수 순서로 바로 추천
+    if not use_llm or (FAST_PATH and not prefs.notes.strip()):
+        with telemetry.span("rank", kind="plan"):
+            parsed = rank_plans(plan_candidates, prefs.data_gb, prefs.budget, prefs.data_unlimited)
+        return {"reply": describe(parsed, "plan"), "parsed": parsed, "errors": []}
+
+    msgs = build_plan_prompt(prefs, plan_candidates, history)
+    cache_key = completion_cache_key("plan", prefs.plan_prefs(), plan_candidates, "planId")
+    errors = []
+    reply, parsed = "", {}
+    try:
+        reply, parsed = llm_recommend("plan", msgs, plan_candidates, cache_key, on_progress)
+    except ValidationError as e:
+        errors.append(f"OpenAI 응답 검증 오류: {e.error_count()}개 필드가 스키마와 맞지 않아요.")
+    except Exception as e:
+        errors.append(f"OpenAI 호출 오류: {e}")
+    return {"reply": reply, "parsed": parsed, "errors": errors}
+
+
+def recommend_devices(prefs: UserPrefs, device_candidates: List[Dict[str, Any]], history: List[Dict[str, Any]] | None = None,
+                      on_progress: ProgressFn | None = None, use_llm: bool = True) -> Dict[str, Any]:
+    """
+    단말 후보 중 Top3 추천 -> {"reply", "parsed", "errors"} 반환. 후보가 없으면 LLM 호출 생략
+    """
+    errors = []
+    reply_device = ""
+    parsed_device: Dict[str, Any] = {}
+    if device_candidates and (not use_llm or (FAST_PATH and not prefs.notes.strip())):
+        with telemetry.span("rank", kind="device"):
+            parsed_device = rank_devices(device_candidates, prefs.device_budget, list(prefs.brand_pref))
+        reply_device = describe(parsed_device, "device")
+    elif device_candidates:
+        device_msgs = build_device_prompt(prefs, device_candidates, history)
+        cache_key = completion_cache_key("device", prefs.device_prefs(), device_candidates, "sntyNo")
+        try:
+            reply_device, parsed_device = llm_recommend("device", device_msgs, device_candidates, cache_key, on_progress)
+        except ValidationError as e:
+            errors.append(f"OpenAI(Devices) 응답 검증 오류: {e.error_count()}개 필드가 스키마와 맞지 않아요.")
+        except Exception as e:
+            errors.append(f"OpenAI(Devices) 호출 오류: {e}")
+    return {"reply": reply_device, "parsed": parsed_device, "errors": errors}
+
+
+def run_plan_pipeline(prefs: UserPrefs, history: List[Dict[str, Any]] | None = None, on_progress: ProgressFn | None = None) -> Dict[str, Any]:
+    """
+    요금제 후보 조회 -> Top3 LLM 추천 -> JSON 파싱 결과를 딕셔너리로 반환.
+    streamlit 호출이 없어 스레드에서 실행 가능. on_progress로 스트리밍 중간 결과 전달
+    """
+    plan_candidates, errors = search_plan_candidates(prefs)
+    rec = recommend_plans(prefs, plan_candidates, history, on_progress)
+    return {"candidates": plan_candidates, "reply": rec["reply"], "parsed": rec["parsed"], "errors": errors + rec["errors"]}
+
+
+def run_device_pipeline(prefs: UserPrefs, history: List[Dict[str, Any]] | None = None, on_progress: ProgressFn | None = None) -> Dict[str, Any]:
+    """
+    단말 후보 조회 -> Top3 LLM 추천 -> JSON 파싱 결과를 딕셔너리로 반환.
+    후보가 없으면 LLM 호출 생략
+    """
+    device_candidates, errors = search_device_candidates(prefs)
+    rec = recommend_devices(prefs, device_candidates, history, on_progress)
+    return {"candidates": device_candidates, "reply": rec["reply"], "parsed": rec["parsed"], "errors": errors + rec["errors"]}
+
+
+def recommend_joint(prefs: UserPrefs, plan_candidates: List[Dict[str, Any]], device_candidates: List[Dict[str, Any]],
+                    history: List[Dict[str, Any]] | None = None, on_progress: SectionProgressFn | None = None,
+                    use_llm: bool = True, concurrent: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    요금제/단말 Top3 추천 -> {"plan": {"reply", "parsed", "errors"}, "device": {...}} 반환
+    LLM이 두 가지 모두 필요하면 joint 프롬프트로 한 번만 호출 (system 메세지/히스토리/스키마를 두 번 보내지 않음)
+    그 외(점수 기반 추천, 단말 후보 없음, joint 모드 꺼짐)는 요금제/단말을 각각 추천 (concurrent=True 이면 LLM 호출 병렬 실행)
+    on_progress(kind, 중간 결과)로 plan/device 스트리밍 중간 결과 전달
+    """
+    progress = {k: (lambda partial, k=k: on_progress(k, partial)) if on_progress else None for k in ("plan", "device")}
+    needs_llm = use_llm and not (FAST_PATH and not prefs.notes.strip())
+    if not needs_llm:
+        # 점수 기반 추천은 CPU 계산만 하므로 순서대로 실행
+        return {"plan": recommend_plans(prefs, plan_candidates, history, progress["plan"], use_llm),
+                "device": recommend_devices(prefs, device_candidates, history, progress["device"], use_llm)}
+    if not (JOINT_RECOMMENDATION and STRUCTURED_OUTPUT and plan_candidates and device_candidates):
+        if not concurrent:
+            return {"plan": recommend_plans(prefs, plan_candidates, history, progress["plan"], use_llm),
+                    "device": recommend_devices(prefs, device_candidates, history, progress["device"], use_llm)}
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            plan_f = pool.submit(telemetry.bind(recommend_plans), prefs, plan_candidates, history, progress["plan"], use_llm)
+            device_f = pool.submit(telemetry.bind(recommend_devices), prefs, device_candidates, history, progress["device"], use_llm)
+            return {"plan": plan_f.result(), "device": device_f.result()}
+
+    msgs = build_joint_prompt(prefs, plan_candidates, device_candidates, history)
+    candidates = {"plan": plan_candidates, "device": device_candidates}
+    joint_progress = (lambda parts: [on_progress(k, partial) for k, partial in parts.items()]) if on_progress else None
+    try:
+        _, parsed = llm_recommend("joint", msgs, candidates, joint_cache_key(prefs, plan_candidates, device_candidates), joint_progress)
+        return {k: {"reply": parsed[k]["explanation"], "parsed": parsed[k], "errors": []} for k in candidates}
+    except ValidationError as e:
+        errors = {"plan": [f"OpenAI 응답 검증 오류: {e.error_count()}개 필드가 스키마와 맞지 않아요."],
+                  "device": [f"OpenAI(Devices) 응답 검증 오류: {e.error_count()}개 필드가 스키마와 맞지 않아요."]}
+    except Exception as e:
+        errors = {"plan": [f"OpenAI 호출 오류: {e}"], "device": [f"OpenAI(Devices) 호출 오류: {e}"]}
+    return {k: {"reply": "", "parsed": {}, "errors": errors[k]} for k in candidates}
+
+
+def search_candidates(prefs: UserPrefs, concurrent: bool = True) -> Dict[str, tuple[List[Dict[str, Any]], List[str]]]:
+    """
+    요금제/단말 후보 조회 (concurrent=True 이면 병렬) -> {"plan": (후보, 오류 메세지), "device": (후보, 오류 메세지)}
+    """
+    if not concurrent:
+        return {"plan": search_plan_candidates(prefs), "device": search_device_candidates(prefs)}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        plan_f = pool.submit(telemetry.bind(search_plan_candidates), prefs)
+        device_f = pool.submit(telemetry.bind(search_device_candidates), prefs)
+        return {"plan": plan_f.result(), "device": device_f.result()}
+
+
+def run_joint_pipeline(prefs: UserPrefs, history: List[Dict[str, Any]] | None = None,
+                       on_progress: SectionProgressFn | None = None,
+                       candidates: Dict[str, tuple[List[Dict[str, Any]], List[str]]] | None = None,
+                       concurrent: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    요금제/단말 후보를 조회한 뒤 recommend_joint로 추천 -> {"plan": 파이프라인 결과, "device": 파이프라인 결과}
+    (각 결과는 run_plan_pipeline/run_device_pipeline과 같은 형태)
+    candidates(search_candidates 결과)가 있으면 후보 조회 생략 (미리 조회한 후보 사용)
+    concurrent=True 이면 요금제/단말 후보 조회(와 joint 모드가 아닐 때의 LLM 호출)를 병렬 실행
+    """
+    candidates = candidates or search_candidates(prefs, concurrent)
+    (plan_candidates, plan_errors), (device_candidates, device_errors) = candidates["plan"], candidates["device"]
+    if on_progress is not None:
+        # LLM 응답 전에 검색 후보부터 표시
+        on_progress("plan", progress_update(plan_candidates, "", []))
+        on_progress("device", progress_update(device_candidates, "", []))
+    recs = recommend_joint(prefs, plan_candidates, device_candidates, history, on_progress, concurrent=concurrent)
+    return {
+        "plan": {"candidates": plan_candidates, "reply": recs["plan"]["reply"], "parsed": recs["plan"]["parsed"],
+                 "errors": plan_errors + recs["plan"]["errors"]},
+        "device": {"candidates": device_candidates, "reply": recs["device"]["reply"], "parsed": recs["device"]["parsed"],
+                   "errors": device_errors + recs["device"]["errors"]},
+    }
+
+
+def combinations_for(prefs: UserPrefs, plan_parsed: Dict[str, Any], device_parsed: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+    """
+    요금제/단말 Top3 추천 결과로 월 총 납부금액이 저렴한 조합 k개 계산
+    """
+    top_plans = extract_top_plans_from_llm(plan_parsed, k=3)
+    top_devices = extract_top_devices_from_llm(device_parsed, k=3)
+    if not (top_plans and top_devices):
+        return []
+    with telemetry.span("combinations"):
+        return build_combinations(top_plans, top_devices, months=prefs.installment_months, k=k)
+
+
+def recommend(prefs: UserPrefs, history: List[Dict[str, Any]] | None = None, concurrent: bool = True) -> Dict[str, Any]:
+    """
+    요금제/단말 파이프라인 실행 후 조합까지 포함한 전체 추천 결과 반환 (화면 출력 없음)
+    concurrent=True 이면 요금제/단말 단계를 병렬 실행 (joint 모드에서는 후보 조회를 병렬로 하고 LLM은 1회 호출)
+    """
+    if JOINT_RECOMMENDATION:
+        joint = run_joint_pipeline(prefs, history, concurrent=concurrent)
+        plan_result, device_result = joint["plan"], joint["device"]
+    elif concurrent:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            plan_f = pool.submit(telemetry.bind(run_plan_pipeline), prefs, history)
+            device_f = pool.submit(telemetry.bind(run_device_pipeline), prefs, history)
+            plan_result, device_result = plan_f.result(), device_f.result()
+    else:
+        plan_result, device_result = run_plan_pipeline(prefs, history), run_device_pipeline(prefs, history)
+    combos = combinations_for(prefs, plan_result["parsed"], device_result["parsed"]) if device_result["candidates"] else []
+    return {"prefs": prefs.to_dict(), "plan": plan_result, "device": device_result, "combinations": combos}
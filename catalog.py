@@ -0,0 +1,413 @@
+import csv
+import glob
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache, cached_property
+from typing import Dict, Any, List, Callable, Protocol, Tuple
+
+import numpy as np
+
+from search_cache import SearchResultCache, plan_query_key, device_query_key
+
+# -------------------------
+# Catalog: docs/kt_plans_*.csv, docs/kt_devices_*.csv 로드
+# -------------------------
+CATALOG_DIR = os.getenv("CATALOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs"))
+CATALOG_BACKEND = os.getenv("CATALOG_BACKEND", "local")
+# Azure Search 후보 조회 방식: keyword(OR 키워드 검색) 또는 filter(숫자 필드 $filter + $orderby)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "keyword")
+# 컴파일된 바이너리 스냅샷 사용 여부 (CATALOG_SNAPSHOT=0 이면 항상 CSV 파싱)
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "1") != "0"
+# 더 최신 날짜 CSV/스냅샷이 생겼는지 확인하는 최소 간격(초)
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "30"))
+# keyword 모드 단말 검색에서 (모델, 용량) 그룹을 채우기 위해 이어서 조회하는 최대 페이지 수 (검색어별)
+DEVICE_MAX_PAGES = 5
+
+NUM_RE = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+VERSION_RE = re.compile(r"_(\d{6})\.csv$")
+UNLIMITED_KEYWORDS = ("무제한", "unlimited", "완전무제한")
+
+PLAN_FIELDS = [
+    "planId", "plan_name", "network", "monthly_fee", "data_gb", "voice",
+    "throttling", "roaming", "membership", "message", "benefit_1", "benefit_2",
+]
+DEVICE_FIELDS = ["prodNo", "sntyNo", "brand", "model", "storage_gb", "color", "price", "weight_g", "display_size_cm"]
+
+
+def parse_number(x: Any) -> float:
+    """
+    '1287000 ', '50GB' 같은 문자열에서 숫자 추출. 실패 시 nan 반환(숫자 컬럼용)
+    """
+    if x is None:
+        return float("nan")
+    if isinstance(x, (int, float)):
+        return float(x)
+    m = NUM_RE.search(str(x).replace(",", ""))
+    return float(m.group()) if m else float("nan")
+
+
+def normalize_storage(x: Any) -> str:
+    """
+    용량 표기 통일화. '256gb' '256 GB' 등 숫자만 추출해 통일
+    """
+    s = str(x or "").strip().lower().replace(" ", "")
+    m = NUM_RE.search(s)
+    return m.group() + "gb" if m else s
+
+
+def device_group_key(doc: Dict[str, Any]) -> tuple:
+    """
+    색상만 다른 단말을 묶는 (모델, 용량) 키
+    """
+    return ((doc.get("model") or "").strip().lower(), normalize_storage(doc.get("storage_gb")))
+
+
+def parse_snty(x: Any) -> int:
+    """
+    sntyNo 숫자 추출. 값이 없으면 큰 수 부여하여 최하위 순위 부여
+    """
+    m = NUM_RE.search(str(x)) if x else None
+    try:
+        return int(m.group()) if m else 10**12
+    except ValueError:
+        return 10**12
+
+
+def is_unlimited_text(x: Any) -> bool:
+    s = str(x or "").lower()
+    return any(k in s for k in UNLIMITED_KEYWORDS)
+
+
+# -------------------------
+# 인덱스 필터용 필드: ingest.py가 CSV 값에서 계산하여 함께 업로드 (SEARCH_MODE=filter 검색에 사용)
+# monthly_fee_value/data_gb_value/price_value: Edm.Double (filterable, sortable)
+# data_unlimited: Edm.Boolean (filterable), brand_key: Edm.String 소문자 (filterable, facetable)
+# -------------------------
+def _index_number(x: Any) -> float | None:
+    v = parse_number(x)
+    return None if v != v else v
+
+
+def plan_index_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "monthly_fee_value": _index_number(doc.get("monthly_fee")),
+        "data_gb_value": _index_number(doc.get("data_gb")),
+        "data_unlimited": is_unlimited_text(doc.get("data_gb")),
+    }
+
+
+def device_index_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "price_value": _index_number(doc.get("price")),
+        "brand_key": (doc.get("brand") or "").lower() or None,
+    }
+
+
+@dataclass(frozen=True)
+class PlanTable:
+    """
+    요금제 문서 리스트 + 숫자화된 컬럼(월정액/데이터/무제한 여부)
+    """
+    docs: List[Dict[str, Any]]
+    monthly_fee: np.ndarray
+    data_gb: np.ndarray
+    unlimited: np.ndarray
+
+    @classmethod
+    def from_docs(cls, docs: List[Dict[str, Any]]) -> "PlanTable":
+        return cls(
+            docs=docs,
+            monthly_fee=np.array([parse_number(d.get("monthly_fee")) for d in docs], dtype=np.float64),
+            data_gb=np.array([parse_number(d.get("data_gb")) for d in docs], dtype=np.float64),
+            unlimited=np.array([is_unlimited_text(d.get("data_gb")) for d in docs], dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+
+@dataclass(frozen=True)
+class DeviceTable:
+    """
+    단말 문서 리스트 + 숫자화된 컬럼(출고가/무게) 및 소문자 브랜드
+    """
+    docs: List[Dict[str, Any]]
+    price: np.ndarray
+    weight_g: np.ndarray
+    brand: np.ndarray
+
+    @classmethod
+    def from_docs(cls, docs: List[Dict[str, Any]]) -> "DeviceTable":
+        return cls(
+            docs=docs,
+            price=np.array([parse_number(d.get("price")) for d in docs], dtype=np.float64),
+            weight_g=np.array([parse_number(d.get("weight_g")) for d in docs], dtype=np.float64),
+            brand=np.array([(d.get("brand") or "").lower() for d in docs], dtype=object),
+        )
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @cached_property
+    def dedupe_indices(self) -> np.ndarray:
+        """
+        동일 (모델, 용량) 그룹별로 sntyNo가 가장 작은 단말의 인덱스. 그룹이 처음 등장한 순서 유지
+        """
+        best: Dict[tuple, tuple[int, int]] = {}
+        for i, d in enumerate(self.docs):
+            key = device_group_key(d)
+            snty_val = parse_snty(d.get("sntyNo"))
+            if key not in best or snty_val < best[key][0]:
+                best[key] = (snty_val, i)
+        return np.array([i for _, i in best.values()], dtype=np.intp)
+
+    @cached_property
+    def group_colors(self) -> Dict[tuple, List[str]]:
+        """
+        (모델, 용량) 그룹별 색상 목록 (처음 등장한 순서, 중복 제거)
+        """
+        colors: Dict[tuple, Dict[str, None]] = {}
+        for d in self.docs:
+            color = (d.get("color") or "").strip()
+            group = colors.setdefault(device_group_key(d), {})
+            if color:
+                group[color] = None
+        return {k: list(v) for k, v in colors.items()}
+
+
+@dataclass(frozen=True)
+class Catalog:
+    version: str
+    plans: PlanTable
+    devices: DeviceTable
+
+
+def latest_catalog_files(catalog_dir: str = CATALOG_DIR) -> tuple[str, str, str]:
+    """
+    docs 폴더에서 가장 최신 날짜(_YYMMDD) 요금제/단말 CSV 경로와 버전 반환
+    """
+    def by_version(pattern: str) -> Dict[str, str]:
+        out = {}
+        for path in glob.glob(os.path.join(catalog_dir, pattern)):
+            m = VERSION_RE.search(path)
+            if m:
+                out[m.group(1)] = path
+        return out
+
+    plans, devices = by_version("kt_plans_*.csv"), by_version("kt_devices_*.csv")
+    versions = sorted(set(plans) & set(devices))
+    if not versions:
+        raise FileNotFoundError(f"카탈로그 CSV를 찾지 못했어요: {catalog_dir}")
+    v = versions[-1]
+    return v, plans[v], devices[v]
+
+
+def read_csv_docs(path: str, fields: List[str]) -> List[Dict[str, Any]]:
+    """
+    BOM 포함 CSV를 읽어 검색 결과와 동일한 형태(필드명 -> 문자열)의 딕셔너리 리스트로 변환
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    return [{k: (r.get(k) or "").strip() or None for k in fields} for r in rows]
+
+
+@lru_cache(maxsize=4)
+def _load_csv_catalog(version: str, plan_path: str, device_path: str) -> Catalog:
+    return Catalog(
+        version=version,
+        plans=PlanTable.from_docs(read_csv_docs(plan_path, PLAN_FIELDS)),
+        devices=DeviceTable.from_docs(read_csv_docs(device_path, DEVICE_FIELDS)),
+    )
+
+
+def load_csv_catalog(catalog_dir: str = CATALOG_DIR) -> Catalog:
+    """
+    버전(날짜)별로 1회만 CSV를 읽어 카탈로그 생성 (streamlit rerun 시에도 재사용)
+    더 최신 날짜 CSV가 생기면 CATALOG_RELOAD_INTERVAL 안에 새 카탈로그로 교체
+    """
+    return _load_csv_catalog(*_csv_files(catalog_dir))
+
+
+_csv_checked: Dict[str, Tuple[float, Tuple[str, str, str]]] = {}
+_csv_checked_lock = threading.Lock()
+
+
+def _csv_files(catalog_dir: str) -> Tuple[str, str, str]:
+    """
+    latest_catalog_files 결과. 스냅샷 watcher와 같이 CATALOG_RELOAD_INTERVAL마다 다시 확인
+    """
+    now = time.monotonic()
+    checked = _csv_checked.get(catalog_dir)
+    if checked is not None and now - checked[0] < CATALOG_RELOAD_INTERVAL:
+        return checked[1]
+    with _csv_checked_lock:
+        checked = _csv_checked.get(catalog_dir)
+        if checked is None or now - checked[0] >= CATALOG_RELOAD_INTERVAL:
+            checked = (time.monotonic(), latest_catalog_files(catalog_dir))
+            _csv_checked[catalog_dir] = checked
+    return checked[1]
+
+
+def _csv_version(catalog_dir: str) -> str:
+    return _csv_files(catalog_dir)[0]
+
+
+def load_catalog(catalog_dir: str = CATALOG_DIR) -> Catalog:
+    """
+    컴파일된 스냅샷(snapshot.py)이 CSV보다 오래되지 않았으면 mmap 스냅샷을, 없으면 CSV 카탈로그 사용
+    스냅샷은 더 최신 날짜 파일이 생기면 자동 교체되므로 호출할 때마다 다시 조회
+    """
+    if CATALOG_SNAPSHOT and catalog_dir == CATALOG_DIR:
+        from snapshot import current_snapshot
+        snap = current_snapshot()
+        if snap is not None and snap.version >= _csv_version(catalog_dir):
+            return snap
+    return load_csv_catalog(catalog_dir)
+
+
+# -------------------------
+# Backend: 후보 조회 인터페이스 (로컬 카탈로그 / Azure AI Search)
+# -------------------------
+class CandidateBackend(Protocol):
+    def search_plans(self, data_gb: int | None, budget: int, data_unlimited: bool) -> PlanTable: ...
+    def search_devices(self, device_budget: int, brand_pref: List[str]) -> DeviceTable: ...
+
+
+class LocalCatalogBackend:
+    """
+    메모리에 올린 카탈로그 전체를 후보로 반환. 네트워크 호출 없음
+    """
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def search_plans(self, data_gb: int | None, budget: int, data_unlimited: bool) -> PlanTable:
+        return self.catalog.plans
+
+    def search_devices(self, device_budget: int, brand_pref: List[str]) -> DeviceTable:
+        return self.catalog.devices
+
+
+class AzureSearchBackend:
+    """
+    Azure AI Search로 후보 조회
+    - keyword: OR 키워드 검색 결과 상위 top개 (기본 50개)
+    - filter: 숫자 필드 $filter 범위/브랜드/무제한 조건 + $orderby로 점수 상위 min_results개를 반드시 포함하는 후보만 조회
+      (search_filters.py, 인덱스에 plan_index_fields/device_index_fields 필드 필요)
+    cache가 주어지면 keyword 모드는 예산/데이터를 버킷화한 검색어로, filter 모드는 정확한 값으로 조회 결과를 재사용
+    """
+    def __init__(self, plan_client: Callable[[], Any], device_client: Callable[[], Any], top: int = 50,
+                 cache: SearchResultCache | None = None, catalog_version: str = "",
+                 mode: str = "keyword", min_results: int = 10):
+        self.plan_client = plan_client
+        self.device_client = device_client
+        self.top = top
+        self.cache = cache
+        self.catalog_version = catalog_version
+        self.mode = mode
+        self.min_results = min_results
+
+    def search_plans(self, data_gb: int | None, budget: int, data_unlimited: bool) -> PlanTable:
+        if self.mode == "filter":
+            return self._cached(("plans-filter", data_unlimited, None if data_unlimited else data_gb, budget),
+                                lambda: self._filter_plans(data_gb, budget, data_unlimited))
+        if self.cache is None:
+            return self._search_plans(data_gb, budget, data_unlimited)
+        key = plan_query_key(data_gb, budget, data_unlimited)
+        _, _, q_gb, q_budget = key
+        return self.cache.get_or_load(key, self.catalog_version, lambda: self._search_plans(q_gb, q_budget, data_unlimited))
+
+    def search_devices(self, device_budget: int, brand_pref: List[str]) -> DeviceTable:
+        if self.mode == "filter":
+            brands = tuple(sorted({b.strip().lower() for b in brand_pref or []}))
+            return self._cached(("devices-filter", brands, device_budget),
+                                lambda: self._filter_devices(device_budget, list(brand_pref or [])))
+        if self.cache is None:
+            return self._search_devices(device_budget, brand_pref)
+        key = device_query_key(device_budget, brand_pref)
+        q_budget = key[-1]
+        return self.cache.get_or_load(key, self.catalog_version, lambda: self._search_devices(q_budget, list(brand_pref or [])))
+
+    def _cached(self, key: tuple, loader: Callable[[], Any]) -> Any:
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_load(key, self.catalog_version, loader)
+
+    def _filter_plans(self, data_gb: int | None, budget: int, data_unlimited: bool) -> PlanTable:
+        import search_filters  # search_filters가 catalog를 import하므로 사용 시점에 로드
+        return search_filters.search_plans(self.plan_client(), data_gb, budget, data_unlimited, self.min_results, self.top)
+
+    def _filter_devices(self, device_budget: int, brand_pref: List[str]) -> DeviceTable:
+        import search_filters
+        return search_filters.search_devices(self.device_client(), device_budget, brand_pref, self.min_results, self.top)
+
+    def _search_plans(self, data_gb: int | None, budget: int | None, data_unlimited: bool) -> PlanTable:
+        # 고객이 무제한을 원하는 경우 '무제한' 단어 중심으로 검색, 그 외의 경우 사용자가 원하는 조건으로 keyword 설정
+        if data_unlimited:
+            query_terms = ["무제한", "데이터 무제한", "unlimited", "완전무제한", "요금제"]
+        else:
+            query_terms = [
+                f"{data_gb}GB", f"{data_gb} 기가",
+                f"{int(budget/10000)}만원", f"{budget}원",
+                "요금제", "데이터"
+            ]
+        # keyword가 하나라도 포함된 문서 찾기위한 쿼리문
+        search_text = " OR ".join([str(t) for t in query_terms if t])
+        results = self.plan_client().search(
+            search_text=search_text,
+            top=self.top,
+            include_total_count=False,
+            query_type="simple",
+            select=PLAN_FIELDS,
+        )
+        return PlanTable.from_docs([dict(r) for r in results])
+
+    def _search_devices(self, device_budget: int, brand_pref: List[str]) -> DeviceTable:
+        query_terms = []
+        if brand_pref and len(brand_pref)>0:
+            query_terms.extend(brand_pref)
+        else: query_terms.extend(["Samsung", "Apple", "Xiaomi"])
+        query_terms.extend([f"{device_budget}원", f"{int(device_budget/10000)}만원", "스마트폰", "휴대폰", "폰"])
+        search_text = " OR ".join([str(t) for t in query_terms if t])
+        docs: List[Dict[str, Any]] = []
+        seen: set = set()
+        groups: set = set()
+        # 색상만 다른 단말이 많아 top개 안에서 (모델, 용량) 그룹이 min_results개보다 적을 수 있으므로 그룹 수 기준으로 페이지 조회
+        # 검색어와 일치하는 문서를 다 받아도 부족하면 전체("*")에서 이어서 조회
+        # (최대 페이지 수에서 멈춘 경우 전체 조회는 같은 상위 문서를 다시 받게 되므로 생략)
+        for text in dict.fromkeys([search_text or "*", "*"]):
+            exhausted = self._page_devices(text, docs, seen, groups)
+            if len(groups) >= self.min_results or not exhausted:
+                break
+        return DeviceTable.from_docs(docs)
+
+    def _page_devices(self, search_text: str, docs: List[Dict[str, Any]], seen: set, groups: set) -> bool:
+        """
+        search_text 결과를 top개씩 이어서 받아 docs에 추가 (이미 받은 sntyNo 제외)
+        그룹 수가 min_results 이상이 되거나 결과가 끝나면 (최대 DEVICE_MAX_PAGES 페이지) 종료. 결과를 끝까지 받았는지 반환
+        """
+        skip = 0
+        for _ in range(DEVICE_MAX_PAGES):
+            page = list(self.device_client().search(
+                search_text=search_text,
+                top=self.top,
+                skip=skip,
+                include_total_count=False,
+                query_type="simple",
+                select=DEVICE_FIELDS,
+            ))
+            skip += len(page)
+            for r in page:
+                key = str(r.get("sntyNo"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                docs.append(dict(r))
+                groups.add(device_group_key(r))
+            if len(page) < self.top:
+                return True
+            if len(groups) >= self.min_results:
+                return False
+        return False
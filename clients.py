@@ -0,0 +1,91 @@
+import os
+import threading
+from typing import Dict, Any, Callable, Hashable
+
+import requests
+from requests.adapters import HTTPAdapter
+from openai import AzureOpenAI, DefaultHttpxClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+from azure.search.documents import SearchClient
+
+try:
+    import httpx
+except ImportError:  # openai 배포판에 따라 httpx 대신 httpx2를 사용
+    import httpx2 as httpx
+
+# -------------------------
+# Client Registry: 프로세스당 1회 생성하여 재사용하는 Azure 클라이언트 (스레드 안전)
+# -------------------------
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# factory 안에서 다른 공용 객체(transport)를 만들 수 있도록 재진입 가능한 락 사용
+_lock = threading.RLock()
+_registry: Dict[Hashable, Any] = {}
+
+
+def get_or_create(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    key별로 1개의 인스턴스만 생성. streamlit rerun/여러 세션에서 같은 클라이언트 공유
+    """
+    client = _registry.get(key)
+    if client is None:
+        with _lock:
+            client = _registry.get(key)
+            if client is None:
+                client = factory()
+                _registry[key] = client
+    return client
+
+
+def _search_transport() -> RequestsTransport:
+    """
+    Azure Search 클라이언트 공용 HTTP 세션 (keep-alive 연결 풀 크기 제한)
+    """
+    def factory() -> RequestsTransport:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return RequestsTransport(
+            session=session,
+            session_owner=False,
+            connection_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT,
+        )
+    return get_or_create(("search-transport",), factory)
+
+
+def get_openai_client(endpoint: str | None, api_key: str | None, api_version: str | None) -> AzureOpenAI:
+    def factory() -> AzureOpenAI:
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_POOL_SIZE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+        return AzureOpenAI(
+            api_key=api_key,
+            api_version=api_version,
+            azure_endpoint=endpoint,
+            http_client=http_client,
+            # 429 재시도는 SDK 대신 ratelimit.AdaptiveLimiter가 Retry-After와 동시 호출 창을 반영하여 처리
+            max_retries=0,
+        )
+    return get_or_create(("openai", endpoint, api_key, api_version), factory)
+
+
+def get_search_client(endpoint: str | None, index_name: str | None, api_key: str | None) -> SearchClient:
+    def factory() -> SearchClient:
+        return SearchClient(
+            endpoint=endpoint,
+            index_name=index_name,
+            credential=AzureKeyCredential(api_key),
+            transport=_search_transport(),
+        )
+    return get_or_create(("search", endpoint, index_name, api_key), factory)
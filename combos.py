@@ -0,0 +1,182 @@
+import heapq
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from catalog import PlanTable, DeviceTable
+
+# -------------------------
+# Combination: 요금제 + 단말 결합 상품 계산 (k-best / 파레토 프론티어)
+# -------------------------
+ANNUAL_INSTALLMENT_RATE = 5.9
+
+
+@lru_cache(maxsize=None)
+def amortization_terms(months: int, annual_rate: float = ANNUAL_INSTALLMENT_RATE) -> Tuple[float, float]:
+    """
+    원리금 균등상환 월 할부금 = 단말가 * num / den 의 (num, den). 할부개월별 1회만 계산
+    0개월(일시불)은 월 할부금 0
+    """
+    if months <= 0:
+        return 0.0, 1.0
+    r = annual_rate / 100 / 12
+    growth = (1 + r) ** months
+    return r * growth, growth - 1
+
+
+def monthly_device_payments(prices: np.ndarray, months: int) -> np.ndarray:
+    """
+    단말가 배열의 월 할부금(원 단위 절사)
+    """
+    num, den = amortization_terms(months)
+    return np.floor(prices * num / den)
+
+
+def combo_costs(fees: np.ndarray, prices: np.ndarray, months: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (단말 월 할부금, 조합 총비용) 계산용 배열. tco = 요금제 월정액 * 개월수(일시불은 1) + 단말가
+    """
+    return monthly_device_payments(prices, months), fees * (months if months > 0 else 1)
+
+
+def k_best_pairs(fees: np.ndarray, prices: np.ndarray, months: int, k: int,
+                 max_monthly_total: float | None = None) -> List[Tuple[int, int]]:
+    """
+    월 총 납부금액(요금제 월정액 + 단말 월 할부금)이 작은 순으로 (요금제 idx, 단말 idx) k개.
+    두 정렬 배열의 합 최소 k개를 힙으로 탐색하므로 전체 조합을 만들지 않음.
+    동점은 (요금제 idx, 단말 idx) 순서 (기존 전체 조합 안정 정렬과 동일)
+    """
+    if k <= 0 or len(fees) == 0 or len(prices) == 0:
+        return []
+    device_monthly, _ = combo_costs(fees, prices, months)
+    p_order = np.lexsort((np.arange(len(fees)), fees))
+    d_order = np.lexsort((np.arange(len(prices)), device_monthly))
+    p_sorted, d_sorted = fees[p_order], device_monthly[d_order]
+
+    def key(i: int, j: int) -> Tuple[float, int, int, int, int]:
+        return (p_sorted[i] + d_sorted[j], int(p_order[i]), int(d_order[j]), i, j)
+
+    heap = [key(0, 0)]
+    seen = {(0, 0)}
+    out: List[Tuple[int, int]] = []
+    while heap and len(out) < k:
+        total, pi, di, i, j = heapq.heappop(heap)
+        if max_monthly_total is not None and total > max_monthly_total:
+            break
+        out.append((pi, di))
+        for ni, nj in ((i + 1, j), (i, j + 1)):
+            if ni < len(p_sorted) and nj < len(d_sorted) and (ni, nj) not in seen:
+                seen.add((ni, nj))
+                heapq.heappush(heap, key(ni, nj))
+    return out
+
+
+def pareto_pairs(fees: np.ndarray, prices: np.ndarray, months: int,
+                 max_monthly_total: float | None = None, max_tco: float | None = None) -> List[Tuple[int, int]]:
+    """
+    월 총 납부금액과 총비용(TCO) 기준 파레토 프론티어 (둘 다 더 싼 조합이 없는 조합), 월 총 납부금액 오름차순
+    """
+    if len(fees) == 0 or len(prices) == 0:
+        return []
+    device_monthly, plan_total = combo_costs(fees, prices, months)
+    monthly = fees[:, None] + device_monthly[None, :]
+    tco = plan_total[:, None] + prices[None, :]
+    ok = np.ones(monthly.shape, dtype=bool)
+    if max_monthly_total is not None:
+        ok &= monthly <= max_monthly_total
+    if max_tco is not None:
+        ok &= tco <= max_tco
+    pi, di = np.nonzero(ok)
+    m, t = monthly[pi, di], tco[pi, di]
+    order = np.lexsort((t, m))
+    out: List[Tuple[int, int]] = []
+    best_tco = np.inf
+    for o in order:
+        if t[o] < best_tco:
+            best_tco = t[o]
+            out.append((int(pi[o]), int(di[o])))
+    return out
+
+
+def _combo(p: Dict[str, Any], d: Dict[str, Any], months: int) -> Dict[str, Any]:
+    plan_fee = p["monthly_fee"] or 0.0
+    device_price = d["price"] or 0.0
+    num, den = amortization_terms(months)
+    monthly_device = int(np.floor(device_price * num / den))
+    return {
+        "plan": p,
+        "device": d,
+        "assumption_months": months,
+        "monthly_device_payment": monthly_device,
+        "monthly_total": plan_fee + monthly_device,
+        "tco": (plan_fee * (months if months > 0 else 1)) + device_price,
+    }
+
+
+def _arrays(plans: List[Dict[str, Any]], devices: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    fees = np.array([p["monthly_fee"] or 0.0 for p in plans], dtype=np.float64)
+    prices = np.array([d["price"] or 0.0 for d in devices], dtype=np.float64)
+    return fees, prices
+
+
+def build_combinations(plans: List[Dict[str, Any]], devices: List[Dict[str, Any]], months: int, k: int | None = None,
+                       max_monthly_total: float | None = None) -> List[Dict[str, Any]]:
+    """
+    요금제 후보, 단말 후보, 약정개월수 정보를 토대로 월 총 납부금액이 작은 조합 k개(기본: 전체)와 각 조합별 월 납부금액, 총비용 계산하는 함수
+    """
+    fees, prices = _arrays(plans, devices)
+    k = len(plans) * len(devices) if k is None else k
+    return [_combo(plans[i], devices[j], months) for i, j in k_best_pairs(fees, prices, months, k, max_monthly_total)]
+
+
+def pareto_combinations(plans: List[Dict[str, Any]], devices: List[Dict[str, Any]], months: int,
+                        max_monthly_total: float | None = None, max_tco: float | None = None) -> List[Dict[str, Any]]:
+    fees, prices = _arrays(plans, devices)
+    return [_combo(plans[i], devices[j], months) for i, j in pareto_pairs(fees, prices, months, max_monthly_total, max_tco)]
+
+
+# -------------------------
+# 전체 카탈로그 조합: 카탈로그 문서를 조합 계산용 항목으로 변환
+# -------------------------
+def plan_items(table: PlanTable, idx: np.ndarray) -> List[Dict[str, Any]]:
+    return [
+        {
+            "planId": table.docs[i].get("planId"),
+            "name": table.docs[i].get("plan_name"),
+            "monthly_fee": float(table.monthly_fee[i]),
+            "data_gb": table.docs[i].get("data_gb"),
+            "voice": table.docs[i].get("voice"),
+        }
+        for i in idx
+    ]
+
+
+def device_items(table: DeviceTable, idx: np.ndarray) -> List[Dict[str, Any]]:
+    fields = ("prodNo", "sntyNo", "brand", "model", "storage_gb", "color", "weight_g", "display_size_cm")
+    return [{**{f: table.docs[i].get(f) for f in fields}, "price": float(table.price[i])} for i in idx]
+
+
+def catalog_combinations(plans: PlanTable, devices: DeviceTable, months: int, k: int = 3,
+                         max_plan_fee: float | None = None, max_device_price: float | None = None,
+                         brand_pref: List[str] | None = None, max_monthly_total: float | None = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    요금제 x 단말 전체 카탈로그에서 예산 조건을 만족하는 k-best 조합과 파레토 프론티어 반환
+    단말은 (모델, 용량) 대표 단말만 사용
+    """
+    p_ok = ~np.isnan(plans.monthly_fee)
+    if max_plan_fee is not None:
+        p_ok &= plans.monthly_fee <= max_plan_fee
+    d_idx = devices.dedupe_indices
+    d_ok = ~np.isnan(devices.price[d_idx])
+    if max_device_price is not None:
+        d_ok &= devices.price[d_idx] <= max_device_price
+    if brand_pref:
+        d_ok &= np.isin(devices.brand[d_idx], [b.lower() for b in brand_pref])
+
+    p_items = plan_items(plans, np.flatnonzero(p_ok))
+    d_items = device_items(devices, d_idx[d_ok])
+    return {
+        "best": build_combinations(p_items, d_items, months, k=k, max_monthly_total=max_monthly_total),
+        "pareto": pareto_combinations(p_items, d_items, months, max_monthly_total=max_monthly_total),
+    }
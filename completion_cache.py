@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, List, Iterator
+
+# -------------------------
+# Completion Cache: 동일 조건/후보 LLM 응답을 SQLite에 저장하여 재사용
+# -------------------------
+COMPLETION_CACHE_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "completions.sqlite3"),
+)
+COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", str(24 * 3600)))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "5000"))
+
+
+def normalize_prefs(prefs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    캐시 키용 사용자 조건 정규화. 브랜드 순서/대소문자, 요구사항 공백 차이를 무시
+    """
+    out: Dict[str, Any] = {}
+    for k, v in prefs.items():
+        if isinstance(v, str):
+            v = " ".join(v.split())
+        elif isinstance(v, (list, tuple)):
+            v = sorted(str(x).strip().lower() for x in v)
+        elif isinstance(v, float) and v.is_integer():
+            v = int(v)
+        out[k] = v
+    return out
+
+
+def make_cache_key(kind: str, prefs: Dict[str, Any], candidate_ids: List[Any], deployment: str | None,
+                   temperature: float, catalog_version: str) -> str:
+    """
+    (프롬프트 종류, 정규화된 조건, 후보 ID, 배포명, temperature, 카탈로그 버전)의 sha256
+    """
+    payload = {
+        "kind": kind,
+        "prefs": normalize_prefs(prefs),
+        "candidates": [str(x) for x in candidate_ids],
+        "deployment": deployment,
+        "temperature": temperature,
+        "catalog_version": catalog_version,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    SQLite 기반 LLM 응답 캐시. 프로세스 재시작 후에도 유지되며 여러 워커 프로세스가 공유 가능.
+    TTL이 지난 항목은 조회 시 무시하고, 항목 수가 max_entries를 넘으면 오래 사용하지 않은 순으로 삭제
+    """
+    def __init__(self, path: str, max_entries: int = COMPLETION_CACHE_MAX_ENTRIES, ttl_seconds: float = COMPLETION_CACHE_TTL,
+                 catalog_version: str | None = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, catalog_version TEXT,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            # 카탈로그 버전은 캐시 키에 포함되어 다른 버전 응답은 조회되지 않음. 공간만 정리하기 위해 현재보다 오래된 버전만 삭제
+            # (카탈로그 교체 중 이전/새 버전 워커가 같은 파일을 공유해도 새 버전 응답을 지우지 않음)
+            if catalog_version is not None:
+                conn.execute("DELETE FROM completions WHERE catalog_version < ?", (catalog_version,))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # 스레드/프로세스 간 공유를 위해 호출마다 연결 생성
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, value: str, catalog_version: str | None = None) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, catalog_version, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, catalog_version, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM completions WHERE key IN (SELECT key FROM completions ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+
+@lru_cache(maxsize=None)
+def open_completion_cache(catalog_version: str, path: str = COMPLETION_CACHE_PATH) -> CompletionCache | None:
+    """
+    프로세스당 1개의 캐시 인스턴스. COMPLETION_CACHE_PATH가 비어있으면 캐시 미사용
+    """
+    if not path:
+        return None
+    return CompletionCache(path, catalog_version=catalog_version)
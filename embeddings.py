@@ -0,0 +1,200 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Iterator, List, Protocol
+
+import numpy as np
+
+import telemetry
+
+# -------------------------
+# Embeddings: 기타 요구사항/카탈로그 텍스트 임베딩 (하이브리드 검색용)
+# Azure OpenAI 임베딩 배포가 없으면 결정적인 로컬 해시 임베딩 사용 (테스트/오프라인용)
+# 같은 텍스트는 메모리 LRU -> SQLite 디스크 캐시 순으로 재사용하여 임베딩 호출을 반복하지 않음
+# -------------------------
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+EMBEDDING_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_MEMORY_ENTRIES", "1024"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_DIM = 512
+
+
+class Embedder(Protocol):
+    model: str
+
+    def embed(self, texts: List[str]) -> np.ndarray: ...
+
+
+def normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return (m / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+
+class HashEmbedder:
+    """
+    단어 + 단어별 글자 2/3-gram을 해시하여 고정 차원에 누적한 벡터 (L2 정규화)
+    의미를 이해하지는 않지만 같은 입력은 항상 같은 벡터이고, 표현이 겹치는 텍스트끼리 유사도가 높음
+    """
+    def __init__(self, dim: int = LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"local-hash-{dim}"
+
+    def _features(self, text: str) -> Iterator[tuple[str, float]]:
+        for word in text.lower().split():
+            yield f"w:{word}", 1.0
+            for n in (2, 3):
+                for i in range(len(word) - n + 1):
+                    yield f"{n}:{word[i:i + n]}", 0.5
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for r, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                out[r, h % self.dim] += weight if (h >> 63) & 1 else -weight
+        return normalize_rows(out)
+
+
+class AzureOpenAIEmbedder:
+    """
+    Azure OpenAI 임베딩 배포 호출 (여러 텍스트를 한 번에 요청)
+    """
+    def __init__(self, client: Callable[[], Any], deployment: str):
+        self.client = client
+        self.deployment = deployment
+        self.model = f"azure-{deployment}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        with telemetry.span("embed", kind="azure"):
+            resp = self.client().embeddings.create(model=self.deployment, input=texts)
+        telemetry.inc("buddy_embedding_calls_total")
+        return normalize_rows(np.array([d.embedding for d in resp.data], dtype=np.float32))
+
+
+# -------------------------
+# 캐시
+# -------------------------
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingDiskCache:
+    """
+    SQLite 기반 임베딩 캐시 (float32 바이트). 여러 워커 프로세스가 공유하며 오래 사용하지 않은 순으로 삭제
+    """
+    def __init__(self, path: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys: List[str]) -> dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            if rows:
+                conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(time.time(), k) for k, _ in rows])
+        return {k: np.frombuffer(v, dtype=np.float32) for k, v in rows}
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(k, v.astype(np.float32).tobytes(), now) for k, v in items.items()],
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+
+class CachedEmbedder:
+    """
+    메모리 LRU -> 디스크 캐시 -> embedder 순으로 조회. 캐시에 없는 텍스트만 EMBEDDING_BATCH_SIZE씩 묶어 요청
+    """
+    def __init__(self, embedder: Embedder, disk: EmbeddingDiskCache | None = None,
+                 memory_entries: int = EMBEDDING_MEMORY_ENTRIES):
+        self.embedder = embedder
+        self.model = embedder.model
+        self.disk = disk
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        with self._lock:
+            self._memory[key] = vec
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        keys = [embedding_key(self.model, t) for t in texts]
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for k in keys:
+                if k in self._memory:
+                    self._memory.move_to_end(k)
+                    found[k] = self._memory[k]
+        # 같은 배치 안의 중복 텍스트는 1건으로 보고 히트/미스 모두 고유 키 기준으로 집계
+        unique = list(dict.fromkeys(keys))
+        missing = [k for k in unique if k not in found]
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many(missing)
+            for k, v in from_disk.items():
+                found[k] = v
+                self._remember(k, v)
+            missing = [k for k in missing if k not in from_disk]
+        telemetry.inc("buddy_cache_requests_total", len(unique) - len(missing), cache="embedding", result="hit")
+        telemetry.inc("buddy_cache_requests_total", len(missing), cache="embedding", result="miss")
+
+        if missing:
+            text_of = dict(zip(keys, texts))
+            computed: dict[str, np.ndarray] = {}
+            for i in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+                batch = missing[i:i + EMBEDDING_BATCH_SIZE]
+                for k, v in zip(batch, self.embedder.embed([text_of[k] for k in batch])):
+                    computed[k] = v
+                    self._remember(k, v)
+            if self.disk is not None:
+                self.disk.put_many(computed)
+            found.update(computed)
+        return np.stack([found[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+
+@lru_cache(maxsize=None)
+def open_embedding_cache(path: str = EMBEDDING_CACHE_PATH) -> EmbeddingDiskCache | None:
+    """
+    프로세스당 1개의 디스크 캐시. EMBEDDING_CACHE_PATH가 비어있으면 메모리 캐시만 사용
+    """
+    if not path:
+        return None
+    return EmbeddingDiskCache(path)
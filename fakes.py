@@ -0,0 +1,404 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, Any, Deque, List, Iterator, Callable
+
+from catalog import load_catalog, plan_index_fields, device_index_fields
+from history import estimate_tokens
+
+# -------------------------
+# Fakes: Azure AI Search / Azure OpenAI 로컬 대체 구현 (벤치마크/CI용, 네트워크 호출 없음)
+# SearchClient.search, chat.completions.create와 같은 호출 형태를 지원하고 지연/지터/오류율 설정 가능
+# -------------------------
+class FakeServiceError(RuntimeError):
+    pass
+
+
+class FakeRateLimitError(RuntimeError):
+    """
+    openai.RateLimitError와 같은 형태 (status_code=429, response.headers의 retry-after-ms)
+    """
+    def __init__(self, retry_after: float):
+        super().__init__("429 Too Many Requests: token rate limit exceeded")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after-ms": str(int(retry_after * 1000))})
+
+
+@dataclass
+class Latency:
+    """
+    호출당 지연(ms) = 정규분포(mean_ms, jitter_ms), 음수는 0. error_rate 확률로 FakeServiceError 발생
+    """
+    mean_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    seed: int | None = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def wait(self, what: str) -> None:
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.mean_ms, self.jitter_ms)) if self.jitter_ms else self.mean_ms
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            raise FakeServiceError(f"{what}: injected failure")
+
+
+# -------------------------
+# Azure AI Search
+# -------------------------
+ODATA_TOKEN_RE = re.compile(r"\s*(?:(\()|(\))|(,)|('(?:[^']|'')*')|(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)|([A-Za-z_][\w.]*))")
+ODATA_OPS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and b is not None and a > b,
+    "ge": lambda a, b: a is not None and b is not None and a >= b,
+    "lt": lambda a, b: a is not None and b is not None and a < b,
+    "le": lambda a, b: a is not None and b is not None and a <= b,
+}
+
+
+def parse_odata_filter(text: str) -> Callable[[Dict[str, Any]], bool]:
+    """
+    $filter 일부 문법(and/or/not, 괄호, eq/ne/gt/ge/lt/le, null/true/false, search.in)을 문서 판별 함수로 변환
+    """
+    tokens: List[tuple[str, Any]] = []
+    pos = 0
+    while pos < len(text.rstrip()):
+        m = ODATA_TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"지원하지 않는 필터 문법: {text[pos:]!r}")
+        lp, rp, comma, string, number, word = m.groups()
+        if string is not None:
+            tokens.append(("value", string[1:-1].replace("''", "'")))
+        elif number is not None:
+            tokens.append(("value", float(number)))
+        elif word in ("null", "true", "false"):
+            tokens.append(("value", {"null": None, "true": True, "false": False}[word]))
+        elif word is not None:
+            tokens.append(("word", word))
+        else:
+            tokens.append(("punct", lp or rp or comma))
+        pos = m.end()
+    i = 0
+
+    def peek(kind: str, value: Any = None) -> bool:
+        return i < len(tokens) and tokens[i][0] == kind and (value is None or tokens[i][1] == value)
+
+    def take(kind: str, value: Any = None) -> Any:
+        nonlocal i
+        if not peek(kind, value):
+            raise ValueError(f"필터 구문 오류: {text!r}")
+        i += 1
+        return tokens[i - 1][1]
+
+    def or_expr() -> Callable[[Dict[str, Any]], bool]:
+        parts = [and_expr()]
+        while peek("word", "or"):
+            take("word")
+            parts.append(and_expr())
+        return parts[0] if len(parts) == 1 else (lambda d: any(p(d) for p in parts))
+
+    def and_expr() -> Callable[[Dict[str, Any]], bool]:
+        parts = [unary()]
+        while peek("word", "and"):
+            take("word")
+            parts.append(unary())
+        return parts[0] if len(parts) == 1 else (lambda d: all(p(d) for p in parts))
+
+    def unary() -> Callable[[Dict[str, Any]], bool]:
+        if peek("word", "not"):
+            take("word")
+            inner = unary()
+            return lambda d: not inner(d)
+        if peek("punct", "("):
+            take("punct")
+            inner = or_expr()
+            take("punct", ")")
+            return inner
+        if peek("value"):
+            const = take("value")
+            return lambda d: bool(const)
+        name = take("word")
+        if name == "search.in":
+            take("punct", "(")
+            field = take("word")
+            take("punct", ",")
+            values = take("value")
+            delim = " ,"
+            if peek("punct", ","):
+                take("punct")
+                delim = take("value")
+            take("punct", ")")
+            allowed = {v for v in re.split("|".join(map(re.escape, delim)), values) if v}
+            return lambda d: d.get(field) in allowed
+        op = ODATA_OPS[take("word")]
+        value = take("value")
+        return lambda d: op(d.get(name), value)
+
+    pred = or_expr()
+    if i != len(tokens):
+        raise ValueError(f"필터 구문 오류: {text!r}")
+    return pred
+
+
+def sort_by_odata(docs: List[Dict[str, Any]], order_by: List[str]) -> List[Dict[str, Any]]:
+    """
+    $orderby ("필드 asc|desc" 목록) 순서로 정렬. null은 오름차순에서 가장 앞
+    """
+    out = list(docs)
+    for clause in reversed(order_by):
+        field, _, direction = clause.strip().partition(" ")
+        out.sort(key=lambda d: (d.get(field) is not None, d.get(field) if d.get(field) is not None else 0),
+                 reverse=direction.strip().lower() == "desc")
+    return out
+
+
+class FakeSearchClient:
+    """
+    카탈로그 문서를 메모리에 두고 simple 쿼리(" OR " 구분 키워드)를 포함 여부로 매칭하는 SearchClient 대체
+    매칭된 키워드 수가 많은 순, 동점은 문서 순서로 반환
+    key_field가 주어지면 merge_or_upload_documents/delete_documents로 문서 변경 가능 (ingest.py 로컬 대상 인덱스)
+    """
+    def __init__(self, docs: List[Dict[str, Any]], latency: Latency | None = None, key_field: str | None = None):
+        self.docs = list(docs)
+        self.latency = latency or Latency()
+        self.key_field = key_field
+        self._texts = [self._text(d) for d in self.docs]
+        self._pos = {str(d.get(key_field)): i for i, d in enumerate(self.docs)} if key_field else {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _text(doc: Dict[str, Any]) -> str:
+        return " ".join(str(v) for v in doc.values() if v is not None).lower()
+
+    def search(self, search_text: str = "*", top: int = 50, select: List[str] | None = None, filter: str | None = None,
+               order_by: List[str] | None = None, skip: int = 0, **kwargs: Any) -> List[Dict[str, Any]]:
+        self.latency.wait("search")
+        terms = [t.strip().lower() for t in search_text.split(" OR ") if t.strip() and t.strip() != "*"]
+        with self._lock:
+            docs, texts = list(self.docs), list(self._texts)
+        if terms:
+            scored = [(sum(t in text for t in terms), i) for i, text in enumerate(texts)]
+            hits = [docs[i] for n, i in sorted(scored, key=lambda x: (-x[0], x[1])) if n > 0]
+        else:
+            hits = docs
+        if filter:
+            pred = parse_odata_filter(filter)
+            hits = [d for d in hits if pred(d)]
+        if order_by:
+            hits = sort_by_odata(hits, order_by)
+        return [{f: d.get(f) for f in select} if select else dict(d) for d in hits[skip:skip + top]]
+
+    def get_document_count(self) -> int:
+        return len(self.docs)
+
+    def merge_or_upload_documents(self, documents: List[Dict[str, Any]], **kwargs: Any) -> List[Any]:
+        """
+        키가 있으면 필드 병합, 없으면 추가. 문서별 IndexingResult 형태(key/succeeded/status_code) 반환
+        """
+        self.latency.wait("merge_or_upload_documents")
+        results = []
+        with self._lock:
+            for doc in documents:
+                key = str(doc[self.key_field])
+                i = self._pos.get(key)
+                if i is None:
+                    self._pos[key] = len(self.docs)
+                    self.docs.append(dict(doc))
+                    self._texts.append(self._text(doc))
+                    status = 201
+                else:
+                    self.docs[i] = {**self.docs[i], **doc}
+                    self._texts[i] = self._text(self.docs[i])
+                    status = 200
+                results.append(SimpleNamespace(key=key, succeeded=True, status_code=status, error_message=None))
+        return results
+
+    def delete_documents(self, documents: List[Dict[str, Any]], **kwargs: Any) -> List[Any]:
+        self.latency.wait("delete_documents")
+        keys = {str(d[self.key_field]) for d in documents}
+        with self._lock:
+            keep = [i for i, d in enumerate(self.docs) if str(d.get(self.key_field)) not in keys]
+            self.docs = [self.docs[i] for i in keep]
+            self._texts = [self._texts[i] for i in keep]
+            self._pos = {str(d.get(self.key_field)): i for i, d in enumerate(self.docs)}
+        # 없는 키 삭제도 Azure AI Search와 같이 성공으로 처리
+        return [SimpleNamespace(key=k, succeeded=True, status_code=200, error_message=None) for k in sorted(keys)]
+
+    @classmethod
+    def load(cls, path: str, key_field: str, latency: Latency | None = None) -> "FakeSearchClient":
+        """
+        JSON 파일에 저장된 로컬 인덱스 열기 (파일이 없으면 빈 인덱스)
+        """
+        docs = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                docs = json.load(f)
+        return cls(docs, latency, key_field=key_field)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.docs, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def fake_search_clients(latency: Latency | None = None) -> tuple[FakeSearchClient, FakeSearchClient]:
+    """
+    로컬 카탈로그(docs/*.csv)를 제공하는 (요금제, 단말) 검색 클라이언트. ingest.py와 같이 필터용 필드 포함
+    """
+    cat = load_catalog()
+    plans = [{**d, **plan_index_fields(d)} for d in cat.plans.docs]
+    devices = [{**d, **device_index_fields(d)} for d in cat.devices.docs]
+    return FakeSearchClient(plans, latency), FakeSearchClient(devices, latency)
+
+
+# -------------------------
+# Azure OpenAI
+# -------------------------
+# 프롬프트 캐싱: 앞부분이 PROMPT_CACHE_MIN_TOKENS 이상 같으면 캐시, 이후 PROMPT_CACHE_BLOCK_TOKENS 단위로 증가
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK_TOKENS = 128
+PROMPT_CACHE_ENTRIES = 32
+CTX_RE = re.compile(r"(plan|device)_candidates\(JSON\): ```json\n(.*?)\n```", re.DOTALL)
+
+
+def canned_recommendations(messages: List[Dict[str, Any]]) -> tuple[str, Dict[str, Any]]:
+    """
+    프롬프트에 포함된 후보 중 앞의 3개를 추천하는 (종류, 응답 JSON) 생성. 스키마는 structured 모델과 동일
+    요금제/단말 후보가 모두 있으면 joint 응답 ({"plan": ..., "device": ...})
+    """
+    found: Dict[str, Any] = {}
+    # 후보가 포함된 마지막 메세지 사용 (스키마 검증 실패 재요청은 마지막 메세지가 오류 안내)
+    for msg in reversed(messages):
+        found = {m.group(1): json.loads(m.group(2)) for m in CTX_RE.finditer(str(msg.get("content") or ""))}
+        if found:
+            break
+    if not found:
+        return "unknown", {"explanation": "", "recommendations": [], "alternatives": []}
+    if len(found) > 1:
+        return "joint", {kind: _canned(kind, ctx) for kind, ctx in found.items()}
+    kind, ctx = next(iter(found.items()))
+    return kind, _canned(kind, ctx)
+
+
+def _canned(kind: str, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    recs = []
+    if kind == "plan":
+        cands = ctx.get("plan_candidates", [])
+        for rank, c in enumerate(cands[:3], 1):
+            fee = float(str(c.get("요금(월)") or "0").replace(",", "") or 0)
+            recs.append({
+                "rank": rank,
+                "plan": {"planId": str(c.get("번호")), "name": str(c.get("요금제")), "monthly_fee": fee,
+                         "data_gb": str(c.get("데이터(GB)")), "voice": str(c.get("전화"))},
+                "monthly_total": fee, "tco": fee,
+                "reasons": ["조건과 가까운 요금제예요"], "caveats": [],
+            })
+        alts = [str(c.get("요금제")) for c in cands[3:5]]
+    else:
+        cands = ctx.get("device_candidates", [])
+        for rank, c in enumerate(cands[:3], 1):
+            recs.append({
+                "rank": rank,
+                "device": {k: str(c.get(k)) for k in ("prodNo", "sntyNo", "brand", "model", "storage_gb", "color", "price", "weight_g", "display_size_cm")},
+                "reasons": ["예산에 맞는 단말이에요"], "caveats": ["가격 변동 가능성"],
+            })
+        alts = [f"{c.get('brand')} {c.get('model')}" for c in cands[3:5]]
+    return {"explanation": f"{kind} 후보 중 조건에 가까운 순서로 골랐어요.", "recommendations": recs, "alternatives": alts}
+
+
+class _Completions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    def create(self, messages: List[Dict[str, Any]], stream: bool = False, response_format: Dict[str, Any] | None = None,
+               **kwargs: Any) -> Any:
+        owner = self.owner
+        owner._charge(messages, kwargs.get("max_tokens") or 0)
+        owner.latency.wait("chat.completions")
+        owner.calls += 1
+        _, payload = canned_recommendations(messages)
+        if response_format:
+            text = json.dumps(payload, ensure_ascii=False)
+        else:
+            body = {k: v for k, v in payload.items() if k != "explanation"}
+            text = f"{payload['explanation']}\n```json\n{json.dumps(body, ensure_ascii=False)}\n```"
+        usage = owner._usage(messages, response_format, text)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+        return owner._stream(text, usage if (kwargs.get("stream_options") or {}).get("include_usage") else None)
+
+
+class FakeOpenAI:
+    """
+    AzureOpenAI 클라이언트 대체. 프롬프트의 후보로 정해진 형식의 추천 응답 생성
+    latency는 첫 응답까지의 지연, chunk_ms는 스트리밍 조각 사이 지연
+    tpm을 주면 Azure 배포처럼 (프롬프트 추정 + max_tokens)을 분당 토큰 한도(10초 단위 허용량)에서 차감하고, 부족하면 429
+    usage의 cached_tokens는 Azure 프롬프트 캐싱처럼 최근 프롬프트와 같은 앞부분이 1024 토큰 이상이면 128 토큰 단위로 계산
+    """
+    def __init__(self, latency: Latency | None = None, chunk_chars: int = 16, chunk_ms: float = 0.0, tpm: int = 0):
+        self.latency = latency or Latency()
+        self.chunk_chars = chunk_chars
+        self.chunk_ms = chunk_ms
+        self.calls = 0
+        self.throttled = 0
+        self.tpm = tpm
+        self._quota = tpm / 6
+        self._quota_at = time.monotonic()
+        self._quota_lock = threading.Lock()
+        self._prompts: Deque[str] = deque(maxlen=PROMPT_CACHE_ENTRIES)
+        self._prompts_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def _charge(self, messages: List[Dict[str, Any]], max_tokens: int) -> None:
+        if not self.tpm:
+            return
+        cost = sum(len(str(m.get("content") or "")) for m in messages) / 4 + max_tokens
+        rate, burst = self.tpm / 60, self.tpm / 6
+        with self._quota_lock:
+            now = time.monotonic()
+            self._quota = min(burst, self._quota + (now - self._quota_at) * rate)
+            self._quota_at = now
+            if self._quota < cost:
+                self.throttled += 1
+                raise FakeRateLimitError((min(cost, burst) - self._quota) / rate)
+            self._quota -= cost
+
+    def _usage(self, messages: List[Dict[str, Any]], response_format: Dict[str, Any] | None, text: str) -> Any:
+        # 스키마(response_format)가 메세지보다 앞에 오는 것으로 보고 프롬프트 텍스트 구성
+        prompt = json.dumps(response_format, ensure_ascii=False) if response_format else ""
+        prompt += "".join(f"{m.get('role')}:{m.get('content') or ''}\n" for m in messages)
+        with self._prompts_lock:
+            common = max((len(os.path.commonprefix([prompt, p])) for p in self._prompts), default=0)
+            self._prompts.append(prompt)
+        prefix_tokens = estimate_tokens(prompt[:common])
+        cached = 0 if prefix_tokens < PROMPT_CACHE_MIN_TOKENS else (
+            PROMPT_CACHE_MIN_TOKENS + (prefix_tokens - PROMPT_CACHE_MIN_TOKENS) // PROMPT_CACHE_BLOCK_TOKENS * PROMPT_CACHE_BLOCK_TOKENS
+        )
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached),
+        )
+
+    def _stream(self, text: str, usage: Any = None) -> Iterator[Any]:
+        for i in range(0, len(text), self.chunk_chars):
+            if self.chunk_ms:
+                time.sleep(self.chunk_ms / 1000)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + self.chunk_chars]))], usage=None)
+        if usage is not None:
+            # stream_options.include_usage: choices가 빈 마지막 청크에 usage
+            yield SimpleNamespace(choices=[], usage=usage)
@@ -0,0 +1,101 @@
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, List
+
+from streaming import strip_json_blocks
+
+# -------------------------
+# History: 토큰 예산 안에서 대화 히스토리 유지 (system 프롬프트 + 최근 메세지 + 요약)
+# -------------------------
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "2000"))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "20"))
+HISTORY_SUMMARY_CHARS = 80
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 없이 토큰 수 근사: 영문/숫자는 4글자당 1토큰, 한글 등 비ASCII 문자는 1글자당 1토큰
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def message_tokens(msg: Dict[str, Any]) -> int:
+    return estimate_tokens(str(msg.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+@dataclass
+class HistoryWindow:
+    messages: List[Dict[str, Any]]
+    total_tokens: int
+    dropped_messages: int
+    dropped_tokens: int
+
+
+class HistoryManager:
+    """
+    LLM에 보낼 히스토리를 max_tokens 이하로 유지.
+    system 메세지는 항상 유지하고, 최근 메세지부터 예산 안에서 채운 뒤
+    잘려나간 메세지는 한 줄씩 요약한 메세지로 대체 (요약도 예산 안에 들어갈 때만)
+    """
+    def __init__(self, max_tokens: int = HISTORY_MAX_TOKENS, max_messages: int = HISTORY_MAX_MESSAGES, summarize: bool = True):
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.summarize = summarize
+
+    def window(self, messages: List[Dict[str, Any]]) -> HistoryWindow:
+        system = [m for m in messages if m.get("role") == "system"]
+        rest = [m for m in messages if m.get("role") != "system"]
+        budget = self.max_tokens - sum(message_tokens(m) for m in system)
+
+        # 최근 메세지부터 예산 안에 들어가는 만큼 유지
+        kept: List[Dict[str, Any]] = []
+        for m in reversed(rest):
+            t = message_tokens(m)
+            if t > budget:
+                break
+            kept.append(m)
+            budget -= t
+        kept.reverse()
+        dropped = rest[:len(rest) - len(kept)]
+        dropped_tokens = sum(message_tokens(m) for m in dropped)
+
+        summary: List[Dict[str, Any]] = []
+        if dropped and self.summarize:
+            lines = []
+            for m in dropped:
+                first = (str(m.get("content") or "").strip().splitlines() or [""])[0]
+                lines.append(f"- {m.get('role')}: {first[:HISTORY_SUMMARY_CHARS]}")
+            msg = {"role": "system", "content": "(이전 대화 요약)\n" + "\n".join(lines)}
+            # 요약이 남은 예산보다 크면 오래된 줄부터 제외
+            while lines and message_tokens(msg) > budget:
+                lines.pop(0)
+                msg = {"role": "system", "content": "(이전 대화 요약)\n" + "\n".join(lines)}
+            if lines:
+                summary.append(msg)
+                dropped_tokens -= message_tokens(msg)
+
+        out = system + summary + kept
+        return HistoryWindow(
+            messages=out,
+            total_tokens=sum(message_tokens(m) for m in out),
+            dropped_messages=len(dropped),
+            dropped_tokens=max(dropped_tokens, 0),
+        )
+
+    def append(self, messages: List[Dict[str, Any]], *new: Dict[str, Any]) -> None:
+        """
+        세션 히스토리에 메세지 추가. assistant 응답의 json 블록은 제거하고,
+        system 외 메세지는 최근 max_messages개만 보관하여 세션 메모리 증가를 제한
+        """
+        for m in new:
+            if m.get("role") == "assistant":
+                m = {**m, "content": strip_json_blocks(str(m.get("content") or ""))}
+            messages.append(m)
+        rest_idx = [i for i, m in enumerate(messages) if m.get("role") != "system"]
+        overflow = len(rest_idx) - self.max_messages
+        if overflow > 0:
+            for i in reversed(rest_idx[:overflow]):
+                del messages[i]
@@ -0,0 +1,177 @@
+import os
+import hashlib
+import argparse
+import threading
+from typing import Dict, Any, List, Tuple, Sequence
+
+import numpy as np
+
+from catalog import Catalog, load_catalog, parse_number
+from embeddings import Embedder, HashEmbedder, CachedEmbedder, open_embedding_cache
+
+# -------------------------
+# Hybrid: 기타 요구사항(notes)을 후보 검색에 반영하는 키워드(점수) + 벡터 하이브리드 검색
+# 요금제 혜택/단말 스펙 텍스트의 카탈로그 임베딩은 미리 계산하여 .npy로 저장하고 mmap으로 읽음
+# 점수 순위와 notes 유사도 순위를 Reciprocal Rank Fusion(RRF)으로 합쳐 상위 N개 후보 선택
+# 실행: python hybrid.py  (현재 카탈로그 임베딩 미리 계산)
+# -------------------------
+EMBEDDING_DIR = os.getenv(
+    "EMBEDDING_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings"),
+)
+# 각 순위 목록에서 융합에 사용하는 후보 수
+HYBRID_POOL = int(os.getenv("HYBRID_POOL", "30"))
+# RRF 상수와 벡터 순위 가중치 (1.0이면 점수 순위와 동일 비중)
+RRF_K = 60
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+
+
+# -------------------------
+# 카탈로그 텍스트
+# -------------------------
+PLAN_TEXT_FIELDS = ("plan_name", "network", "data_gb", "throttling", "voice", "roaming", "benefit_1", "benefit_2")
+
+
+def plan_text(doc: Dict[str, Any]) -> str:
+    parts = [str(doc.get(f)) for f in PLAN_TEXT_FIELDS if doc.get(f)]
+    # 멤버십 등급은 라벨을 붙인 형태로만 포함 (필드 값까지 넣으면 벡터 유사도에서 두 번 반영됨)
+    if doc.get("membership"):
+        parts.append(f"멤버십 {doc['membership']}")
+    return " ".join(parts)
+
+
+def device_text(doc: Dict[str, Any]) -> str:
+    """
+    단말 스펙 텍스트. 무게/화면 크기는 요구사항 표현(가벼운, 대화면 등)과 겹치도록 설명어 추가
+    """
+    parts = [str(doc.get(f)) for f in ("brand", "model", "storage_gb", "color") if doc.get(f)]
+    weight, display = parse_number(doc.get("weight_g")), parse_number(doc.get("display_size_cm"))
+    if weight == weight:
+        parts.append(f"무게 {weight:g}g")
+        if weight < 180:
+            parts.append("가벼운 경량 가벼움 휴대폰")
+        elif weight >= 220:
+            parts.append("무거운 묵직한")
+    if display == display:
+        parts.append(f"화면 {display:g}cm")
+        if display >= 17:
+            parts.append("대화면 큰 화면")
+        elif display < 15.5:
+            parts.append("작은 화면 컴팩트 한손")
+    return " ".join(parts)
+
+
+TEXT_FNS = {"plan": plan_text, "device": device_text}
+
+
+# -------------------------
+# 카탈로그 임베딩 (미리 계산)
+# -------------------------
+_vectors: Dict[Tuple[str, str, str, int], np.ndarray] = {}
+_vectors_lock = threading.Lock()
+
+
+def catalog_vectors(kind: str, docs: Sequence[Dict[str, Any]], version: str, embedder: Embedder,
+                    out_dir: str = EMBEDDING_DIR) -> np.ndarray:
+    """
+    카탈로그 문서 임베딩 행렬 (행 순서 = docs 순서). 버전/모델/텍스트 해시별 .npy 파일이 있으면 mmap으로 읽고,
+    없으면 계산하여 저장 (프로세스 내에서는 카탈로그 버전별 1회만 로드)
+    """
+    key = (kind, version, embedder.model, len(docs))
+    vecs = _vectors.get(key)
+    if vecs is not None:
+        return vecs
+    with _vectors_lock:
+        vecs = _vectors.get(key)
+        if vecs is None:
+            texts = [TEXT_FNS[kind](d) for d in docs]
+            digest = hashlib.sha256("\n".join(texts).encode("utf-8")).hexdigest()[:12]
+            path = os.path.join(out_dir, f"{kind}_{version}_{embedder.model}_{digest}.npy")
+            if os.path.exists(path):
+                vecs = np.load(path, mmap_mode="r")
+            else:
+                vecs = embedder.embed(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+                os.makedirs(out_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp, vecs)
+                os.replace(tmp, path)
+            _vectors[key] = vecs
+    return vecs
+
+
+# -------------------------
+# 융합
+# -------------------------
+def rrf_fuse(rankings: List[List[str]], weights: List[float], k: int = RRF_K) -> List[str]:
+    """
+    순위 목록들을 RRF 점수(sum weight / (k + rank))로 합친 키 목록. 동점은 먼저 나온 목록/순위 우선
+    """
+    fused: Dict[str, float] = {}
+    first_seen: Dict[str, int] = {}
+    for ranking, w in zip(rankings, weights):
+        for rank, key in enumerate(ranking, 1):
+            fused[key] = fused.get(key, 0.0) + w / (k + rank)
+            first_seen.setdefault(key, len(first_seen))
+    return sorted(fused, key=lambda key: (-fused[key], first_seen[key]))
+
+
+def semantic_order(kind: str, notes: str, docs: Sequence[Dict[str, Any]], version: str, embedder: Embedder,
+                   eligible: np.ndarray, limit: int) -> List[int]:
+    """
+    eligible인 카탈로그 문서 중 notes와 코사인 유사도가 높은 순서의 인덱스 (최대 limit개)
+    """
+    vecs = catalog_vectors(kind, docs, version, embedder)
+    if not len(vecs):
+        return []
+    q = embedder.embed([notes])[0]
+    sims = np.asarray(vecs) @ q
+    sims = np.where(eligible, sims, -np.inf)
+    order = np.argsort(-sims, kind="stable")[:limit]
+    return [int(i) for i in order if np.isfinite(sims[i])]
+
+
+def hybrid_select(kind: str, notes: str, key_field: str, keyword: List[Tuple[Dict[str, Any], float]],
+                  catalog_docs: Sequence[Dict[str, Any]], catalog_scores: np.ndarray, version: str,
+                  embedder: Embedder, topn: int) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    keyword: 점수 오름차순 (문서, 점수) 목록. catalog_docs/catalog_scores: 벡터 검색 대상 카탈로그와 같은 규칙의 점수
+    점수가 inf(조건 불충족, 예: 무제한 요청인데 무제한이 아닌 요금제)인 문서는 벡터 검색에서도 제외
+    """
+    sem_idx = semantic_order(kind, notes, catalog_docs, version, embedder, np.isfinite(catalog_scores), HYBRID_POOL)
+    semantic = [(catalog_docs[i], float(catalog_scores[i])) for i in sem_idx]
+    by_key: Dict[str, Tuple[Dict[str, Any], float]] = {str(d.get(key_field)): (d, s) for d, s in semantic}
+    # 같은 문서는 검색 백엔드 결과를 우선 사용
+    by_key.update({str(d.get(key_field)): (d, s) for d, s in keyword})
+    keys = rrf_fuse(
+        [[str(d.get(key_field)) for d, _ in keyword[:HYBRID_POOL]], [str(d.get(key_field)) for d, _ in semantic]],
+        [1.0, HYBRID_VECTOR_WEIGHT],
+    )
+    return [by_key[k] for k in keys[:topn]]
+
+
+def device_representatives(catalog: Catalog) -> List[Dict[str, Any]]:
+    # 단말은 (모델, 용량) 대표 단말만 벡터 검색 대상
+    return [catalog.devices.docs[i] for i in catalog.devices.dedupe_indices]
+
+
+def precompute(catalog: Catalog, embedder: Embedder) -> Dict[str, Tuple[int, int]]:
+    plans = catalog_vectors("plan", catalog.plans.docs, catalog.version, embedder)
+    devices = catalog_vectors("device", device_representatives(catalog), catalog.version, embedder)
+    return {"plan": plans.shape, "device": devices.shape}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KTShop Buddy 카탈로그 임베딩 미리 계산")
+    parser.add_argument("--local", action="store_true", help="Azure 임베딩 배포 대신 로컬 해시 임베딩 사용")
+    args = parser.parse_args()
+    if args.local:
+        embedder = CachedEmbedder(HashEmbedder(), open_embedding_cache())
+    else:
+        from buddy_core import get_embedder
+        embedder = get_embedder()
+    shapes = precompute(load_catalog(), embedder)
+    print(f"임베딩 저장: {EMBEDDING_DIR} ({embedder.model}, 요금제 {shapes['plan']}, 단말 {shapes['device']})")
+
+
+if __name__ == "__main__":
+    main()
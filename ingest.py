@@ -0,0 +1,214 @@
+import os
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Tuple
+
+from catalog import CATALOG_DIR, latest_catalog_files, read_csv_docs, plan_index_fields, device_index_fields
+
+# -------------------------
+# Ingest: docs/kt_plans_*.csv, docs/kt_devices_*.csv -> PLANS_INDEX / DEVICES_INDEX 증분 반영
+# 행을 키(planId/sntyNo)별로 해시하여 마지막으로 반영한 스냅샷과 비교하고, 바뀐 행만 merge_or_upload,
+# CSV에서 사라진 행은 delete. 배치 단위로 병렬 전송하고 실패한 배치/문서는 지수 백오프로 재시도
+# 실행: python ingest.py [--dry-run] [--full] [--local .cache/local_index]
+# -------------------------
+INGEST_STATE_PATH = os.getenv(
+    "INGEST_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ingest_state.json"),
+)
+# Azure AI Search 배치당 최대 1000건
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_PARALLELISM = int(os.getenv("INGEST_PARALLELISM", "4"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+INGEST_BACKOFF_BASE = float(os.getenv("INGEST_BACKOFF_BASE", "0.5"))
+
+# 문서별 결과 중 재시도하면 성공할 수 있는 상태 코드 (충돌, 일시적 과부하)
+RETRYABLE_STATUS = {409, 422, 429, 503}
+
+
+# -------------------------
+# 스냅샷: 키 -> 행 해시
+# -------------------------
+def csv_fields(path: str) -> List[str]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return next(csv.reader(f))
+
+
+def row_hash(doc: Dict[str, Any]) -> str:
+    raw = json.dumps(doc, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def load_rows(path: str, key_field: str,
+              index_fields: Callable[[Dict[str, Any]], Dict[str, Any]] | None = None) -> Dict[str, Dict[str, Any]]:
+    """
+    CSV 전체 컬럼을 읽어 키 -> 문서. 키가 없는 행은 제외, 키가 중복되면 뒤의 행 사용
+    index_fields가 주어지면 필터 검색용 필드(숫자/무제한/브랜드)를 계산하여 추가
+    """
+    docs = read_csv_docs(path, csv_fields(path))
+    if index_fields is not None:
+        docs = [{**d, **index_fields(d)} for d in docs]
+    return {str(d[key_field]): d for d in docs if d.get(key_field)}
+
+
+def load_state(path: str = INGEST_STATE_PATH) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, Any], path: str = INGEST_STATE_PATH) -> None:
+    # 중간에 종료돼도 이전 스냅샷이 깨지지 않도록 임시 파일에 쓴 뒤 교체
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def diff_rows(rows: Dict[str, Dict[str, Any]], last_hashes: Dict[str, str]) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, str]]:
+    """
+    (추가/변경 문서, 삭제할 키, 현재 해시) 반환
+    """
+    hashes = {k: row_hash(d) for k, d in rows.items()}
+    upserts = [rows[k] for k, h in hashes.items() if last_hashes.get(k) != h]
+    deletes = sorted(k for k in last_hashes if k not in rows)
+    return upserts, deletes, hashes
+
+
+# -------------------------
+# 전송: 배치 병렬 + 재시도
+# -------------------------
+def send_batch(action: Callable[[List[Dict[str, Any]]], List[Any]], docs: List[Dict[str, Any]], key_field: str,
+               max_retries: int = INGEST_MAX_RETRIES, backoff: float = INGEST_BACKOFF_BASE) -> Tuple[List[str], Dict[str, str]]:
+    """
+    한 배치 전송. 요청 자체가 실패하면 배치 전체를, 일부 문서만 실패하면 해당 문서만 재시도
+    (성공한 키, 실패한 키 -> 오류 메시지) 반환
+    """
+    pending = docs
+    succeeded: List[str] = []
+    # 재시도해도 성공할 수 없는 문서(4xx 등)는 이후 시도와 관계없이 실패로 유지
+    rejected: Dict[str, str] = {}
+    failed: Dict[str, str] = {}
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        try:
+            results = action(pending)
+        except Exception as e:  # 네트워크/서비스 오류: 배치 전체 재시도
+            failed = {str(d[key_field]): f"{type(e).__name__}: {e}" for d in pending}
+            continue
+        by_key = {str(d[key_field]): d for d in pending}
+        retry, failed = [], {}
+        for r in results:
+            if r.succeeded:
+                succeeded.append(r.key)
+            elif r.status_code in RETRYABLE_STATUS:
+                retry.append(by_key[r.key])
+                failed[r.key] = f"{r.status_code}: {r.error_message}"
+            else:
+                rejected[r.key] = f"{r.status_code}: {r.error_message}"
+        if not retry:
+            break
+        pending = retry
+    return succeeded, {**rejected, **failed}
+
+
+def send_all(action: Callable[[List[Dict[str, Any]]], List[Any]], docs: List[Dict[str, Any]], key_field: str,
+             batch_size: int = INGEST_BATCH_SIZE, parallelism: int = INGEST_PARALLELISM) -> Tuple[List[str], Dict[str, str]]:
+    batches = [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+    succeeded: List[str] = []
+    failed: Dict[str, str] = {}
+    if not batches:
+        return succeeded, failed
+    with ThreadPoolExecutor(max_workers=min(parallelism, len(batches))) as pool:
+        for ok, bad in pool.map(lambda b: send_batch(action, b, key_field), batches):
+            succeeded += ok
+            failed.update(bad)
+    return succeeded, failed
+
+
+def ingest_index(client: Any, index_name: str, csv_path: str, key_field: str, version: str,
+                 state: Dict[str, Any], full: bool = False, dry_run: bool = False,
+                 index_fields: Callable[[Dict[str, Any]], Dict[str, Any]] | None = None) -> Dict[str, Any]:
+    """
+    CSV 하나를 인덱스에 증분 반영하고 state[index_name]을 갱신. 실패한 문서는 스냅샷에 반영하지 않아 다음 실행에서 재시도
+    full=True 이면 모든 행을 다시 업로드하고, 삭제는 증분과 같이 마지막 스냅샷 기준으로 계산
+    """
+    last = state.get(index_name, {}).get("hashes", {})
+    rows = load_rows(csv_path, key_field, index_fields)
+    upserts, deletes, hashes = diff_rows(rows, last)
+    if full:
+        upserts = list(rows.values())
+    stats: Dict[str, Any] = {"index": index_name, "version": version, "rows": len(rows),
+                             "upserts": len(upserts), "deletes": len(deletes), "failed": {}}
+    if dry_run:
+        return stats
+
+    ok_up, failed_up = send_all(lambda b: client.merge_or_upload_documents(documents=b), upserts, key_field)
+    ok_del, failed_del = send_all(lambda b: client.delete_documents(documents=b), [{key_field: k} for k in deletes], key_field)
+
+    new_hashes = dict(last)
+    for k in ok_up:
+        new_hashes[k] = hashes[k]
+    for k in failed_up:
+        if k in new_hashes:
+            # 실패한 문서는 해시가 같아도 다음 증분 실행에서 재시도 (키는 삭제 대상으로 계속 추적)
+            new_hashes[k] = ""
+    for k in ok_del:
+        new_hashes.pop(k, None)
+    state[index_name] = {"version": version, "key": key_field, "hashes": new_hashes, "updated_at": time.time()}
+    stats["failed"] = {**failed_up, **failed_del}
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KTShop Buddy 카탈로그 CSV -> Azure AI Search 증분 반영")
+    parser.add_argument("--catalog-dir", default=CATALOG_DIR)
+    parser.add_argument("--state", help="마지막으로 반영한 스냅샷(키별 해시) 파일 (기본: INGEST_STATE_PATH, --local이면 DIR/ingest_state.json)")
+    parser.add_argument("--full", action="store_true", help="변경 여부와 관계없이 전체 문서 업로드 (CSV에서 사라진 문서 삭제는 스냅샷 기준)")
+    parser.add_argument("--dry-run", action="store_true", help="변경 건수만 출력")
+    parser.add_argument("--local", metavar="DIR", help="Azure 대신 DIR/<인덱스>.json 로컬 인덱스에 반영 (테스트용)")
+    args = parser.parse_args()
+
+    from buddy_core import PLANS_INDEX, DEVICES_INDEX, AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_API_KEY
+
+    version, plan_path, device_path = latest_catalog_files(args.catalog_dir)
+    targets = [
+        (PLANS_INDEX or "plans-index", plan_path, "planId", plan_index_fields),
+        (DEVICES_INDEX or "devices-index", device_path, "sntyNo", device_index_fields),
+    ]
+    state_path = args.state or (os.path.join(args.local, "ingest_state.json") if args.local else INGEST_STATE_PATH)
+    state = load_state(state_path)
+    failures = 0
+    for index_name, path, key_field, index_fields in targets:
+        if args.local:
+            from fakes import FakeSearchClient
+            local_path = os.path.join(args.local, f"{index_name}.json")
+            client = FakeSearchClient.load(local_path, key_field)
+        else:
+            from clients import get_search_client
+            client = get_search_client(AZURE_AI_SEARCH_ENDPOINT, index_name, AZURE_AI_SEARCH_API_KEY)
+        started = time.monotonic()
+        stats = ingest_index(client, index_name, path, key_field, version, state, full=args.full, dry_run=args.dry_run,
+                             index_fields=index_fields)
+        if args.local and not args.dry_run:
+            client.save(local_path)
+        failures += len(stats["failed"])
+        print(f"{index_name} ({os.path.basename(path)}): {stats['rows']}행, 변경 {stats['upserts']}건, "
+              f"삭제 {stats['deletes']}건, 실패 {len(stats['failed'])}건, {time.monotonic() - started:.1f}초")
+        for key, err in list(stats["failed"].items())[:10]:
+            print(f"  ⚠️ {key}: {err}")
+    if not args.dry_run:
+        save_state(state, state_path)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
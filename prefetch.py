@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+import telemetry
+from buddy_core import FAST_PATH, UserPrefs, search_candidates, recommend_joint
+
+# -------------------------
+# Prefetch: 사이드바 입력이 멈추면(debounce) 찾아보기 전에 미리 후보 검색(+ 선택적으로 LLM 추천) 실행
+# 결과는 세션별로 입력 조건 스냅샷 키에 보관하여, 찾아보기를 누르면 보통 바로 사용 (입력이 다시 바뀌면 진행 중인 작업 취소)
+# - 취소는 단계 사이에서 확인 (debounce 대기 중이면 바로 종료, 이미 시작한 검색/LLM 호출은 끝까지 실행)
+# - 끝나지 않은 작업은 찾아보기에서 기다리지 않음: 진행 중인 검색/LLM 호출은 single-flight로 합쳐지고, 끝난 호출은 캐시가 담당
+# -------------------------
+PREFETCH = os.getenv("BUDDY_PREFETCH", "1") != "0"
+PREFETCH_DEBOUNCE = float(os.getenv("PREFETCH_DEBOUNCE", "0.8"))
+# 기타 요구사항이 있을 때 LLM 추천까지 미리 실행 (찾아보기를 누르지 않으면 토큰이 낭비되므로 기본은 후보 검색만)
+PREFETCH_LLM = os.getenv("PREFETCH_LLM", "0") == "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# 세션별 보관 개수 (최근 입력 조건 순)
+PREFETCH_ENTRIES = 3
+
+
+class PrefetchCancelled(Exception):
+    """
+    입력 조건이 바뀌어 더 이상 필요 없는 작업
+    """
+
+
+@lru_cache(maxsize=None)
+def get_prefetch_pool() -> ThreadPoolExecutor:
+    """
+    프로세스 공용 prefetch 스레드 풀 (streamlit 세션 간 공유)
+    """
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+def prefetch(prefs: UserPrefs, history: List[Dict[str, Any]] | None, cancel: threading.Event) -> Dict[str, Any]:
+    """
+    debounce 후 후보 검색, LLM이 필요 없거나 PREFETCH_LLM이면 추천까지 실행
+    -> {"candidates": search_candidates 결과, "results": run_joint_pipeline과 같은 형태 또는 None(후보만 조회)}
+    """
+    if cancel.wait(PREFETCH_DEBOUNCE):
+        raise PrefetchCancelled()
+    with telemetry.trace("prefetch"):
+        candidates = search_candidates(prefs)
+        if cancel.is_set():
+            raise PrefetchCancelled()
+        if not (PREFETCH_LLM or (FAST_PATH and not prefs.notes.strip())):
+            return {"candidates": candidates, "results": None}
+        recs = recommend_joint(prefs, candidates["plan"][0], candidates["device"][0], history)
+    if cancel.is_set():
+        raise PrefetchCancelled()
+    results = {
+        name: {"candidates": cands, "reply": recs[name]["reply"], "parsed": recs[name]["parsed"],
+               "errors": errors + recs[name]["errors"]}
+        for name, (cands, errors) in candidates.items()
+    }
+    return {"candidates": candidates, "results": results}
+
+
+class Prefetcher:
+    """
+    세션별 prefetch 작업 (st.session_state에 보관). 작업은 get_prefetch_pool()에서 실행하고 결과만 이 객체에 남김
+    """
+    def __init__(self, max_entries: int = PREFETCH_ENTRIES):
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[str, Tuple[Future, threading.Event]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cancel_pending(self) -> None:
+        for future, cancel in self._jobs.values():
+            _cancel(future, cancel)
+
+    def schedule(self, key: str, prefs: UserPrefs, history: List[Dict[str, Any]] | None = None) -> None:
+        """
+        입력 조건(key)이 바뀔 때마다 호출. 같은 key의 작업이 진행 중이거나 성공했으면 그대로 두고, 아니면 다른 진행 중인 작업을 취소하고 새로 실행
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and _reusable(*job):
+                self._jobs.move_to_end(key)
+                return
+            # 취소/실패한 작업은 없는 것으로 보고 다시 실행 (A -> B -> A로 되돌아온 경우 등)
+            self._jobs.pop(key, None)
+            self._cancel_pending()
+            cancel = threading.Event()
+            future = get_prefetch_pool().submit(prefetch, prefs, history, cancel)
+            future.add_done_callback(_count_result)
+            self._jobs[key] = (future, cancel)
+            while len(self._jobs) > self.max_entries:
+                self._jobs.popitem(last=False)
+
+    def take(self, key: str) -> Dict[str, Any] | None:
+        """
+        찾아보기: key의 작업이 끝났으면 결과를 꺼내 반환, 아니면 진행 중인 작업을 모두 취소하고 None
+        """
+        with self._lock:
+            future, cancel = self._jobs.pop(key, (None, None))
+            hit = future is not None and future.done() and not future.cancelled() and future.exception() is None
+            if not hit:
+                # 꺼낸 작업도 결과를 사용하지 않으므로 함께 취소
+                if future is not None:
+                    _cancel(future, cancel)
+                self._cancel_pending()
+        telemetry.record_cache("prefetch", hit)
+        return future.result() if hit else None
+
+
+def _cancel(future: Future, cancel: threading.Event) -> None:
+    if not future.done():
+        cancel.set()
+        future.cancel()
+
+
+def _reusable(future: Future, cancel: threading.Event) -> bool:
+    """
+    진행 중이거나 성공한 작업만 재사용 (취소 요청을 받았거나 실패한 작업은 제외)
+    """
+    if not future.done():
+        return not cancel.is_set()
+    return not future.cancelled() and future.exception() is None
+
+
+def _count_result(future: Future) -> None:
+    if future.cancelled() or isinstance(future.exception(), PrefetchCancelled):
+        result = "cancelled"
+    elif future.exception() is not None:
+        result = "error"
+    else:
+        result = "done"
+    telemetry.inc("buddy_prefetch_total", result=result)
@@ -0,0 +1,127 @@
+from typing import Dict, Any, List
+
+from catalog import parse_number, is_unlimited_text
+
+# -------------------------
+# Ranker: 기타 요구사항이 없을 때 LLM 없이 점수 순서 그대로 Top3 추천 생성
+# (LLM 응답과 동일한 recommendations/alternatives 구조로 반환하여 build_combinations 등에서 그대로 사용)
+# -------------------------
+def _won(x: float) -> str:
+    return f"{int(round(x)):,}원" if x == x else "-"
+
+
+def plan_reasons(doc: Dict[str, Any], data_gb: int | None, budget: int, data_unlimited: bool) -> tuple[List[str], List[str]]:
+    """
+    요금제 추천 이유/주의사항 템플릿 (가격 차이, 데이터 일치 여부)
+    """
+    reasons, caveats = [], []
+    fee = parse_number(doc.get("monthly_fee"))
+    gb = parse_number(doc.get("data_gb"))
+    unlimited = is_unlimited_text(doc.get("data_gb"))
+
+    if fee == fee:
+        gap = budget - fee
+        if gap >= 0:
+            reasons.append(f"월정액 {_won(fee)}으로 예산 {_won(budget)}보다 {_won(gap)} 저렴해요" if gap else f"월정액 {_won(fee)}으로 예산과 같아요")
+        else:
+            caveats.append(f"월정액 {_won(fee)}으로 예산보다 {_won(-gap)} 비싸요")
+    if unlimited:
+        reasons.append("데이터 무제한 요금제예요" if data_unlimited else f"데이터 무제한이라 월 {data_gb}GB 사용에 여유가 있어요")
+    elif gb == gb and data_gb is not None:
+        if gb >= data_gb:
+            reasons.append(f"데이터 {doc.get('data_gb')}로 희망 사용량 {data_gb}GB를 충족해요")
+        else:
+            caveats.append(f"데이터 {doc.get('data_gb')}로 희망 사용량 {data_gb}GB보다 적어요")
+        if doc.get("throttling"):
+            caveats.append(f"데이터 소진 시: {doc.get('throttling')}")
+    if doc.get("benefit_1"):
+        reasons.append(f"혜택: {doc.get('benefit_1')}")
+    return reasons, caveats
+
+
+def rank_plans(candidates: List[Dict[str, Any]], data_gb: int | None, budget: int, data_unlimited: bool, k: int = 3) -> Dict[str, Any]:
+    """
+    점수순으로 정렬된 요금제 후보에서 Top k 추천과 대안 생성. 무제한 요청 시 무제한 요금제만 대상
+    """
+    pool = [d for d in candidates if is_unlimited_text(d.get("data_gb"))] if data_unlimited else list(candidates)
+    recs = []
+    for rank, d in enumerate(pool[:k], 1):
+        fee = parse_number(d.get("monthly_fee"))
+        fee = int(fee) if fee == fee else None
+        reasons, caveats = plan_reasons(d, data_gb, budget, data_unlimited)
+        recs.append({
+            "rank": rank,
+            "plan": {"planId": d.get("planId"), "name": d.get("plan_name"), "monthly_fee": fee, "data_gb": d.get("data_gb"), "voice": d.get("voice")},
+            "monthly_total": fee,
+            "tco": fee,
+            "reasons": reasons,
+            "caveats": caveats,
+        })
+    alts = [f"{d.get('plan_name')} (월 {_won(parse_number(d.get('monthly_fee')))}, 데이터 {d.get('data_gb')})" for d in pool[k:k + 2]]
+    return {"recommendations": recs, "alternatives": alts}
+
+
+def device_reasons(doc: Dict[str, Any], device_budget: int, brand_pref: List[str], lightest: float | None) -> tuple[List[str], List[str]]:
+    """
+    단말 추천 이유/주의사항 템플릿 (가격 차이, 브랜드 일치, 무게)
+    """
+    reasons, caveats = [], []
+    price = parse_number(doc.get("price"))
+    weight = parse_number(doc.get("weight_g"))
+
+    if price == price:
+        gap = device_budget - price
+        if gap >= 0:
+            reasons.append(f"출고가 {_won(price)}으로 예산 {_won(device_budget)} 이내예요")
+        else:
+            caveats.append(f"출고가 {_won(price)}으로 예산보다 {_won(-gap)} 비싸요")
+    if brand_pref:
+        if (doc.get("brand") or "").lower() in [b.lower() for b in brand_pref]:
+            reasons.append(f"선호 브랜드({doc.get('brand')})와 일치해요")
+        else:
+            caveats.append(f"선호 브랜드가 아닌 {doc.get('brand')} 단말이에요")
+    if weight == weight:
+        if lightest is not None and weight <= lightest:
+            reasons.append(f"무게 {int(weight)}g으로 후보 중 가장 가벼워요")
+        elif weight >= 220:
+            caveats.append(f"무게 {int(weight)}g으로 무거운 편이에요")
+    caveats.append("가격은 출고가 기준이며 지원금은 반영되지 않았어요")
+    return reasons, caveats
+
+
+def rank_devices(candidates: List[Dict[str, Any]], device_budget: int, brand_pref: List[str], k: int = 3) -> Dict[str, Any]:
+    """
+    점수순으로 정렬된 단말 후보에서 Top k 추천과 대안 생성
+    """
+    weights = [w for w in (parse_number(d.get("weight_g")) for d in candidates) if w == w]
+    lightest = min(weights) if weights else None
+    recs = []
+    for rank, d in enumerate(candidates[:k], 1):
+        reasons, caveats = device_reasons(d, device_budget, brand_pref, lightest)
+        recs.append({
+            "rank": rank,
+            "device": {
+                "prodNo": d.get("prodNo"), "sntyNo": d.get("sntyNo"),
+                "brand": d.get("brand"), "model": d.get("model"), "storage_gb": d.get("storage_gb"), "color": d.get("color"),
+                "price": d.get("price"), "weight_g": d.get("weight_g"), "display_size_cm": d.get("display_size_cm"),
+            },
+            "reasons": reasons,
+            "caveats": caveats,
+        })
+    alts = [f"{d.get('brand')} {d.get('model')} {d.get('storage_gb')} ({_won(parse_number(d.get('price')))})" for d in candidates[k:k + 2]]
+    return {"recommendations": recs, "alternatives": alts}
+
+
+def describe(parsed: Dict[str, Any], kind: str) -> str:
+    """
+    '버디의 생각'에 보여줄 설명 텍스트 (LLM 응답의 설명 부분 대체)
+    """
+    lines = ["기타 요구사항이 없어 조건 점수 순으로 바로 추천했어요.", ""]
+    for item in parsed.get("recommendations", []):
+        target = item.get("plan" if kind == "plan" else "device", {})
+        name = target.get("name") if kind == "plan" else f"{target.get('brand')} {target.get('model')} {target.get('storage_gb')}"
+        lines.append(f"**{item['rank']}. {name}**")
+        lines.extend(f"- {r}" for r in item.get("reasons", []))
+        lines.extend(f"- ⚠️ {c}" for c in item.get("caveats", []))
+        lines.append("")
+    return "\n".join(lines).strip()
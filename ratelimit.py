@@ -0,0 +1,230 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Deque, Iterator
+
+import telemetry
+
+# -------------------------
+# Rate Limit: Azure OpenAI 호출 승인 제어 (프로세스 공용)
+# - 토큰 버킷: 배포의 분당 토큰(TPM) 한도 안에서 (프롬프트 추정 + max_tokens)만큼 예약 후 호출, 실제 사용량으로 정산
+# - AIMD 동시 호출 창: 성공하면 조금씩(+1/창) 늘리고, 429를 받으면 절반으로 줄인 뒤 Retry-After 동안 새 호출 중단
+# - 대기열: 최대 LLM_QUEUE_SIZE개까지만 기다리고(초과 시 즉시 거절), 기한(LLM_QUEUE_TIMEOUT) 안에 호출하지 못하면 거절
+# 한도를 넘는 순간 모든 사용자가 동시에 실패하는 대신, 처리량을 한도 근처로 유지하고 넘치는 요청만 빠르게 거절
+# -------------------------
+# 배포의 분당 토큰 한도. 0이면 토큰 버킷 없이 동시 호출 창만 사용 (여러 워커 프로세스면 프로세스별 몫으로 설정)
+AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = 1
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Retry-After 헤더가 없을 때 429 재시도 대기(초) = base * 2^시도 (지터 포함)
+LLM_BACKOFF_BASE = 1.0
+
+
+class RateLimitExceeded(Exception):
+    """
+    대기열이 가득 찼거나 기한 안에 호출 승인을 받지 못한 경우
+    """
+
+
+def throttle_delay(e: Exception) -> float | None:
+    """
+    429 오류면 Retry-After(초, 없으면 0), 아니면 None. openai.RateLimitError와 같은 형태(status_code, response.headers) 사용
+    """
+    if getattr(e, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue
+    return 0.0
+
+
+def usage_tokens(usage: Any) -> int | None:
+    if usage is None:
+        return None
+    return (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+
+
+class TokenBucket:
+    """
+    분당 tokens_per_minute개가 연속으로 채워지는 버킷 (최대 1분치). 잠금은 호출하는 쪽(AdaptiveLimiter)에서 처리
+    """
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        self._refill(now)
+        # 한 번에 버킷 용량보다 큰 요청은 가득 찬 상태에서 허용
+        need = min(n, self.capacity)
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self.tokens -= n
+
+    def settle(self, reserved: float, used: float) -> None:
+        # 예약보다 적게 쓰면 돌려주고, 많이 쓰면 다음 호출이 그만큼 기다림
+        self.tokens = min(self.capacity, self.tokens + reserved - used)
+
+    def drain(self) -> None:
+        self.tokens = min(self.tokens, 0.0)
+
+
+class AdaptiveLimiter:
+    """
+    토큰 버킷 + AIMD 동시 호출 창 + 기한이 있는 FIFO 대기열
+    request()로 호출하면 승인 -> 호출 -> (429면 창 축소 후 재시도) -> 완료 시 반납 순서로 처리
+    """
+    def __init__(self, tokens_per_minute: int = AZURE_OPENAI_TPM, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 min_concurrency: int = LLM_MIN_CONCURRENCY, queue_size: int = LLM_QUEUE_SIZE,
+                 timeout: float = LLM_QUEUE_TIMEOUT, max_retries: int = LLM_MAX_RETRIES):
+        self.bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = float(max_concurrency)
+        self.min_concurrency = float(min_concurrency)
+        self.window = float(max_concurrency)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._decreased_at = -float("inf")
+        self._queue: Deque[object] = deque()
+        self._cond = threading.Condition()
+
+    # ----- 승인 / 반납 -----
+    def _wait_time(self, ticket: object, tokens: float, now: float) -> float:
+        """
+        지금 승인할 수 있으면 0, 아니면 다시 확인할 때까지 기다릴 시간
+        순서/빈 자리를 기다리는 경우는 inf (반납/순서 변경 시 notify로 깨우고, 기한이 지나면 거절)
+        """
+        if self._queue[0] is not ticket or self.in_flight >= max(self.min_concurrency, int(self.window)):
+            return float("inf")
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.bucket is not None:
+            return self.bucket.wait_time(tokens, now)
+        return 0.0
+
+    def _acquire(self, tokens: float, deadline: float) -> None:
+        ticket = object()
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                telemetry.inc("buddy_llm_rejected_total", reason="queue_full")
+                raise RateLimitExceeded("요청이 많아 대기열이 가득 찼어요. 잠시 후 다시 시도해주세요.")
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    remaining = deadline - now
+                    wait = self._wait_time(ticket, tokens, now)
+                    if wait <= 0:
+                        self._queue.popleft()
+                        self.in_flight += 1
+                        if self.bucket is not None:
+                            self.bucket.take(tokens)
+                        self._cond.notify_all()
+                        return
+                    if remaining <= 0:
+                        telemetry.inc("buddy_llm_rejected_total", reason="timeout")
+                        raise RateLimitExceeded(f"{self.timeout:g}초 안에 호출 순서가 오지 않았어요. 잠시 후 다시 시도해주세요.")
+                    self._cond.wait(min(wait, remaining))
+            except BaseException:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+                raise
+
+    def _release(self, success: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if success:
+                # 창 크기만큼 성공하면 창이 1 늘어남 (additive increase)
+                self.window = min(self.max_concurrency, self.window + 1.0 / self.window)
+            self._cond.notify_all()
+
+    def _throttle(self, retry_after: float) -> None:
+        """
+        429: 진행 중이던 호출을 반납하고 창을 절반으로 (같은 과부하로 동시에 받은 429는 1회만 반영)
+        Retry-After 동안은 새 호출을 승인하지 않고, 버킷도 비워 한도가 다시 찰 때까지 기다림
+        """
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if now >= self._decreased_at + max(retry_after, 1.0):
+                self.window = max(self.min_concurrency, self.window / 2)
+                self._decreased_at = now
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            if self.bucket is not None:
+                self.bucket.drain()
+            self._cond.notify_all()
+
+    def settle(self, reserved: float, usage: Any) -> None:
+        """
+        응답의 실제 토큰 사용량(usage)으로 예약한 토큰 정산
+        """
+        used = usage_tokens(usage)
+        if used is None or self.bucket is None:
+            return
+        with self._cond:
+            self.bucket.settle(reserved, used)
+            self._cond.notify_all()
+
+    # ----- 호출 -----
+    @contextmanager
+    def request(self, call: Callable[[], Any], tokens: float, timeout: float | None = None) -> Iterator[Any]:
+        """
+        승인을 받아 call()을 실행하고 결과를 넘겨줌. with 블록이 끝날 때(스트림을 다 읽은 뒤) 동시 호출 자리 반납
+        429면 Retry-After(없으면 지수 백오프)만큼 기다렸다가 최대 max_retries회 재시도. 기한은 승인 대기에만 적용
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        attempt = 0
+        while True:
+            with telemetry.span("llm_queue"):
+                self._acquire(tokens, deadline)
+            try:
+                result = call()
+                break
+            except Exception as e:
+                retry_after = throttle_delay(e)
+                if retry_after is None:
+                    self._release(success=False)
+                    raise
+                telemetry.inc("buddy_llm_throttled_total")
+                if not retry_after:
+                    retry_after = LLM_BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random())
+                self._throttle(retry_after)
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + retry_after >= deadline:
+                    raise
+        success = False
+        try:
+            yield result
+            success = True
+        finally:
+            self._release(success)
+
+
+@lru_cache(maxsize=None)
+def get_llm_limiter() -> AdaptiveLimiter:
+    """
+    프로세스 공용 LLM 호출 제한 (streamlit 세션/API 요청 간 공유)
+    """
+    return AdaptiveLimiter()
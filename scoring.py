@@ -0,0 +1,74 @@
+import math
+from typing import List
+
+import numpy as np
+
+from catalog import PlanTable, DeviceTable
+
+# -------------------------
+# Scoring: 후보 전체를 NumPy 배열로 한번에 점수 계산 (score_plan / score_device 와 동일한 가중치)
+# -------------------------
+W_GB, W_PRICE = 0.6, 0.4
+BRAND_BONUS = -0.5
+# 값이 없는 경우의 기본 편차 (요금제 가격 10000원, 데이터 5GB, 단말 가격 50만원)
+MISSING_PRICE_GAP = 10000.0
+MISSING_GB_GAP = 5.0
+MISSING_DEVICE_PRICE_GAP = 5e5
+
+
+def score_plans(table: PlanTable, target_gb: float | None, target_price: float | None, want_unlimited: bool) -> np.ndarray:
+    """
+    요금제 점수 일괄 계산. 점수가 낮을수록 조건에 적합
+    무제한 요청이면 무제한이 아닌 요금제는 math.inf, 아니면 데이터/가격 편차 가중치(0.6/0.4).
+    """
+    price = table.monthly_fee
+    # 데이터나 가격 정보가 없는 경우 디폴트 패널티(5GB/10000원 차이) 부여
+    if target_price is None:
+        price_gap = np.full(len(table), MISSING_PRICE_GAP)
+    else:
+        price_gap = np.where(np.isnan(price), MISSING_PRICE_GAP, np.abs(price - target_price))
+
+    if want_unlimited:
+        return np.where(table.unlimited, W_PRICE * (price_gap / 10000.0), math.inf)
+
+    gb = table.data_gb
+    if target_gb is None:
+        gb_gap = np.full(len(table), MISSING_GB_GAP)
+    else:
+        gb_gap = np.where(np.isnan(gb), MISSING_GB_GAP, np.abs(gb - target_gb))
+    return W_GB * gb_gap + W_PRICE * (price_gap / 10000.0)
+
+
+def score_devices(table: DeviceTable, target_price: float | None, brand_pref: List[str]) -> np.ndarray:
+    """
+    단말 점수 일괄 계산. 가격 차이(만원 단위) + 선호 브랜드 보너스
+    """
+    price = table.price
+    # 가격 정보가 없는 경우 후보에서 제외될 수 있도록 큰 값 부여
+    if target_price is None:
+        price_gap = np.full(len(table), MISSING_DEVICE_PRICE_GAP)
+    else:
+        price_gap = np.where(np.isnan(price), MISSING_DEVICE_PRICE_GAP, np.abs(price - target_price))
+
+    bonus = np.zeros(len(table))
+    if brand_pref:
+        prefs = [b.lower() for b in brand_pref]
+        bonus[np.isin(table.brand, prefs)] = BRAND_BONUS
+    return (price_gap / 10000.0) + bonus
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    점수 오름차순 상위 k개 인덱스. argpartition으로 후보를 좁힌 뒤 k개만 정렬.
+    동점은 원래 순서를 유지 (list.sort 안정 정렬과 동일한 결과)
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(scores, kind="stable")
+    kth = scores[np.argpartition(scores, k - 1)[k - 1]]
+    less = np.flatnonzero(scores < kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(less)]
+    idx = np.concatenate([less, ties])
+    return idx[np.argsort(scores[idx], kind="stable")]
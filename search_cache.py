@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Hashable, Tuple, List
+
+import telemetry
+
+# -------------------------
+# Search Cache: Azure Search 결과를 버킷화된 쿼리 기준으로 메모리에 보관 (프로세스 공용)
+# -------------------------
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+BUDGET_BUCKET = 10000
+DEVICE_BUDGET_BUCKET = 100000
+DATA_GB_BUCKET = 10
+
+
+def bucket(value: float | None, step: int) -> int | None:
+    """
+    값을 step 단위로 반올림. 예산 슬라이더 1,000원 단위 변화가 서로 다른 검색어가 되지 않도록 정규화
+    """
+    if value is None:
+        return None
+    return max(step, int(round(value / step)) * step)
+
+
+def bucket_data_gb(data_gb: float | None) -> int | None:
+    """
+    데이터는 10GB 미만은 그대로, 이상은 10GB 단위로 버킷화
+    """
+    if data_gb is None:
+        return None
+    return int(data_gb) if data_gb < DATA_GB_BUCKET else bucket(data_gb, DATA_GB_BUCKET)
+
+
+def plan_query_key(data_gb: int | None, budget: int, data_unlimited: bool) -> Tuple[Hashable, ...]:
+    # 무제한 검색어는 데이터/예산과 무관
+    if data_unlimited:
+        return ("plans", True, None, None)
+    return ("plans", False, bucket_data_gb(data_gb), bucket(budget, BUDGET_BUCKET))
+
+
+def device_query_key(device_budget: int, brand_pref: List[str]) -> Tuple[Hashable, ...]:
+    brands = tuple(sorted({b.strip().lower() for b in brand_pref or []}))
+    return ("devices", brands, bucket(device_budget, DEVICE_BUDGET_BUCKET))
+
+
+class SearchResultCache:
+    """
+    LRU + TTL 검색 결과 캐시. 카탈로그 버전이 다른 항목은 만료로 간주
+    """
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, ttl_seconds: float = SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[str, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: str) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != version or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, version: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (version, time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, version: str, loader: Callable[[], Any]) -> Any:
+        value = self.get(key, version)
+        telemetry.record_cache("search", value is not None)
+        if value is None:
+            value = loader()
+            self.put(key, version, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+@lru_cache(maxsize=None)
+def get_search_cache() -> SearchResultCache:
+    """
+    프로세스 공용 검색 캐시 (streamlit 세션 간 공유)
+    """
+    return SearchResultCache()
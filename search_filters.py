@@ -0,0 +1,169 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable
+
+import numpy as np
+
+from catalog import PLAN_FIELDS, DEVICE_FIELDS, PlanTable, DeviceTable, parse_number
+from scoring import (
+    W_GB, W_PRICE, BRAND_BONUS, MISSING_PRICE_GAP, MISSING_GB_GAP,
+    score_plans, score_devices,
+)
+
+# -------------------------
+# Search Filters: Azure AI Search $filter/$orderby 기반 후보 조회 (SEARCH_MODE=filter)
+# 받지 않은 문서의 점수(scoring.py) 하한보다 점수가 낮은 후보가 min_results개 이상 모일 때까지만 조회하여
+# 전체 카탈로그 기준 Top N을 반드시 포함하는 작은 후보 집합 반환
+# - 요금제: 점수 radius 이하를 모두 포함하는 데이터/요금 범위 필터로 조회, 부족하면 radius 확대
+# - 단말: 예산 기준 위/아래로 가격 정렬($orderby)하여 가까운 순서로 페이지 조회
+# -------------------------
+PLAN_RADIUS_START = 6.0      # 요금 ±15만원, 데이터 ±10GB
+RADIUS_GROWTH = 2.0
+RADIUS_MAX = 256.0           # 이 이상이면 숫자 범위 없이 조회
+MAX_DOCS = 1000
+
+PLAN_ORDER_BY = ["monthly_fee_value asc", "planId asc"]
+DEVICE_ORDER_BY = ["price_value asc", "sntyNo asc"]
+
+
+def _lit(v: float) -> str:
+    return f"{v:.4f}".rstrip("0").rstrip(".")
+
+
+def _range(field: str, center: float, radius: float, null_gap: float | None) -> str:
+    """
+    center ± radius 범위 조건. 값이 없는 문서의 편차(null_gap)가 radius 이하이면 null 문서도 포함
+    경계는 부동소수 오차로 빠지는 문서가 없도록 바깥쪽으로 반올림
+    """
+    lo, hi = math.floor(center - radius - 1e-6), math.ceil(center + radius + 1e-6)
+    cond = f"{field} ge {_lit(lo)} and {field} le {_lit(hi)}"
+    if null_gap is not None and null_gap <= radius:
+        return f"({field} eq null or ({cond}))"
+    return f"({cond})"
+
+
+def plan_filter(data_gb: float | None, budget: float, data_unlimited: bool, radius: float | None) -> str | None:
+    """
+    score_plans 점수가 radius 이하인 요금제를 모두 포함하는 $filter. radius=None이면 숫자 범위 없음("" = 필터 없음)
+    조건을 만족할 수 있는 문서가 없으면 None
+    """
+    if data_unlimited:
+        base = "data_unlimited eq true"
+        if radius is None:
+            return base
+        return f"{base} and {_range('monthly_fee_value', budget, radius / W_PRICE * 10000, MISSING_PRICE_GAP)}"
+    if radius is None:
+        return ""
+    # 0.6 * 데이터 편차 + 0.4 * 가격 편차(만원) <= radius 이면 각 편차도 개별적으로 범위 이내
+    clauses = []
+    if data_gb is None:
+        if W_GB * MISSING_GB_GAP > radius:
+            return None
+        rest = radius - W_GB * MISSING_GB_GAP
+    else:
+        clauses.append(_range("data_gb_value", data_gb, radius / W_GB, MISSING_GB_GAP))
+        rest = radius
+    clauses.append(_range("monthly_fee_value", budget, rest / W_PRICE * 10000, MISSING_PRICE_GAP))
+    return " and ".join(clauses)
+
+
+def collect(client: Any, flt: str | None, order_by: List[str], select: List[str], page_size: int,
+            max_docs: int = MAX_DOCS, skip: int = 0) -> List[Dict[str, Any]]:
+    """
+    필터 결과를 order_by 순서로 skip 이후부터 page_size씩 끝까지 조회 (최대 max_docs)
+    """
+    docs: List[Dict[str, Any]] = []
+    while len(docs) < max_docs:
+        page = [dict(r) for r in client.search(
+            search_text="*",
+            filter=flt or None,
+            order_by=order_by,
+            select=select,
+            top=min(page_size, max_docs - len(docs)),
+            skip=skip + len(docs),
+            include_total_count=False,
+        )]
+        docs += page
+        if len(page) < page_size:
+            break
+    return docs
+
+
+def _ring(flt: str | None, prev: str | None) -> str | None:
+    """
+    이전 radius 범위(prev)에서 이미 받은 문서를 제외한 조건
+    """
+    if flt is None or not prev:
+        return flt
+    return f"not ({prev})" if flt == "" else f"({flt}) and not ({prev})"
+
+
+def _widen(radius_start: float, make_filter: Callable[[float | None], str | None],
+           fetch: Callable[[str], List[Dict[str, Any]]], enough: Callable[[List[Dict[str, Any]], float], bool]) -> List[Dict[str, Any]]:
+    """
+    radius를 RADIUS_GROWTH배씩 넓히며 새로 포함된 범위의 문서만 추가 조회. RADIUS_MAX 이상이면 나머지 전체 조회
+    """
+    docs: List[Dict[str, Any]] = []
+    prev: str | None = None
+    radius = radius_start
+    while True:
+        final = radius >= RADIUS_MAX
+        flt = make_filter(None if final else radius)
+        ring = _ring(flt, prev)
+        if ring is not None:
+            docs += fetch(ring)
+            prev = flt
+        if final or enough(docs, radius):
+            return docs
+        radius *= RADIUS_GROWTH
+
+
+def search_plans(client: Any, data_gb: int | None, budget: int, data_unlimited: bool,
+                 min_results: int, page_size: int) -> PlanTable:
+    target_gb = float(data_gb) if data_gb is not None else None
+
+    def enough(docs: List[Dict[str, Any]], radius: float) -> bool:
+        scores = score_plans(PlanTable.from_docs(docs), target_gb, float(budget), data_unlimited)
+        return int(np.count_nonzero(scores <= radius)) >= min_results
+
+    docs = _widen(
+        PLAN_RADIUS_START,
+        lambda radius: plan_filter(target_gb, float(budget), data_unlimited, radius),
+        lambda flt: collect(client, flt, PLAN_ORDER_BY, PLAN_FIELDS, page_size),
+        enough,
+    )
+    return PlanTable.from_docs(docs)
+
+
+def search_devices(client: Any, device_budget: int, brand_pref: List[str], min_results: int, page_size: int) -> DeviceTable:
+    """
+    예산 이상은 price_value asc, 미만은 price_value desc로 정렬하여 예산에 가까운 순서로 양쪽 페이지를 동시에 조회
+    양쪽에서 받은 가격 구간 밖의 단말은 점수가 bound 이상이므로, 중복 제거 후 bound 미만 대표 단말이 min_results개 이상이면 종료
+    """
+    budget = float(device_budget)
+    bonus = BRAND_BONUS if any(b and b.strip() for b in brand_pref or []) else 0.0
+    sides = [
+        {"filter": f"price_value ge {_lit(budget)}", "order_by": ["price_value asc", "sntyNo asc"], "docs": [], "done": False},
+        {"filter": f"price_value lt {_lit(budget)}", "order_by": ["price_value desc", "sntyNo asc"], "docs": [], "done": False},
+    ]
+
+    def fetch_page(side: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return collect(client, side["filter"], side["order_by"], DEVICE_FIELDS, page_size,
+                       max_docs=page_size, skip=len(side["docs"]))
+
+    with ThreadPoolExecutor(max_workers=len(sides) + 1) as pool:
+        # 가격 없는 단말(점수 = 50만원 편차)은 첫 페이지와 함께 조회 (보통 0건)
+        nulls = pool.submit(collect, client, "price_value eq null", DEVICE_ORDER_BY, DEVICE_FIELDS, page_size)
+        while True:
+            pending = [side for side in sides if not side["done"]]
+            for side, page in zip(pending, pool.map(fetch_page, pending)):
+                side["docs"] += page
+                side["done"] = len(page) < page_size or len(side["docs"]) >= MAX_DOCS
+            table = DeviceTable.from_docs(sides[0]["docs"] + sides[1]["docs"] + nulls.result())
+            if all(side["done"] for side in sides):
+                return table
+            # 끝까지 받은 쪽은 제한 없음, 아니면 마지막으로 받은 가격까지 (같은 가격이 다음 페이지에 있을 수 있어 미만으로 비교)
+            covered = min(math.inf if side["done"] else abs(parse_number(side["docs"][-1].get("price")) - budget) for side in sides)
+            scores = score_devices(table, budget, brand_pref)[table.dedupe_indices]
+            if int(np.count_nonzero(scores < covered / 10000 + bonus)) >= min_results:
+                return table
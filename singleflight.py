@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import telemetry
+
+# -------------------------
+# Single Flight: 같은 키로 동시에 들어온 요청을 1회 실행으로 합침 (프로세스 공용)
+# 신규 단말 출시 등으로 같은 조건의 요청이 몰릴 때 검색/LLM 호출이 요청 수만큼 중복되지 않도록 함
+# 결과 보관은 하지 않음 (완료 후 들어온 요청은 검색/응답 캐시가 담당)
+# -------------------------
+
+
+class SingleFlight:
+    """
+    먼저 들어온 호출(leader)이 fn을 실행하고, 실행 중에 같은 키로 들어온 호출(follower)은 같은 결과를 기다림
+    fn이 예외를 던지면 기다리던 호출 모두에 같은 예외를 전달
+    """
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        (결과, 다른 호출의 결과를 공유받았는지) 반환
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            telemetry.inc("buddy_singleflight_total", stage=self.stage, role="follower")
+            with telemetry.span("singleflight_wait", kind=self.stage):
+                return future.result(), True
+
+        telemetry.inc("buddy_singleflight_total", stage=self.stage, role="leader")
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
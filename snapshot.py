@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import mmap
+import glob
+import time
+import threading
+import argparse
+from collections.abc import Sequence
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from catalog import (
+    CATALOG_DIR, CATALOG_RELOAD_INTERVAL, PLAN_FIELDS, DEVICE_FIELDS, Catalog, PlanTable, DeviceTable,
+    latest_catalog_files, read_csv_docs,
+)
+
+# -------------------------
+# Snapshot: 날짜별 카탈로그(_YYMMDD)를 바이너리 컬럼 스냅샷으로 컴파일하고 mmap으로 열기
+# 숫자 컬럼은 배열 그대로, 문자열은 중복 제거한 문자열 테이블의 id로 저장하여
+# 워커 프로세스마다 CSV를 다시 파싱하지 않고, 같은 파일의 메모리 페이지를 프로세스끼리 공유
+# 실행: python snapshot.py  (docs의 최신 CSV -> CATALOG_SNAPSHOT_DIR/catalog_YYMMDD.bin)
+# -------------------------
+CATALOG_SNAPSHOT_DIR = os.getenv(
+    "CATALOG_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "catalog"),
+)
+
+MAGIC = b"KTCATSN1"
+ALIGN = 64
+NO_STRING = -1
+SNAPSHOT_RE = re.compile(r"catalog_(\d{6})\.bin$")
+
+
+# -------------------------
+# 컴파일
+# -------------------------
+class _Writer:
+    """
+    배열 블록을 ALIGN 단위로 이어 붙이고 (dtype, offset, 개수)를 기록
+    """
+    def __init__(self):
+        self.blocks: List[bytes] = []
+        self.size = 0
+
+    def add(self, arr: np.ndarray) -> Dict[str, Any]:
+        arr = np.ascontiguousarray(arr)
+        pad = -self.size % ALIGN
+        if pad:
+            self.blocks.append(b"\0" * pad)
+            self.size += pad
+        desc = {"dtype": arr.dtype.str, "offset": self.size, "count": int(arr.size)}
+        data = arr.tobytes()
+        self.blocks.append(data)
+        self.size += len(data)
+        return desc
+
+
+class _Interner:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def id(self, s: Any) -> int:
+        if s is None:
+            return NO_STRING
+        return self.ids.setdefault(str(s), len(self.ids))
+
+
+def _table_columns(w: _Writer, strings: _Interner, docs: List[Dict[str, Any]], fields: List[str],
+                   numeric: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    return {
+        "rows": len(docs),
+        "fields": fields,
+        "strings": {f: w.add(np.array([strings.id(d.get(f)) for d in docs], dtype=np.int32)) for f in fields},
+        "numeric": {name: w.add(arr) for name, arr in numeric.items()},
+    }
+
+
+def compile_snapshot(catalog_dir: str = CATALOG_DIR, out_dir: str = CATALOG_SNAPSHOT_DIR) -> str:
+    """
+    최신 CSV를 기존 파서(PlanTable/DeviceTable.from_docs)로 읽어 out_dir/catalog_YYMMDD.bin 생성. 경로 반환
+    """
+    version, plan_path, device_path = latest_catalog_files(catalog_dir)
+    plans = PlanTable.from_docs(read_csv_docs(plan_path, PLAN_FIELDS))
+    devices = DeviceTable.from_docs(read_csv_docs(device_path, DEVICE_FIELDS))
+
+    w, strings = _Writer(), _Interner()
+    tables = {
+        "plans": _table_columns(w, strings, plans.docs, PLAN_FIELDS, {
+            "monthly_fee": plans.monthly_fee,
+            "data_gb": plans.data_gb,
+            "unlimited": plans.unlimited.astype(np.uint8),
+        }),
+        "devices": _table_columns(w, strings, devices.docs, DEVICE_FIELDS, {
+            "price": devices.price,
+            "weight_g": devices.weight_g,
+            "brand": np.array([strings.id(b) for b in devices.brand], dtype=np.int32),
+            "dedupe_indices": devices.dedupe_indices.astype(np.int64),
+        }),
+    }
+    encoded = [s.encode("utf-8") for s in strings.ids]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+    string_table = {"offsets": w.add(offsets), "data": w.add(np.frombuffer(b"".join(encoded), dtype=np.uint8))}
+
+    header = json.dumps({"version": version, "created_at": time.time(), "tables": tables, "strings": string_table},
+                        ensure_ascii=False).encode("utf-8")
+    start = len(MAGIC) + 8 + len(header)
+    start += -start % ALIGN
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"catalog_{version}.bin")
+    # 실행 중인 워커가 쓰다 만 파일을 열지 않도록 임시 파일에 쓴 뒤 교체
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        f.write(b"\0" * (start - f.tell()))
+        for b in w.blocks:
+            f.write(b)
+    os.replace(tmp, path)
+    return path
+
+
+# -------------------------
+# 열기 (mmap)
+# -------------------------
+class StringTable:
+    """
+    mmap 위의 문자열 테이블. id별로 처음 조회할 때만 디코딩
+    """
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+        self._decoded: List[str | None] = [None] * (len(offsets) - 1)
+
+    def __getitem__(self, i: int) -> str | None:
+        if i == NO_STRING:
+            return None
+        s = self._decoded[i]
+        if s is None:
+            s = self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+            self._decoded[i] = s
+        return s
+
+
+class ColumnarDocs(Sequence):
+    """
+    문자열 id 컬럼을 문서 리스트처럼 조회. 처음 접근한 행만 딕셔너리로 만들어 보관
+    (CSV 카탈로그의 docs와 같이 같은 행은 같은 딕셔너리를 반환하므로 호출 측에서 수정하지 않음)
+    """
+    def __init__(self, fields: List[str], columns: Dict[str, np.ndarray], strings: StringTable, rows: int):
+        self.fields = fields
+        self.columns = columns
+        self.strings = strings
+        self.rows = rows
+        self._rows: List[Dict[str, Any] | None] = [None] * rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.rows))]
+        i = int(i)
+        if i < 0:
+            i += self.rows
+        if not 0 <= i < self.rows:
+            raise IndexError(i)
+        row = self._rows[i]
+        if row is None:
+            row = {f: self.strings[int(self.columns[f][i])] for f in self.fields}
+            self._rows[i] = row
+        return row
+
+
+def open_snapshot(path: str) -> Catalog:
+    """
+    스냅샷 파일을 읽기 전용 mmap으로 열어 Catalog 생성. 숫자 배열은 복사 없이 mmap을 그대로 사용
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"카탈로그 스냅샷 형식이 아니에요: {path}")
+    header_len = int.from_bytes(mm[len(MAGIC):len(MAGIC) + 8], "little")
+    header_start = len(MAGIC) + 8
+    header = json.loads(mm[header_start:header_start + header_len].decode("utf-8"))
+    base = header_start + header_len
+    base += -base % ALIGN
+
+    def array(desc: Dict[str, Any]) -> np.ndarray:
+        return np.frombuffer(mm, dtype=np.dtype(desc["dtype"]), count=desc["count"], offset=base + desc["offset"])
+
+    strings = StringTable(array(header["strings"]["offsets"]), array(header["strings"]["data"]))
+
+    def docs(table: Dict[str, Any]) -> ColumnarDocs:
+        return ColumnarDocs(table["fields"], {f: array(d) for f, d in table["strings"].items()}, strings, table["rows"])
+
+    p, d = header["tables"]["plans"], header["tables"]["devices"]
+    plan_num = {k: array(v) for k, v in p["numeric"].items()}
+    dev_num = {k: array(v) for k, v in d["numeric"].items()}
+    plans = PlanTable(
+        docs=docs(p),
+        monthly_fee=plan_num["monthly_fee"],
+        data_gb=plan_num["data_gb"],
+        unlimited=plan_num["unlimited"].view(bool),
+    )
+    devices = DeviceTable(
+        docs=docs(d),
+        price=dev_num["price"],
+        weight_g=dev_num["weight_g"],
+        brand=np.array([strings[int(i)] for i in dev_num["brand"]], dtype=object),
+    )
+    # 컴파일 시 계산한 중복제거 인덱스 사용 (cached_property 값으로 미리 채움)
+    devices.__dict__["dedupe_indices"] = dev_num["dedupe_indices"].astype(np.intp, copy=False)
+    return Catalog(version=header["version"], plans=plans, devices=devices)
+
+
+# -------------------------
+# 최신 스냅샷 유지 (hot reload)
+# -------------------------
+def latest_snapshot(snapshot_dir: str = CATALOG_SNAPSHOT_DIR) -> Tuple[str, str] | None:
+    found = []
+    for path in glob.glob(os.path.join(snapshot_dir, "catalog_*.bin")):
+        m = SNAPSHOT_RE.search(path)
+        if m:
+            found.append((m.group(1), path))
+    return max(found) if found else None
+
+
+class SnapshotWatcher:
+    """
+    현재 사용 중인 스냅샷 Catalog를 보관하고, CATALOG_RELOAD_INTERVAL마다 더 최신 날짜 스냅샷이 있으면 교체
+    교체 전 Catalog를 참조 중인 요청은 그대로 이전 mmap을 사용 (참조가 없어지면 해제)
+    """
+    def __init__(self, snapshot_dir: str = CATALOG_SNAPSHOT_DIR, interval: float = CATALOG_RELOAD_INTERVAL):
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.catalog: Catalog | None = None
+        self._checked = -float("inf")
+        self._lock = threading.Lock()
+
+    def get(self) -> Catalog | None:
+        now = time.monotonic()
+        if now - self._checked < self.interval:
+            return self.catalog
+        with self._lock:
+            if now - self._checked >= self.interval:
+                latest = latest_snapshot(self.snapshot_dir)
+                if latest and (self.catalog is None or latest[0] > self.catalog.version):
+                    self.catalog = open_snapshot(latest[1])
+                self._checked = time.monotonic()
+        return self.catalog
+
+
+_watchers: Dict[str, SnapshotWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def current_snapshot(snapshot_dir: str = CATALOG_SNAPSHOT_DIR) -> Catalog | None:
+    """
+    snapshot_dir의 최신 스냅샷 Catalog (없으면 None). 프로세스당 디렉터리별 1개의 watcher 사용
+    """
+    watcher = _watchers.get(snapshot_dir)
+    if watcher is None:
+        with _watchers_lock:
+            watcher = _watchers.setdefault(snapshot_dir, SnapshotWatcher(snapshot_dir))
+    return watcher.get()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KTShop Buddy 카탈로그 CSV -> 바이너리 스냅샷 컴파일")
+    parser.add_argument("--catalog-dir", default=CATALOG_DIR)
+    parser.add_argument("--out-dir", default=CATALOG_SNAPSHOT_DIR)
+    args = parser.parse_args()
+    started = time.monotonic()
+    path = compile_snapshot(args.catalog_dir, args.out_dir)
+    cat = open_snapshot(path)
+    print(f"스냅샷 생성: {path} (요금제 {len(cat.plans)}개, 단말 {len(cat.devices)}개, "
+          f"{os.path.getsize(path) / 1024:.1f}KB, {time.monotonic() - started:.2f}초)")
+
+
+if __name__ == "__main__":
+    main()
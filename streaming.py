@@ -0,0 +1,169 @@
+import json
+import re
+from typing import Dict, Any, List, Iterable, Iterator, Callable
+
+# -------------------------
+# Streaming: LLM 스트리밍 응답에서 텍스트/추천 항목을 점진적으로 추출
+# -------------------------
+JSON_FENCE_RE = re.compile(r"```json", re.IGNORECASE)
+JSON_BLOCK_RE = re.compile(r"```json.*?```", re.DOTALL | re.IGNORECASE)
+
+
+def iter_stream_text(stream: Iterable[Any], on_usage: Callable[[Any], None] | None = None) -> Iterator[str]:
+    """
+    chat.completions 스트림(stream=True)에서 content 조각만 순서대로 반환
+    Azure는 첫 청크에 choices가 비어있을 수 있어 건너뜀
+    stream_options.include_usage 사용 시 마지막 청크의 usage를 on_usage로 전달
+    """
+    for chunk in stream:
+        if on_usage is not None and getattr(chunk, "usage", None) is not None:
+            on_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+def strip_json_blocks(text: str) -> str:
+    """
+    ```json 블록을 제거한 설명 텍스트. 아직 닫히지 않은 블록은 시작 위치부터 잘라냄
+    """
+    cleaned = JSON_BLOCK_RE.sub("", text)
+    m = JSON_FENCE_RE.search(cleaned)
+    return (cleaned[:m.start()] if m else cleaned).strip()
+
+
+class RecommendationStreamParser:
+    """
+    스트리밍 텍스트를 조각 단위로 받아 ```json 블록 안의 recommendations[i] 객체가
+    닫히는 즉시 파싱하는 파서. 문자열/이스케이프를 추적하여 괄호 깊이를 계산.
+    여러 json 블록이 오면 safe_parse_json과 같이 마지막 블록의 결과를 사용.
+    fenced=False 이면 응답 전체를 하나의 JSON으로 간주 (structured output 응답)
+    section이 주어지면 최상위 section 객체 안의 recommendations를 추출 (joint 응답의 plan/device)
+    structured output 응답은 같은 객체의 explanation 문자열 값도 받는 중간부터 explanation으로 제공
+    """
+    def __init__(self, fenced: bool = True, section: str | None = None):
+        self.text = ""
+        self.recommendations: List[Dict[str, Any]] = []
+        self.fenced = fenced
+        self.section = section
+        self._pos = 0
+        self._in_block = not fenced
+        self._reset_block()
+
+    def _reset_block(self) -> None:
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = 0
+        self._last_key: str | None = None
+        self._section_key: str | None = None
+        self._current_section: str | None = None
+        self._rec_depth: int | None = None
+        self._obj_start: int | None = None
+        self._block_recs: List[Dict[str, Any]] = []
+        self._expect_value = False
+        self._expl_start: int | None = None
+        self._expl_end: int | None = None
+
+    @property
+    def _rec_parent_depth(self) -> int:
+        # recommendations 키가 있는 객체의 깊이 (section이 있으면 한 단계 안쪽)
+        return 1 if self.section is None else 2
+
+    @property
+    def prose(self) -> str:
+        return strip_json_blocks(self.text)
+
+    @property
+    def explanation(self) -> str:
+        """
+        explanation 문자열 값 (아직 닫히지 않았으면 지금까지 받은 부분)
+        """
+        if self._expl_start is None:
+            return ""
+        raw = self.text[self._expl_start:self._pos if self._expl_end is None else self._expl_end]
+        # 조각 경계에서 잘린 이스케이프(\, \uXXXX)는 다음 조각이 올 때까지 제외
+        for cut in range(min(6, len(raw)) + 1):
+            try:
+                return json.loads(f'"{raw[:len(raw) - cut]}"')
+            except ValueError:
+                continue
+        return ""
+
+    def _in_scope(self) -> bool:
+        return self._depth == self._rec_parent_depth and (self.section is None or self._current_section == self.section)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        텍스트 조각 추가 후 이번에 새로 완성된 추천 항목 리스트 반환
+        """
+        self.text += chunk
+        text = self.text
+        new: List[Dict[str, Any]] = []
+        while self._pos < len(text):
+            if not self._in_block:
+                m = JSON_FENCE_RE.search(text, self._pos)
+                if not m:
+                    # 펜스가 조각 경계에 걸린 경우를 위해 끝부분은 다시 검사
+                    self._pos = max(self._pos, len(text) - len("```json") + 1)
+                    break
+                self._in_block = True
+                self._pos = m.end()
+                self._reset_block()
+                continue
+
+            c = text[self._pos]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._expl_start is not None and self._expl_end is None:
+                        self._expl_end = self._pos
+                    if self._depth == 1:
+                        self._section_key = text[self._str_start + 1:self._pos]
+                    if self._depth == self._rec_parent_depth:
+                        self._last_key = text[self._str_start + 1:self._pos]
+            elif c == '"':
+                self._in_str = True
+                self._str_start = self._pos
+                if self._expect_value and self._last_key == "explanation" and self._in_scope():
+                    self._expl_start, self._expl_end = self._pos + 1, None
+                self._expect_value = False
+            elif c == ":":
+                self._expect_value = True
+            elif c == ",":
+                self._expect_value = False
+            elif c in "{[":
+                self._expect_value = False
+                if c == "{" and self._depth == 1:
+                    self._current_section = self._section_key
+                if (c == "[" and self._depth == self._rec_parent_depth and self._last_key == "recommendations"
+                        and (self.section is None or self._current_section == self.section)):
+                    self._rec_depth = self._depth + 1
+                elif c == "{" and self._rec_depth is not None and self._depth == self._rec_depth:
+                    self._obj_start = self._pos
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if c == "}" and self._obj_start is not None and self._depth == self._rec_depth:
+                    try:
+                        item = json.loads(text[self._obj_start:self._pos + 1])
+                    except Exception:
+                        item = None
+                    self._obj_start = None
+                    if isinstance(item, dict):
+                        self._block_recs.append(item)
+                        self.recommendations = self._block_recs
+                        new.append(item)
+                elif c == "]" and self._rec_depth is not None and self._depth == self._rec_depth - 1:
+                    self._rec_depth = None
+            elif c == "`" and self.fenced:
+                # 문자열 밖의 백틱은 코드블록 종료
+                self._in_block = False
+            self._pos += 1
+        return new
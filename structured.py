@@ -0,0 +1,114 @@
+import copy
+import json
+from typing import Dict, Any, List, Type
+
+from pydantic import BaseModel, ValidationError
+
+# -------------------------
+# Structured Output: 추천 결과 JSON 스키마(response_format) 정의 및 검증
+# -------------------------
+class PlanInfo(BaseModel):
+    planId: str
+    name: str
+    monthly_fee: float
+    data_gb: str
+    voice: str
+
+
+class PlanRecommendation(BaseModel):
+    rank: int
+    plan: PlanInfo
+    monthly_total: float
+    tco: float
+    reasons: List[str]
+    caveats: List[str]
+
+
+class PlanRecommendations(BaseModel):
+    explanation: str
+    recommendations: List[PlanRecommendation]
+    alternatives: List[str]
+
+
+class DeviceInfo(BaseModel):
+    prodNo: str
+    sntyNo: str
+    brand: str
+    model: str
+    storage_gb: str
+    color: str
+    price: str
+    weight_g: str
+    display_size_cm: str
+
+
+class DeviceRecommendation(BaseModel):
+    rank: int
+    device: DeviceInfo
+    reasons: List[str]
+    caveats: List[str]
+
+
+class DeviceRecommendations(BaseModel):
+    explanation: str
+    recommendations: List[DeviceRecommendation]
+    alternatives: List[str]
+
+
+class JointRecommendations(BaseModel):
+    """
+    요금제/단말 추천을 한 번의 호출로 받는 결과 (joint 모드)
+    """
+    plan: PlanRecommendations
+    device: DeviceRecommendations
+
+
+STRUCTURED_HINT = (
+    "결과는 지정된 JSON 스키마로만 출력하고, explanation에는 선택 근거와 유의사항을 사용자가 이해하기 쉽게 설명해줘.\n"
+)
+
+
+def strict_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    pydantic 스키마를 strict 모드 요구사항에 맞게 변환 (모든 필드 required, 추가 필드 금지)
+    """
+    schema = copy.deepcopy(schema)
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            node.pop("title", None)
+            if node.get("type") == "object" and "properties" in node:
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"])
+            for v in node.values():
+                walk(v)
+        elif isinstance(node, list):
+            for v in node:
+                walk(v)
+    walk(schema)
+    return schema
+
+
+def response_format(model: Type[BaseModel], name: str) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": strict_schema(model.model_json_schema())},
+    }
+
+
+def parse_structured(model: Type[BaseModel], text: str) -> Dict[str, Any]:
+    """
+    응답 JSON을 모델로 검증 후 기존 코드와 호환되는 딕셔너리로 반환. 실패 시 ValidationError
+    """
+    return model.model_validate_json(text).model_dump()
+
+
+def repair_messages(msgs: List[Dict[str, Any]], bad_reply: str, error: ValidationError) -> List[Dict[str, Any]]:
+    """
+    검증 실패 응답과 오류 내용을 전달하여 해당 단계만 다시 요청하는 메세지
+    """
+    errors = json.dumps(error.errors(include_url=False, include_input=False)[:5], ensure_ascii=False, default=str)
+    return list(msgs) + [
+        {"role": "assistant", "content": bad_reply},
+        {"role": "user", "content": f"위 응답이 JSON 스키마 검증에 실패했어요. 오류: {errors}\n스키마에 맞는 JSON만 다시 출력해줘."},
+    ]
@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Dict, Any, List, Tuple, Callable, Iterator
+
+# -------------------------
+# Telemetry: 단계별 소요시간(span), LLM 토큰 사용량, 검색 문서 수, 캐시 적중률 수집
+# 프로세스 누적 지표는 Prometheus 텍스트로, 요청(trace)별 요약은 JSON 로그로 출력
+# -------------------------
+# 요청별 JSON 로그 출력 여부 (TELEMETRY_JSON_LOG=0 이면 출력 안 함)
+TELEMETRY_JSON_LOG = os.getenv("TELEMETRY_JSON_LOG", "1") != "0"
+# 지정하면 요청이 끝날 때마다 Prometheus 텍스트를 파일로 기록 (node_exporter textfile collector용)
+TELEMETRY_PROM_PATH = os.getenv("TELEMETRY_PROM_PATH", "")
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("ktshopbuddy.telemetry")
+if TELEMETRY_JSON_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+# -------------------------
+# 프로세스 누적 지표 (Prometheus)
+# -------------------------
+class Registry:
+    """
+    카운터/히스토그램 저장소. 스레드 안전. 값은 프로세스(워커) 단위로 누적
+    """
+    def __init__(self, buckets: Tuple[float, ...] = SPAN_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._hists: Dict[str, Dict[Labels, List[float]]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        # [버킷별 개수..., +Inf 개수, 합계]
+        key = _labels(labels)
+        with self._lock:
+            series = self._hists.setdefault(name, {})
+            h = series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            h[bisect_left(self.buckets, value)] += 1
+            h[-1] += value
+
+    def render(self) -> str:
+        def fmt(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            items = labels + extra
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                kind, help_text = self._help.get(name, ("counter", name))
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, v in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{fmt(labels)} {v:g}")
+            for name in sorted(self._hists):
+                _, help_text = self._help.get(name, ("histogram", name))
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, h in sorted(self._hists[name].items()):
+                    cum = 0.0
+                    for b, n in zip(self.buckets, h):
+                        cum += n
+                        lines.append(f"{name}_bucket{fmt(labels, (('le', f'{b:g}'),))} {cum:g}")
+                    count = cum + h[len(self.buckets)]
+                    lines.append(f"{name}_bucket{fmt(labels, (('le', '+Inf'),))} {count:g}")
+                    lines.append(f"{name}_sum{fmt(labels)} {h[-1]:.6f}")
+                    lines.append(f"{name}_count{fmt(labels)} {count:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REGISTRY.describe("buddy_stage_seconds", "histogram", "단계별 소요시간(초)")
+REGISTRY.describe("buddy_llm_tokens_total", "counter", "LLM 토큰 사용량 (type=prompt/completion/cached)")
+REGISTRY.describe("buddy_llm_calls_total", "counter", "LLM 호출 횟수")
+REGISTRY.describe("buddy_search_docs_total", "counter", "검색으로 조회한 문서 수")
+REGISTRY.describe("buddy_search_requests_total", "counter", "후보 검색 횟수")
+REGISTRY.describe("buddy_cache_requests_total", "counter", "캐시 조회 횟수 (result=hit/miss)")
+REGISTRY.describe("buddy_structured_repairs_total", "counter", "structured output 검증 실패로 재요청한 횟수")
+REGISTRY.describe("buddy_requests_total", "counter", "추천 요청 수")
+REGISTRY.describe("buddy_embedding_calls_total", "counter", "임베딩 API 호출 횟수 (캐시 미스 배치 단위)")
+REGISTRY.describe("buddy_singleflight_total", "counter", "검색/LLM 단계 중복 요청 합치기 (role=leader/follower)")
+REGISTRY.describe("buddy_llm_throttled_total", "counter", "LLM 호출 429(한도 초과) 응답 수")
+REGISTRY.describe("buddy_llm_rejected_total", "counter", "LLM 호출 승인 거절 수 (reason=queue_full/timeout)")
+REGISTRY.describe("buddy_prefetch_total", "counter", "입력 중 미리 실행한 후보 검색/추천 작업 (result=done/cancelled/error)")
+
+
+# -------------------------
+# 요청 단위 trace
+# -------------------------
+class Trace:
+    """
+    한 번의 추천 요청 동안 수집한 span/카운터. 파이프라인 스레드에서 동시에 기록 가능
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, labels: Dict[str, Any], start: float, seconds: float) -> None:
+        with self._lock:
+            self.spans.append({"name": name, **{k: v for k, v in labels.items() if v is not None},
+                               "start_ms": round((start - self.started) * 1000, 2), "ms": round(seconds * 1000, 2)})
+
+    def inc(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def summary(self) -> Dict[str, Any]:
+        tokens: Dict[str, Dict[str, float]] = {}
+        docs: Dict[str, int] = {}
+        cache: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            counters = dict(self.counters)
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        for (name, labels), v in counters.items():
+            d = dict(labels)
+            kind = d.get("kind", "-")
+            if name == "buddy_llm_tokens_total":
+                by_type = tokens.setdefault(kind, {})
+                by_type[d["type"]] = by_type.get(d["type"], 0) + int(v)
+            elif name == "buddy_search_docs_total":
+                docs[kind] = docs.get(kind, 0) + int(v)
+            elif name == "buddy_cache_requests_total":
+                c = cache.setdefault(d["cache"], {"hit": 0, "miss": 0})
+                c[d["result"]] += int(v)
+        for by_type in tokens.values():
+            # 프롬프트 중 프롬프트 캐싱으로 처리된 비율
+            prompt = by_type.get("prompt", 0)
+            by_type["cached_ratio"] = round(by_type.get("cached", 0) / prompt, 3) if prompt else 0.0
+        for c in cache.values():
+            total = c["hit"] + c["miss"]
+            c["hit_ratio"] = round(c["hit"] / total, 3) if total else 0.0
+        return {
+            "trace": self.name,
+            "trace_id": self.id,
+            "total_ms": round(self.total_ms, 2),
+            "spans": spans,
+            "tokens": tokens,
+            "search_docs": docs,
+            "cache": cache,
+        }
+
+
+_current: ContextVar[Trace | None] = ContextVar("buddy_trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """
+    요청 단위 trace 시작. 종료 시 전체 소요시간 기록 후 JSON 로그/Prometheus 파일 출력
+    """
+    t = Trace(name)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        t.total_ms = (time.perf_counter() - t.started) * 1000
+        _current.reset(token)
+        REGISTRY.observe("buddy_stage_seconds", t.total_ms / 1000, stage="total", trace=name)
+        REGISTRY.inc("buddy_requests_total", trace=name)
+        if TELEMETRY_JSON_LOG:
+            logger.info(json.dumps({"ts": time.time(), **t.summary()}, ensure_ascii=False))
+        if TELEMETRY_PROM_PATH:
+            write_prometheus(TELEMETRY_PROM_PATH)
+
+
+@contextmanager
+def span(stage: str, **labels: Any) -> Iterator[None]:
+    """
+    단계 소요시간 측정. 예외가 나도 기록
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe("buddy_stage_seconds", seconds, stage=stage, **labels)
+        t = _current.get()
+        if t is not None:
+            t.add_span(stage, labels, start, seconds)
+
+
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    REGISTRY.inc(name, value, **labels)
+    t = _current.get()
+    if t is not None:
+        t.inc(name, value, labels)
+
+
+def record_usage(usage: Any, **labels: Any) -> None:
+    """
+    completion.usage (prompt_tokens/completion_tokens/prompt_tokens_details.cached_tokens) 기록
+    """
+    if usage is None:
+        return
+    inc("buddy_llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, type="prompt", **labels)
+    inc("buddy_llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, type="completion", **labels)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    if cached:
+        inc("buddy_llm_tokens_total", cached, type="cached", **labels)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    inc("buddy_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    현재 trace를 스레드풀 작업에서도 사용하도록 컨텍스트를 복사하여 실행하는 함수로 감쌈
+    """
+    ctx = copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def write_prometheus(path: str) -> None:
+    # textfile collector가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
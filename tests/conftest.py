@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+# -------------------------
+# 테스트 공통 설정: Azure 대신 fakes.py의 로컬 대체 클라이언트 사용, 디스크 캐시/스냅샷 미사용
+# 모듈 import 시점에 읽는 설정이므로 import 전에 환경변수 지정
+# -------------------------
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("COMPLETION_CACHE_PATH", "")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("EMBEDDING_DIR", tempfile.mkdtemp(prefix="buddy-embeddings-"))
+os.environ.setdefault("CATALOG_SNAPSHOT", "0")
+os.environ.setdefault("TELEMETRY_JSON_LOG", "0")
+
+import pytest
+
+import buddy_core
+from catalog import AzureSearchBackend
+from fakes import FakeOpenAI, fake_search_clients
+
+
+@pytest.fixture
+def fake_llm(monkeypatch: pytest.MonkeyPatch) -> FakeOpenAI:
+    """
+    buddy_core의 Azure OpenAI 클라이언트를 FakeOpenAI로 교체
+    """
+    llm = FakeOpenAI()
+    monkeypatch.setattr(buddy_core, "get_openai", lambda: llm)
+    return llm
+
+
+@pytest.fixture
+def fake_search(monkeypatch: pytest.MonkeyPatch):
+    """
+    후보 조회를 로컬 카탈로그를 제공하는 FakeSearchClient(keyword 모드) 백엔드로 교체 -> (요금제, 단말) 클라이언트
+    """
+    plan_client, device_client = fake_search_clients()
+    backend = AzureSearchBackend(lambda: plan_client, lambda: device_client, min_results=buddy_core.CANDIDATE_TOPN)
+    monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: backend)
+    return plan_client, device_client
@@ -0,0 +1,66 @@
+import pytest
+from starlette.testclient import TestClient
+
+import api
+from catalog import load_catalog
+
+
+@pytest.fixture
+def client(fake_llm, fake_search):
+    with TestClient(api.app) as c:
+        yield c
+
+
+def test_healthz(client):
+    r = client.get("/healthz")
+    assert r.status_code == 200
+    assert r.json() == {"status": "ok", "catalog_version": load_catalog().version}
+
+
+def test_recommend_returns_plan_device_and_combinations(client, fake_llm):
+    r = client.post("/v1/recommend", json={"data_gb": 30, "budget": 60000, "brand_pref": ["Apple"],
+                                          "device_budget": 1200000, "installment_months": 24})
+    assert r.status_code == 200 and r.headers["X-Trace-Id"]
+    body = r.json()
+    assert body["catalog_version"] == load_catalog().version
+    assert body["prefs"]["installment_months"] == 24 and body["prefs"]["brand_pref"] == ["Apple"]
+    assert len(body["plan"]["recommendations"]) == 3 and len(body["device"]["recommendations"]) == 3
+    assert body["plan"]["errors"] == [] and body["device"]["errors"] == []
+    assert all(not k.startswith("__") for d in body["device"]["candidates"] for k in d)
+    assert body["combinations"] and all(c["assumption_months"] == 24 for c in body["combinations"])
+    assert fake_llm.calls == 0
+
+
+def test_recommend_with_notes_uses_llm(client, fake_llm):
+    r = client.post("/v1/recommend", json={"notes": "넷플릭스 혜택"})
+    assert r.status_code == 200
+    body = r.json()
+    assert fake_llm.calls > 0
+    assert body["plan"]["explanation"] and "```" not in body["plan"]["explanation"]
+
+
+@pytest.mark.parametrize("body, field", [
+    ({"voice": "10분"}, "voice"),
+    ({"brand_pref": ["Nokia"]}, "brand_pref"),
+    ({"installment_months": 18}, "installment_months"),
+    ({"budget": 5000}, "budget"),
+    ({"data_gb": 500}, "data_gb"),
+    ({"notes": "가" * 501}, "notes"),
+])
+def test_recommend_rejects_values_the_sidebar_cannot_send(client, fake_llm, body, field):
+    r = client.post("/v1/recommend", json=body)
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["loc"][0] == field
+    assert fake_llm.calls == 0
+
+
+def test_recommend_rejects_invalid_json(client):
+    r = client.post("/v1/recommend", content=b"{", headers={"content-type": "application/json"})
+    assert r.status_code == 400
+
+
+def test_metrics_exposes_prometheus_text(client):
+    client.post("/v1/recommend", json={})
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert "buddy_stage_seconds" in r.text
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import prefetch
+from conftest import ROOT
+
+APP = os.path.join(ROOT, "ktshopbuddy.py")
+
+
+@pytest.fixture
+def app(monkeypatch, fake_llm, fake_search):
+    # 입력 중 미리 실행(prefetch)은 test_prefetch.py에서 확인하고, 여기서는 찾아보기 실행만 확인
+    monkeypatch.setattr(prefetch, "PREFETCH", False)
+    searches = []
+    for client in fake_search:
+        search = client.search
+        monkeypatch.setattr(client, "search", lambda *a, _search=search, **kw: searches.append(1) or _search(*a, **kw))
+    at = AppTest.from_file(APP, default_timeout=30)
+    at.searches = searches
+    return at.run()
+
+
+def shown_tables(at):
+    return len(at.dataframe) + len(at.table)
+
+
+def test_results_survive_reruns_until_inputs_change(app):
+    assert not app.exception
+    assert shown_tables(app) == 0 and not app.info
+
+    app.button[0].click().run()
+    assert not app.exception
+    tables, searches = shown_tables(app), len(app.searches)
+    assert tables >= 2 and searches > 0
+    assert len(app.session_state.results) == 1
+
+    # 위젯과 무관한 rerun: 다시 계산하지 않고 보관한 결과 표시
+    app.run()
+    assert shown_tables(app) == tables and len(app.searches) == searches
+
+    # 조건이 바뀌면 안내만 표시, 원래 조건으로 돌아오면 보관한 결과 다시 표시
+    app.sidebar.number_input[0].set_value(60000).run()
+    assert shown_tables(app) == 0
+    assert "입력 조건이 바뀌었어요" in app.info[0].value
+    app.sidebar.number_input[0].set_value(90000).run()
+    assert shown_tables(app) == tables and len(app.searches) == searches
+
+
+def test_history_grows_per_search(app):
+    before = len(app.session_state.messages)
+    app.button[0].click().run()
+    app.sidebar.number_input[0].set_value(60000).run()
+    app.button[0].click().run()
+    assert not app.exception
+    assert len(app.session_state.messages) == before + 4
+    assert len(app.session_state.results) == 2
@@ -0,0 +1,94 @@
+import csv
+import json
+
+import pytest
+
+from batch import to_prefs, load_done_ids, run_batch
+from buddy_core import UserPrefs
+
+PROFILES = [
+    {"id": "p1", "data_gb": "30", "budget": "60,000", "brand_pref": "Apple|Samsung", "device_budget": "1200000",
+     "installment_months": "24", "notes": ""},
+    {"id": "p2", "data_unlimited": "무제한", "budget": "110000", "brand_pref": "", "notes": "넷플릭스 혜택"},
+    {"id": "p3", "data_gb": "많이", "budget": "50000"},
+    {"id": "p4", "data_gb": "", "budget": "", "brand_pref": "Samsung"},
+]
+
+
+def write_csv(path, rows):
+    fields = sorted({k for r in rows for k in r})
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_to_prefs():
+    prefs = to_prefs(PROFILES[0])
+    assert prefs == UserPrefs(data_gb=30, budget=60000, brand_pref=("Apple", "Samsung"), device_budget=1200000,
+                              installment_months=24)
+    unlimited = to_prefs(PROFILES[1])
+    assert unlimited.data_unlimited and unlimited.data_gb is None and unlimited.brand_pref == ()
+    assert to_prefs({}) == UserPrefs()
+    with pytest.raises(ValueError):
+        to_prefs(PROFILES[2])
+
+
+def test_load_done_ids_truncates_partial_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": "a"}\n{"id": "b"}\n{"id": "c", "pl', encoding="utf-8")
+    assert load_done_ids(str(path)) == {"a", "b"}
+    assert path.read_text(encoding="utf-8") == '{"id": "a"}\n{"id": "b"}\n'
+    assert load_done_ids(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_load_done_ids_truncates_line_without_newline(tmp_path):
+    # JSON은 완전하지만 줄바꿈 전에 중단된 줄: 완료로 보지 않고 잘라내어 다음 기록과 합쳐지지 않게 함
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": "1"}\n{"id": "2"}', encoding="utf-8")
+    assert load_done_ids(str(path)) == {"1"}
+    assert path.read_text(encoding="utf-8") == '{"id": "1"}\n'
+
+
+def test_run_batch_rank_mode(tmp_path):
+    src, out = tmp_path / "profiles.csv", tmp_path / "out.jsonl"
+    write_csv(src, PROFILES)
+    stats = run_batch(str(src), str(out), workers=2, chunk_size=1)
+    assert stats == {"skipped": 0, "written": 4, "llm": 0, "errors": 1}
+    recs = {r["id"]: r for r in read_jsonl(out)}
+    assert set(recs) == {"p1", "p2", "p3", "p4"}
+    assert recs["p3"]["status"] == "invalid"
+    ok = recs["p1"]
+    assert ok["status"] == "ok" and ok["mode"] == "rank"
+    assert len(ok["plan"]["recommendations"]) == 3 and len(ok["device"]["recommendations"]) == 3
+    assert ok["combinations"] and ok["combinations"][0]["assumption_months"] == 24
+
+
+def test_run_batch_resumes_and_runs_llm_for_notes(tmp_path, fake_llm):
+    src, out = tmp_path / "profiles.jsonl", tmp_path / "out.jsonl"
+    src.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in PROFILES), encoding="utf-8")
+    out.write_text('{"id": "p1", "status": "ok"}\n{"id": "p4", "sta', encoding="utf-8")
+    stats = run_batch(str(src), str(out), workers=1, use_llm=True, llm_concurrency=2)
+    assert stats == {"skipped": 1, "written": 3, "llm": 1, "errors": 1}
+    recs = read_jsonl(out)
+    assert [r["id"] for r in recs].count("p1") == 1 and len(recs) == 4
+    llm_rec = next(r for r in recs if r["id"] == "p2")
+    assert llm_rec["mode"] == "llm" and llm_rec["status"] == "ok"
+    assert len(llm_rec["plan"]["recommendations"]) == 3
+    assert fake_llm.calls >= 1
+
+
+def test_run_batch_records_malformed_jsonl_lines_as_invalid(tmp_path):
+    src, out = tmp_path / "profiles.jsonl", tmp_path / "out.jsonl"
+    src.write_text('{"id": "a", "budget": "60000"}\n{"id": "b", "budget"\n[1, 2]\n{"id": "d"}\n', encoding="utf-8")
+    stats = run_batch(str(src), str(out), workers=1)
+    assert stats == {"skipped": 0, "written": 4, "llm": 0, "errors": 2}
+    recs = {r["id"]: r for r in read_jsonl(out)}
+    assert recs["a"]["status"] == recs["d"]["status"] == "ok"
+    assert recs["2"]["status"] == recs["3"]["status"] == "invalid"
+    assert recs["2"]["errors"][0].startswith("2행 JSON 오류")
@@ -0,0 +1,84 @@
+import argparse
+import random
+
+import pytest
+
+import bench
+import buddy_core
+from fakes import FakeOpenAI, FakeRateLimitError, FakeServiceError, Latency, parse_odata_filter, sort_by_odata
+from ratelimit import throttle_delay
+
+
+def stage(p50, p95=None, alloc=10.0):
+    return {"p50_ms": p50, "p95_ms": p95 or p50, "peak_alloc_kb": alloc}
+
+
+def test_compare_flags_only_regressions_over_threshold():
+    baseline = {"a": stage(10.0), "b": stage(10.0, alloc=100.0), "gone": stage(1.0)}
+    results = {"a": stage(11.9), "b": stage(9.0, alloc=130.0), "new": stage(99.0)}
+    regressions = bench.compare(results, baseline, threshold=0.2)
+    assert regressions == ["b peak_alloc_kb: 100.000 -> 130.000 (+30%)"]
+
+
+def test_condition_mismatches():
+    args = argparse.Namespace(iterations=200, seed=7, search_mode="keyword", stage=None, threshold=0.2,
+                              baseline="x", save_baseline=False, fail_on_regression=False)
+    current = bench.bench_conditions(args)
+    assert set(current["args"]) == {"iterations", "seed", "search_mode"}
+    assert current["config"]["catalog_version"] == buddy_core.load_catalog().version
+    assert bench.condition_mismatches(current, current) == []
+
+    # 측정과 무관한 옵션은 기준선에 있어도 비교하지 않음
+    saved = {"args": {**current["args"], "threshold": 0.5, "search_mode": "filter"},
+             "config": {k: v for k, v in current["config"].items() if k != "joint"}}
+    assert bench.condition_mismatches(current, saved) == [
+        "args.search_mode: filter -> keyword",
+        f"config.joint: (기록 없음) -> {current['config']['joint']}",
+    ]
+
+
+def test_measure_counts_injected_errors():
+    calls = []
+
+    def flaky(rng):
+        calls.append(1)
+        if len(calls) % 2 == 0:
+            raise FakeServiceError("boom")
+        return {"plan": {"errors": []}, "device": {"errors": []}}
+
+    result = bench.measure(flaky, iterations=10, alloc_iterations=3, seed=1)
+    assert result["n"] == 10 and result["errors"] == 5
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    assert len(calls) == 1 + 10 + 3
+
+
+def test_all_stages_run_against_fakes(monkeypatch):
+    for name in ("get_openai", "get_candidate_backend"):
+        monkeypatch.setattr(buddy_core, name, getattr(buddy_core, name))
+    llm = bench.install_fakes(Latency(), Latency(), chunk_ms=0.0)
+    rng = random.Random(3)
+    for name, (fn, _) in bench.build_stages(1).items():
+        assert not bench.has_errors(fn(rng)), name
+    assert llm.calls > 0
+
+
+def test_odata_filter_and_order():
+    docs = [{"id": "a", "price": 3.0, "brand": "apple", "u": True}, {"id": "b", "price": None, "brand": "samsung", "u": False},
+            {"id": "c", "price": 1.0, "brand": "xiaomi", "u": False}]
+    match = lambda flt: [d["id"] for d in docs if parse_odata_filter(flt)(d)]
+    assert match("price ge 1 and price lt 3") == ["c"]
+    assert match("price eq null or u eq true") == ["a", "b"]
+    assert match("not (price gt 2) and search.in(brand, 'samsung,xiaomi', ',')") == ["b", "c"]
+    with pytest.raises(ValueError):
+        parse_odata_filter("price ~ 3")
+    assert [d["id"] for d in sort_by_odata(docs, ["price desc", "id asc"])] == ["a", "c", "b"]
+
+
+def test_fake_openai_enforces_tpm():
+    llm = FakeOpenAI(tpm=6000)
+    msgs = [{"role": "user", "content": "x" * 400}]
+    llm.chat.completions.create(messages=msgs, max_tokens=500)
+    with pytest.raises(FakeRateLimitError) as e:
+        llm.chat.completions.create(messages=msgs, max_tokens=500)
+    assert llm.throttled == 1
+    assert throttle_delay(e.value) > 0
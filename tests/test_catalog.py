@@ -0,0 +1,124 @@
+import csv
+
+import pytest
+
+import buddy_core
+import catalog
+from catalog import (
+    CATALOG_DIR, PLAN_FIELDS, DEVICE_FIELDS, AzureSearchBackend, LocalCatalogBackend,
+    latest_catalog_files, load_csv_catalog, read_csv_docs, device_group_key,
+)
+from fakes import FakeSearchClient, fake_search_clients
+
+
+def test_latest_catalog_files_picks_newest_common_version(tmp_path):
+    for name in ("kt_plans_250101.csv", "kt_devices_250101.csv", "kt_plans_250301.csv",
+                 "kt_devices_250301.csv", "kt_plans_250401.csv"):
+        (tmp_path / name).write_text("planId\n", encoding="utf-8")
+    version, plan_path, device_path = latest_catalog_files(str(tmp_path))
+    assert version == "250301"
+    assert plan_path.endswith("kt_plans_250301.csv")
+    assert device_path.endswith("kt_devices_250301.csv")
+
+
+def test_csv_catalog_matches_csv_rows():
+    version, plan_path, device_path = latest_catalog_files(CATALOG_DIR)
+    cat = load_csv_catalog(CATALOG_DIR)
+    with open(plan_path, encoding="utf-8-sig", newline="") as f:
+        plan_rows = list(csv.DictReader(f))
+    assert cat.version == version
+    assert len(cat.plans) == len(plan_rows)
+    assert [d["planId"] for d in cat.plans.docs] == [r["planId"].strip() for r in plan_rows]
+    assert cat.devices.docs == read_csv_docs(device_path, DEVICE_FIELDS)
+    assert set(cat.plans.docs[0]) == set(PLAN_FIELDS)
+    # 다시 불러도 같은 객체 재사용
+    assert load_csv_catalog(CATALOG_DIR) is cat
+
+
+def test_local_backend_candidates_match_brute_force(monkeypatch):
+    cat = load_csv_catalog(CATALOG_DIR)
+    monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: LocalCatalogBackend(cat))
+
+    plans = buddy_core.fetch_plan_candidates(data_gb=30, budget=60000, data_unlimited=False, topn=10)
+    expected = sorted(cat.plans.docs, key=lambda d: buddy_core.score_plan(d, 30.0, 60000.0, False))[:10]
+    assert [d["planId"] for d in plans] == [d["planId"] for d in expected]
+
+    devices = buddy_core.fetch_device_candidates(device_budget=1000000, brand_pref=["Apple"], topn=10)
+    reps = buddy_core.dedupe_devices_by_model_storage(cat.devices.docs)
+    expected = sorted(reps, key=lambda d: buddy_core.score_device(d, 1000000.0, ["Apple"]))[:10]
+    assert [d["sntyNo"] for d in devices] == [d["sntyNo"] for d in expected]
+    assert len({device_group_key(d) for d in devices}) == len(devices)
+
+
+def test_candidates_are_copies(monkeypatch):
+    cat = load_csv_catalog(CATALOG_DIR)
+    monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: LocalCatalogBackend(cat))
+    plans = buddy_core.fetch_plan_candidates(data_gb=None, budget=90000, data_unlimited=True, topn=3)
+    plans[0]["plan_name"] = "changed"
+    assert all(d["plan_name"] != "changed" for d in cat.plans.docs)
+
+
+class PageLog:
+    """
+    FakeSearchClient.search 호출(search_text, skip) 기록
+    """
+    def __init__(self, client):
+        self.client = client
+        self.pages = []
+
+    def search(self, search_text="*", skip=0, **kwargs):
+        self.pages.append((search_text, skip))
+        return self.client.search(search_text=search_text, skip=skip, **kwargs)
+
+
+def color_variants(n_groups, colors=("블랙", "화이트", "블루")):
+    return [
+        {"sntyNo": f"{g}{c}", "brand": "Samsung", "model": f"갤럭시 {g}", "storage_gb": "256GB", "color": color,
+         "price": str(1_000_000 + g * 10_000)}
+        for g in range(n_groups) for c, color in enumerate(colors)
+    ]
+
+
+def test_keyword_device_search_pages_until_enough_groups():
+    _, device_client = fake_search_clients()
+    log = PageLog(device_client)
+    backend = AzureSearchBackend(lambda: None, lambda: log, top=8, min_results=10)
+    table = backend.search_devices(1_000_000, ["Samsung"])
+    groups = {device_group_key(d) for d in table.docs}
+    assert len(groups) >= 10
+    assert len({d["sntyNo"] for d in table.docs}) == len(table.docs)
+    assert len(log.pages) > 1 and {text for text, _ in log.pages} == {log.pages[0][0]}
+    assert [skip for _, skip in log.pages] == [8 * i for i in range(len(log.pages))]
+
+
+def test_device_search_falls_back_to_all_documents():
+    # 검색어와 일치하는 단말(브랜드 Apple)은 1개 그룹뿐이므로 전체 조회로 나머지 그룹을 채움
+    docs = color_variants(6) + [{"sntyNo": "a1", "brand": "Apple", "model": "아이폰", "storage_gb": "128GB",
+                                 "color": "블랙", "price": "1250000"}]
+    log = PageLog(FakeSearchClient(docs))
+    backend = AzureSearchBackend(lambda: None, lambda: log, top=4, min_results=5)
+    table = backend.search_devices(1_000_000, ["Apple"])
+    assert [text for text, _ in log.pages][-1] == "*"
+    assert len({device_group_key(d) for d in table.docs}) >= 5
+    assert len({d["sntyNo"] for d in table.docs}) == len(table.docs)
+
+
+def test_device_search_stops_after_max_pages(monkeypatch):
+    monkeypatch.setattr(catalog, "DEVICE_MAX_PAGES", 2)
+    log = PageLog(FakeSearchClient(color_variants(20, colors=[f"c{i}" for i in range(10)])))
+    backend = AzureSearchBackend(lambda: None, lambda: log, top=3, min_results=10)
+    table = backend.search_devices(1_000_000, ["Samsung"])
+    # 검색어 결과가 남아 있으면 전체 조회로 같은 상위 문서를 다시 받지 않음
+    assert log.pages == [(log.pages[0][0], 0), (log.pages[0][0], 3)] and len(table.docs) == 6
+
+
+@pytest.mark.parametrize("brand_pref", [["Samsung"], ["Apple"], []])
+def test_device_candidates_list_group_colors(fake_search, brand_pref):
+    cat = load_csv_catalog(CATALOG_DIR)
+    devices = buddy_core.fetch_device_candidates(device_budget=1_200_000, brand_pref=brand_pref, topn=buddy_core.CANDIDATE_TOPN)
+    assert len(devices) == buddy_core.CANDIDATE_TOPN
+    assert len({device_group_key(d) for d in devices}) == len(devices)
+    for d in devices:
+        all_colors = cat.devices.group_colors[device_group_key(d)]
+        assert d["color"] in d["colors"] and set(d["colors"]) <= set(all_colors)
+        assert len(d["colors"]) == len(set(d["colors"]))
@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+import clients
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(clients, "_registry", {})
+
+
+def test_get_or_create_builds_once_across_threads():
+    created = []
+
+    def factory():
+        time.sleep(0.01)
+        created.append(object())
+        return created[-1]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(clients.get_or_create(("k",), factory))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(r is created[0] for r in results)
+
+
+def test_search_clients_are_shared_per_index_with_one_transport():
+    a = clients.get_search_client("https://example.search.windows.net", "plans", "key")
+    b = clients.get_search_client("https://example.search.windows.net", "plans", "key")
+    c = clients.get_search_client("https://example.search.windows.net", "devices", "key")
+    assert a is b and a is not c
+    assert clients._search_transport() is clients._search_transport()
+
+
+def test_openai_client_is_shared_without_sdk_retries():
+    a = clients.get_openai_client("https://example.openai.azure.com", "key", "2024-10-21")
+    assert clients.get_openai_client("https://example.openai.azure.com", "key", "2024-10-21") is a
+    assert clients.get_openai_client("https://example.openai.azure.com", "other", "2024-10-21") is not a
+    assert a.max_retries == 0
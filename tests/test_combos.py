@@ -0,0 +1,85 @@
+import math
+import random
+from itertools import product
+
+import numpy as np
+import pytest
+
+from catalog import CATALOG_DIR, load_csv_catalog
+from combos import (
+    k_best_pairs, pareto_pairs, combo_costs, build_combinations, catalog_combinations, monthly_device_payments,
+)
+
+
+def random_case(rng: random.Random):
+    # 동점이 자주 나오도록 가격을 큰 단위로 생성
+    fees = np.array([rng.randint(2, 12) * 5000 for _ in range(rng.randint(0, 12))], dtype=np.float64)
+    prices = np.array([rng.randint(1, 20) * 100000 for _ in range(rng.randint(0, 12))], dtype=np.float64)
+    return fees, prices, rng.choice([0, 12, 24, 36])
+
+
+def brute_pairs(fees, prices, months):
+    device_monthly, plan_total = combo_costs(fees, prices, months)
+    return [
+        (float(fees[i] + device_monthly[j]), float(plan_total[i] + prices[j]), i, j)
+        for i, j in product(range(len(fees)), range(len(prices)))
+    ]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_k_best_pairs_matches_brute_force(seed):
+    rng = random.Random(seed)
+    fees, prices, months = random_case(rng)
+    pairs = sorted(brute_pairs(fees, prices, months), key=lambda p: (p[0], p[2], p[3]))
+    k = rng.randint(0, 20)
+    limit = rng.choice([None, 60000.0, 100000.0])
+    expected = [(i, j) for m, _, i, j in pairs if limit is None or m <= limit][:k]
+    assert k_best_pairs(fees, prices, months, k, max_monthly_total=limit) == expected
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_pareto_pairs_matches_brute_force(seed):
+    rng = random.Random(seed)
+    fees, prices, months = random_case(rng)
+    max_monthly = rng.choice([None, 80000.0])
+    max_tco = rng.choice([None, 1500000.0])
+    pairs = [p for p in brute_pairs(fees, prices, months)
+             if (max_monthly is None or p[0] <= max_monthly) and (max_tco is None or p[1] <= max_tco)]
+    values = {(m, t) for m, t, _, _ in pairs}
+    frontier = [v for v in values if not any(o != v and o[0] <= v[0] and o[1] <= v[1] for o in values)]
+    # 같은 (월 납부금액, TCO) 조합이 여러 개면 (요금제 idx, 단말 idx)가 가장 작은 조합
+    expected = [min((i, j) for m, t, i, j in pairs if (m, t) == v) for v in sorted(frontier)]
+    assert pareto_pairs(fees, prices, months, max_monthly, max_tco) == expected
+
+
+def test_monthly_payment_and_lump_sum():
+    prices = np.array([1_200_000.0])
+    assert monthly_device_payments(prices, 0).tolist() == [0.0]
+    # 연 5.9% 원리금 균등상환 24개월 (원 단위 절사)
+    r = 5.9 / 100 / 12
+    assert monthly_device_payments(prices, 24).tolist() == [math.floor(1_200_000 * r * (1 + r) ** 24 / ((1 + r) ** 24 - 1))]
+    _, plan_total = combo_costs(np.array([50000.0]), prices, 0)
+    assert plan_total.tolist() == [50000.0]
+
+
+def test_build_combinations_sorted_by_monthly_total():
+    plans = [{"name": "a", "monthly_fee": 90000.0}, {"name": "b", "monthly_fee": 55000.0}, {"name": "c", "monthly_fee": None}]
+    devices = [{"model": "x", "price": 1_500_000.0}, {"model": "y", "price": 900_000.0}]
+    combos = build_combinations(plans, devices, months=24)
+    assert len(combos) == 6
+    totals = [c["monthly_total"] for c in combos]
+    assert totals == sorted(totals)
+    assert (combos[0]["plan"]["name"], combos[0]["device"]["model"]) == ("c", "y")
+    assert all(c["tco"] == (c["plan"]["monthly_fee"] or 0) * 24 + c["device"]["price"] for c in combos)
+    assert build_combinations(plans, devices, months=24, k=2) == combos[:2]
+
+
+def test_catalog_combinations_respect_budgets():
+    cat = load_csv_catalog(CATALOG_DIR)
+    result = catalog_combinations(cat.plans, cat.devices, months=24, k=5, max_plan_fee=70000,
+                                  max_device_price=1_000_000, brand_pref=["Samsung"])
+    assert len(result["best"]) == 5 and result["pareto"]
+    for c in result["best"] + result["pareto"]:
+        assert c["plan"]["monthly_fee"] <= 70000
+        assert c["device"]["price"] <= 1_000_000 and c["device"]["brand"].lower() == "samsung"
+    assert result["best"][0]["monthly_total"] == result["pareto"][0]["monthly_total"]
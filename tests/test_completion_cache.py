@@ -0,0 +1,88 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import buddy_core
+import completion_cache
+from buddy_core import UserPrefs
+from completion_cache import CompletionCache, make_cache_key
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(completion_cache, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+def stored_keys(path) -> set:
+    with sqlite3.connect(path) as conn:
+        return {k for (k,) in conn.execute("SELECT key FROM completions")}
+
+
+def test_ttl_expires_entries(tmp_path, clock):
+    cache = CompletionCache(str(tmp_path / "c.sqlite3"), ttl_seconds=60)
+    cache.put("k", "v")
+    clock.now += 59
+    assert cache.get("k") == "v"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert stored_keys(cache.path) == set()
+
+
+def test_lru_evicts_least_recently_used(tmp_path, clock):
+    cache = CompletionCache(str(tmp_path / "c.sqlite3"), max_entries=2)
+    cache.put("a", "1")
+    clock.now += 1
+    cache.put("b", "2")
+    clock.now += 1
+    assert cache.get("a") == "1"
+    clock.now += 1
+    cache.put("c", "3")
+    assert stored_keys(cache.path) == {"a", "c"}
+    assert cache.get("b") is None
+
+
+def test_open_purges_only_older_catalog_versions(tmp_path, clock):
+    path = str(tmp_path / "c.sqlite3")
+    cache = CompletionCache(path)
+    cache.put("old", "1", catalog_version="250101")
+    cache.put("current", "2", catalog_version="251029")
+    cache.put("newer", "3", catalog_version="251201")
+    cache.put("unversioned", "4")
+    CompletionCache(path, catalog_version="251029")
+    assert stored_keys(path) == {"current", "newer", "unversioned"}
+
+
+def test_cache_key_normalizes_prefs():
+    base = dict(deployment="gpt", temperature=0.4, catalog_version="251029")
+    a = make_cache_key("plan", {"brand_pref": ["Samsung", "apple"], "notes": " 가벼운   폰 ", "budget": 90000.0}, [1, 2], **base)
+    b = make_cache_key("plan", {"brand_pref": ["Apple", "samsung"], "notes": "가벼운 폰", "budget": 90000}, ["1", "2"], **base)
+    assert a == b
+    assert a != make_cache_key("plan", {"brand_pref": ["Apple", "samsung"], "notes": "가벼운 폰", "budget": 90000}, [2, 1], **base)
+    assert a != make_cache_key("device", {"brand_pref": ["Apple", "samsung"], "notes": "가벼운 폰", "budget": 90000}, [1, 2], **base)
+    assert a != make_cache_key("plan", {"brand_pref": ["Apple", "samsung"], "notes": "가벼운 폰", "budget": 90000}, [1, 2],
+                               **{**base, "catalog_version": "251201"})
+
+
+def test_recommend_plans_reuses_cached_completion(monkeypatch, tmp_path, fake_llm, fake_search):
+    cache = CompletionCache(str(tmp_path / "c.sqlite3"))
+    monkeypatch.setattr(buddy_core, "open_completion_cache", lambda version: cache)
+    prefs = UserPrefs(notes="넷플릭스 혜택")
+    candidates, _ = buddy_core.search_plan_candidates(prefs)
+    first = buddy_core.recommend_plans(prefs, candidates)
+    # 공백만 다른 요구사항도 같은 캐시 키
+    second = buddy_core.recommend_plans(UserPrefs(notes="  넷플릭스   혜택 "), candidates)
+    assert fake_llm.calls == 1
+    assert second == first and first["parsed"]["recommendations"]
+    buddy_core.recommend_plans(prefs, candidates[1:])
+    assert fake_llm.calls == 2
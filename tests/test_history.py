@@ -0,0 +1,57 @@
+from history import HistoryManager, estimate_tokens, message_tokens
+
+SYSTEM = {"role": "system", "content": "너는 추천 어시스턴트다."}
+
+
+def conversation(n: int):
+    return [SYSTEM] + [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"메세지 {i}\n" + "가" * 40}
+        for i in range(n)
+    ]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("가나다") == 3
+
+
+def test_window_keeps_system_and_recent_messages_within_budget():
+    messages = conversation(30)
+    window = HistoryManager(max_tokens=300, summarize=False).window(messages)
+    assert window.messages[0] is SYSTEM
+    assert window.total_tokens <= 300
+    kept = window.messages[1:]
+    assert kept == messages[len(messages) - len(kept):]
+    assert window.dropped_messages == 30 - len(kept) > 0
+    assert window.dropped_tokens == sum(message_tokens(m) for m in messages[1:1 + window.dropped_messages])
+
+
+def test_window_summarizes_dropped_messages_within_budget():
+    messages = conversation(30)
+    window = HistoryManager(max_tokens=300).window(messages)
+    assert window.total_tokens <= 300
+    summary = window.messages[1]
+    assert summary["role"] == "system" and summary["content"].startswith("(이전 대화 요약)")
+    # 요약은 잘린 메세지의 첫 줄이며, 예산이 부족하면 최근에 잘린 메세지부터 남김
+    lines = summary["content"].splitlines()[1:]
+    assert lines and lines[-1] == f"- {messages[window.dropped_messages]['role']}: 메세지 {window.dropped_messages - 1}"
+    assert window.messages[2:] == messages[1 + window.dropped_messages:]
+
+
+def test_window_without_overflow_is_unchanged():
+    messages = conversation(3)
+    window = HistoryManager(max_tokens=10_000).window(messages)
+    assert window.messages == messages
+    assert window.dropped_messages == window.dropped_tokens == 0
+
+
+def test_append_strips_json_and_caps_message_count():
+    manager = HistoryManager(max_messages=4)
+    messages = [SYSTEM]
+    for i in range(5):
+        manager.append(messages, {"role": "user", "content": f"질문 {i}"},
+                       {"role": "assistant", "content": f"답변 {i}\n```json\n{{\"a\": {i}}}\n```"})
+    assert messages[0] is SYSTEM
+    assert [m["content"] for m in messages[1:]] == ["질문 3", "답변 3", "질문 4", "답변 4"]
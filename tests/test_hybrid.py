@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import buddy_core
+import hybrid
+import telemetry
+from catalog import CATALOG_DIR, load_csv_catalog
+from embeddings import CachedEmbedder, EmbeddingDiskCache, HashEmbedder, embedding_key
+from hybrid import rrf_fuse, hybrid_select, semantic_order, plan_text, catalog_vectors
+from scoring import score_plans, top_k
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.inner = HashEmbedder(dim=64)
+        self.model = self.inner.model
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts += texts
+        return self.inner.embed(texts)
+
+
+@pytest.fixture(scope="module")
+def cat():
+    return load_csv_catalog(CATALOG_DIR)
+
+
+def test_rrf_fuse_orders_by_weighted_reciprocal_rank():
+    assert rrf_fuse([["a", "b", "c"], ["c", "d"]], [1.0, 1.0]) == ["c", "a", "b", "d"]
+    assert rrf_fuse([["a", "b", "c"], ["c", "d"]], [1.0, 0.0]) == ["a", "b", "c", "d"]
+    assert rrf_fuse([["a", "b"], ["b", "a"]], [1.0, 3.0]) == ["b", "a"]
+    assert rrf_fuse([[], []], [1.0, 1.0]) == []
+
+
+def test_hash_embedder_is_deterministic_and_normalized():
+    emb = HashEmbedder(dim=128)
+    a = emb.embed(["넷플릭스 혜택 요금제", "가벼운 폰", ""])
+    b = HashEmbedder(dim=128).embed(["넷플릭스 혜택 요금제", "가벼운 폰", ""])
+    np.testing.assert_array_equal(a, b)
+    assert a.dtype == np.float32 and a.shape == (3, 128)
+    assert np.linalg.norm(a[0]) == pytest.approx(1.0) and not a[2].any()
+    q = emb.embed(["넷플릭스"])[0]
+    assert q @ a[0] > q @ a[1]
+
+
+def test_cached_embedder_hits_memory_then_disk(tmp_path):
+    inner = CountingEmbedder()
+    disk = EmbeddingDiskCache(str(tmp_path / "emb.sqlite"))
+    emb = CachedEmbedder(inner, disk, memory_entries=2)
+    first = emb.embed(["a", "b", "a"])
+    assert inner.texts == ["a", "b"]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(emb.embed(["b"]), first[1:2])
+    assert inner.texts == ["a", "b"]
+
+    emb.embed(["c"])   # 메모리에서 a 제거, 디스크에는 남음
+    assert list(emb._memory) == [embedding_key(emb.model, "b"), embedding_key(emb.model, "c")]
+    np.testing.assert_array_equal(emb.embed(["a"])[0], first[0])
+    assert inner.texts == ["a", "b", "c"]
+
+    # 다른 프로세스(새 인스턴스)도 디스크 캐시 재사용
+    other = CachedEmbedder(CountingEmbedder(), disk)
+    other.embed(["a", "b", "c"])
+    assert other.embedder.texts == []
+    assert emb.embed([]).shape == (0, 0)
+
+
+def test_cached_embedder_counts_duplicates_once():
+    emb = CachedEmbedder(CountingEmbedder())
+    with telemetry.trace("test") as t:
+        emb.embed(["x", "y", "x"])
+        emb.embed(["x", "x", "z"])
+    assert t.summary()["cache"]["embedding"] == {"hit": 1, "miss": 3, "hit_ratio": 0.25}
+
+
+def test_plan_text_includes_membership_once():
+    text = plan_text({"plan_name": "요고 30", "membership": "VIP제공", "benefit_1": "OTT"})
+    assert text == "요고 30 OTT 멤버십 VIP제공"
+    assert text.count("VIP제공") == 1
+
+
+def test_catalog_vectors_are_saved_and_reused(tmp_path, cat):
+    inner = CountingEmbedder()
+    docs = cat.plans.docs[:5]
+    vecs = catalog_vectors("plan", docs, "test-saved", inner, out_dir=str(tmp_path))
+    assert vecs.shape == (5, 64) and len(inner.texts) == 5
+    (path,) = tmp_path.iterdir()
+    hybrid._vectors.clear()
+    again = catalog_vectors("plan", docs, "test-saved", inner, out_dir=str(tmp_path))
+    np.testing.assert_array_equal(again, vecs)
+    assert len(inner.texts) == 5 and isinstance(again, np.memmap)
+
+
+def test_semantic_order_respects_eligibility(cat):
+    emb = HashEmbedder(dim=64)
+    docs = cat.plans.docs
+    target = 7
+    eligible = np.ones(len(docs), dtype=bool)
+    assert semantic_order("plan", plan_text(docs[target]), docs, "test-sem", emb, eligible, 5)[0] == target
+    eligible[target] = False
+    order = semantic_order("plan", plan_text(docs[target]), docs, "test-sem", emb, eligible, 5)
+    assert target not in order and len(order) == 5
+
+
+def test_hybrid_select_fuses_keyword_and_vector_rankings(cat, monkeypatch):
+    emb = HashEmbedder(dim=64)
+    scores = score_plans(cat.plans, 30.0, 60000.0, False)
+    keyword = [(cat.plans.docs[i], float(scores[i])) for i in top_k(scores, hybrid.HYBRID_POOL)]
+    # 조건은 만족하지만 점수 순위가 가장 낮은 요금제를 설명하는 notes
+    target = cat.plans.docs[int(np.argmax(np.where(np.isfinite(scores), scores, -np.inf)))]
+    select = lambda: hybrid_select("plan", plan_text(target), "planId", keyword, cat.plans.docs, scores, "test-select", emb, 3)
+
+    selected = select()
+    ids = [d["planId"] for d, _ in selected]
+    assert len(ids) == 3 == len(set(ids))
+    assert all(s == float(scores[cat.plans.docs.index(d)]) for d, s in selected)
+
+    monkeypatch.setattr(hybrid, "HYBRID_VECTOR_WEIGHT", 0.0)
+    assert [d["planId"] for d, _ in select()] == [d["planId"] for d, _ in keyword[:3]]
+    monkeypatch.setattr(hybrid, "HYBRID_VECTOR_WEIGHT", 100.0)
+    assert select()[0][0]["planId"] == target["planId"]
+
+
+def test_unlimited_request_never_selects_limited_plans(cat, fake_search):
+    plans = buddy_core.fetch_plan_candidates(None, 60000, True, 5, notes="데이터 적게 쓰는 저렴한 요금제")
+    unlimited = {d["planId"] for d, u in zip(cat.plans.docs, cat.plans.unlimited) if u}
+    assert len(plans) == 5 and {d["planId"] for d in plans} <= unlimited
@@ -0,0 +1,132 @@
+import csv
+from types import SimpleNamespace
+
+import pytest
+
+import ingest
+from catalog import CATALOG_DIR, latest_catalog_files, plan_index_fields
+from fakes import FakeSearchClient
+from ingest import diff_rows, row_hash, send_batch, ingest_index
+
+FIELDS = ["planId", "plan_name", "monthly_fee"]
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(FIELDS)
+        w.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ingest.time, "sleep", lambda s: None)
+
+
+def result(key, status=200, error=None):
+    return SimpleNamespace(key=key, succeeded=status < 300, status_code=status, error_message=error)
+
+
+def test_row_hash_ignores_key_order():
+    assert row_hash({"a": 1, "b": "가"}) == row_hash({"b": "가", "a": 1})
+    assert row_hash({"a": 1}) != row_hash({"a": "1"})
+
+
+def test_diff_rows():
+    rows = {"1": {"planId": "1", "fee": 1}, "2": {"planId": "2", "fee": 2}, "3": {"planId": "3", "fee": 3}}
+    last = {"1": row_hash(rows["1"]), "2": "stale", "9": "gone", "8": "gone"}
+    upserts, deletes, hashes = diff_rows(rows, last)
+    assert [d["planId"] for d in upserts] == ["2", "3"]
+    assert deletes == ["8", "9"]
+    assert hashes == {k: row_hash(d) for k, d in rows.items()}
+
+
+def test_send_batch_retries_only_retryable_documents():
+    calls = []
+
+    def action(docs):
+        calls.append([d["k"] for d in docs])
+        if len(calls) == 1:
+            raise ConnectionError("reset")
+        if len(calls) == 2:
+            return [result("a"), result("b", 503, "busy"), result("c", 400, "bad")]
+        return [result(d["k"]) for d in docs]
+
+    ok, failed = send_batch(action, [{"k": "a"}, {"k": "b"}, {"k": "c"}], "k", max_retries=3, backoff=0)
+    assert calls == [["a", "b", "c"], ["a", "b", "c"], ["b"]]
+    assert ok == ["a", "b"]
+    assert failed == {"c": "400: bad"}
+
+
+def test_send_batch_gives_up_after_max_retries():
+    def action(docs):
+        raise ConnectionError("down")
+
+    ok, failed = send_batch(action, [{"k": "a"}], "k", max_retries=2, backoff=0)
+    assert ok == [] and failed == {"a": "ConnectionError: down"}
+
+
+def test_ingest_index_is_incremental(tmp_path):
+    client = FakeSearchClient([], key_field="planId")
+    state = {}
+    path = write_csv(tmp_path / "v1.csv", [["1", "A", "10000"], ["2", "B", "20000"], ["3", "C", "30000"]])
+    stats = ingest_index(client, "plans", path, "planId", "v1", state)
+    assert (stats["rows"], stats["upserts"], stats["deletes"], stats["failed"]) == (3, 3, 0, {})
+    assert sorted(d["planId"] for d in client.docs) == ["1", "2", "3"]
+
+    # 변경 없음: 아무 것도 보내지 않음
+    assert ingest_index(client, "plans", path, "planId", "v1", state)["upserts"] == 0
+
+    path = write_csv(tmp_path / "v2.csv", [["1", "A", "10000"], ["2", "B2", "25000"], ["4", "D", "40000"]])
+    stats = ingest_index(client, "plans", path, "planId", "v2", state)
+    assert (stats["upserts"], stats["deletes"]) == (2, 1)
+    docs = {d["planId"]: d for d in client.docs}
+    assert sorted(docs) == ["1", "2", "4"]
+    assert docs["2"]["plan_name"] == "B2"
+    assert state["plans"]["version"] == "v2" and sorted(state["plans"]["hashes"]) == ["1", "2", "4"]
+
+
+def test_ingest_index_full_reuploads_and_deletes_removed_rows(tmp_path):
+    client = FakeSearchClient([], key_field="planId")
+    state = {}
+    ingest_index(client, "plans", write_csv(tmp_path / "v1.csv", [["1", "A", "1"], ["2", "B", "2"]]), "planId", "v1", state)
+    stats = ingest_index(client, "plans", write_csv(tmp_path / "v2.csv", [["1", "A", "1"]]), "planId", "v2", state, full=True)
+    assert (stats["upserts"], stats["deletes"]) == (1, 1)
+    assert [d["planId"] for d in client.docs] == ["1"]
+
+
+def test_failed_upserts_are_retried_next_run(tmp_path, monkeypatch):
+    client = FakeSearchClient([], key_field="planId")
+    state = {}
+    path = write_csv(tmp_path / "v1.csv", [["1", "A", "1"], ["2", "B", "2"]])
+    ingest_index(client, "plans", path, "planId", "v1", state)
+
+    path = write_csv(tmp_path / "v2.csv", [["1", "A2", "1"], ["2", "B2", "2"]])
+    real = client.merge_or_upload_documents
+    client.merge_or_upload_documents = lambda documents: [
+        result(str(d["planId"]), 400, "bad") if d["planId"] == "2" else real([d])[0] for d in documents]
+    stats = ingest_index(client, "plans", path, "planId", "v2", state)
+    assert list(stats["failed"]) == ["2"]
+    assert state["plans"]["hashes"]["2"] == ""
+
+    client.merge_or_upload_documents = real
+    stats = ingest_index(client, "plans", path, "planId", "v2", state)
+    assert stats["upserts"] == 1 and stats["failed"] == {}
+    assert {d["planId"]: d["plan_name"] for d in client.docs} == {"1": "A2", "2": "B2"}
+
+
+def test_dry_run_and_index_fields_on_catalog(tmp_path):
+    _, plan_path, _ = latest_catalog_files(CATALOG_DIR)
+    client = FakeSearchClient([], key_field="planId")
+    state = {}
+    stats = ingest_index(client, "plans", plan_path, "planId", "v", state, dry_run=True, index_fields=plan_index_fields)
+    assert stats["upserts"] == stats["rows"] > 0 and client.docs == [] and state == {}
+
+    ingest_index(client, "plans", plan_path, "planId", "v", state, index_fields=plan_index_fields)
+    assert len(client.docs) == stats["rows"]
+    assert all(set(plan_index_fields(d)) <= set(d) for d in client.docs)
+
+    ingest.save_state(state, str(tmp_path / "state.json"))
+    assert ingest.load_state(str(tmp_path / "state.json")) == state
+    assert ingest.load_state(str(tmp_path / "missing.json")) == {}
@@ -0,0 +1,60 @@
+import buddy_core
+import telemetry
+from buddy_core import UserPrefs
+from fakes import FakeOpenAI, Latency
+
+
+def test_joint_mode_makes_one_llm_call(fake_llm, fake_search):
+    result = buddy_core.recommend(UserPrefs(notes="joint 1회 호출 확인: 넷플릭스"))
+    assert fake_llm.calls == 1
+    for kind in ("plan", "device"):
+        section = result[kind]
+        assert section["errors"] == []
+        assert len(section["parsed"]["recommendations"]) == 3
+        assert section["reply"] == section["parsed"]["explanation"]
+    assert result["combinations"]
+
+
+def test_separate_mode_makes_two_llm_calls(fake_llm, fake_search, monkeypatch):
+    monkeypatch.setattr(buddy_core, "JOINT_RECOMMENDATION", False)
+    result = buddy_core.recommend(UserPrefs(notes="각각 호출 확인: 넷플릭스"))
+    assert fake_llm.calls == 2
+    assert result["plan"]["errors"] == [] and result["device"]["errors"] == []
+
+
+def test_joint_pipeline_reports_progress_for_both_sections(fake_llm, fake_search):
+    updates = []
+    result = buddy_core.run_joint_pipeline(UserPrefs(notes="진행 상황 확인"), on_progress=lambda kind, partial: updates.append(kind))
+    assert {"plan", "device"} <= set(updates)
+    # 후보는 LLM 응답 전에 먼저 전달
+    assert updates[:2] == ["plan", "device"]
+    assert result["plan"]["candidates"] and result["device"]["candidates"]
+
+
+def test_joint_llm_reply_joins_explanations(fake_llm, fake_search):
+    prefs = UserPrefs(notes="설명 합치기 확인")
+    candidates = buddy_core.search_candidates(prefs)
+    plans, devices = candidates["plan"][0], candidates["device"][0]
+    msgs = buddy_core.build_joint_prompt(prefs, plans, devices, None)
+    reply, parsed = buddy_core.llm_recommend(
+        "joint", msgs, {"plan": plans, "device": devices}, buddy_core.joint_cache_key(prefs, plans, devices))
+    assert reply == parsed["plan"]["explanation"] + "\n\n" + parsed["device"]["explanation"]
+
+
+def test_repeated_joint_prompt_prefix_is_cached(fake_llm, fake_search):
+    summaries = []
+    for notes in ("프롬프트 캐싱 확인 A", "프롬프트 캐싱 확인 B"):
+        with telemetry.trace("test") as t:
+            buddy_core.recommend(UserPrefs(notes=notes))
+        summaries.append(t.summary()["tokens"]["joint"])
+    assert summaries[0]["cached_ratio"] == 0.0
+    assert 0 < summaries[1]["cached"] < summaries[1]["prompt"]
+
+
+def test_joint_llm_error_is_reported_in_both_sections(fake_search, monkeypatch):
+    llm = FakeOpenAI(Latency(error_rate=1.0))
+    monkeypatch.setattr(buddy_core, "get_openai", lambda: llm)
+    result = buddy_core.recommend(UserPrefs(notes="오류 확인"))
+    assert result["plan"]["errors"] and result["device"]["errors"]
+    assert result["plan"]["errors"][0].startswith("OpenAI 호출 오류")
+    assert result["plan"]["candidates"] and result["combinations"] == []
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+import buddy_core
+from buddy_core import UserPrefs
+from catalog import CATALOG_DIR, LocalCatalogBackend, load_csv_catalog
+
+
+class BarrierBackend(LocalCatalogBackend):
+    """
+    요금제/단말 조회가 서로를 기다리는 백엔드. 두 조회가 동시에 실행되어야만 통과
+    """
+    def __init__(self, parties: int):
+        super().__init__(load_csv_catalog(CATALOG_DIR))
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.threads = []
+
+    def search_plans(self, *args):
+        self.threads.append(threading.current_thread().name)
+        self.barrier.wait()
+        return super().search_plans(*args)
+
+    def search_devices(self, *args):
+        self.threads.append(threading.current_thread().name)
+        self.barrier.wait()
+        return super().search_devices(*args)
+
+
+@pytest.fixture(params=[True, False], ids=["joint", "separate"])
+def joint(request, monkeypatch):
+    monkeypatch.setattr(buddy_core, "JOINT_RECOMMENDATION", request.param)
+    return request.param
+
+
+def test_concurrent_runs_plan_and_device_searches_together(monkeypatch, joint):
+    backend = BarrierBackend(parties=2)
+    monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: backend)
+    result = buddy_core.recommend(UserPrefs(), concurrent=True)
+    assert result["plan"]["errors"] == [] and result["device"]["errors"] == []
+    assert "MainThread" not in backend.threads
+
+
+def test_sequential_runs_on_calling_thread(monkeypatch, joint):
+    backend = BarrierBackend(parties=1)
+    monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: backend)
+    buddy_core.recommend(UserPrefs(), concurrent=False)
+    assert backend.threads == ["MainThread", "MainThread"]
+
+
+@pytest.mark.parametrize("notes", ["", "가벼운 폰, 넷플릭스 혜택"])
+def test_concurrent_and_sequential_results_match(fake_llm, fake_search, joint, notes):
+    prefs = UserPrefs(data_gb=30, budget=60000, brand_pref=("Apple",), device_budget=1200000, notes=notes)
+    concurrent = buddy_core.recommend(prefs, concurrent=True)
+    sequential = buddy_core.recommend(prefs, concurrent=False)
+    assert concurrent == sequential
+    assert concurrent["plan"]["parsed"]["recommendations"]
+    assert concurrent["device"]["parsed"]["recommendations"]
+    assert concurrent["combinations"]
+
+
+def test_search_error_is_reported_per_pipeline(monkeypatch, joint):
+    class FailingDevices(LocalCatalogBackend):
+        def search_devices(self, *args):
+            raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: FailingDevices(load_csv_catalog(CATALOG_DIR)))
+    result = buddy_core.recommend(UserPrefs(), concurrent=True)
+    assert result["plan"]["errors"] == []
+    assert result["plan"]["parsed"]["recommendations"]
+    assert result["device"]["candidates"] == []
+    assert any("index unavailable" in e for e in result["device"]["errors"])
+    assert result["combinations"] == []
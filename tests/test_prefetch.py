@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import wait
+
+import pytest
+
+import prefetch
+from buddy_core import UserPrefs
+from prefetch import Prefetcher, PrefetchCancelled
+
+A, B = UserPrefs(budget=50000), UserPrefs(budget=70000)
+
+
+@pytest.fixture
+def debounce(monkeypatch):
+    def set_debounce(seconds):
+        monkeypatch.setattr(prefetch, "PREFETCH_DEBOUNCE", seconds)
+    set_debounce(0.0)
+    return set_debounce
+
+
+def job(prefetcher, key):
+    return prefetcher._jobs[key][0]
+
+
+def finished(future):
+    wait([future], timeout=5)
+    assert future.done()
+    return future
+
+
+def was_cancelled(future):
+    finished(future)
+    return future.cancelled() or isinstance(future.exception(), PrefetchCancelled)
+
+
+def test_prefetch_fast_path_runs_recommendation(debounce, fake_llm, fake_search):
+    out = prefetch.prefetch(A, None, threading.Event())
+    assert out["candidates"]["plan"][0] and out["candidates"]["device"][0]
+    for name in ("plan", "device"):
+        assert out["results"][name]["candidates"] == out["candidates"][name][0]
+        assert len(out["results"][name]["parsed"]["recommendations"]) == 3
+    assert fake_llm.calls == 0
+
+
+def test_prefetch_with_notes_searches_only_unless_enabled(debounce, fake_llm, fake_search, monkeypatch):
+    prefs = UserPrefs(notes="prefetch 넷플릭스")
+    out = prefetch.prefetch(prefs, None, threading.Event())
+    assert out["results"] is None and out["candidates"]["plan"][0]
+    assert fake_llm.calls == 0
+
+    monkeypatch.setattr(prefetch, "PREFETCH_LLM", True)
+    out = prefetch.prefetch(prefs, None, threading.Event())
+    assert out["results"]["plan"]["parsed"]["recommendations"] and fake_llm.calls == 1
+
+
+def test_cancel_during_debounce_skips_search(debounce, monkeypatch):
+    debounce(5.0)
+    monkeypatch.setattr(prefetch, "search_candidates", lambda prefs: pytest.fail("검색하면 안 됨"))
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(PrefetchCancelled):
+        prefetch.prefetch(A, None, cancel)
+
+
+def test_new_input_cancels_pending_job(debounce, fake_search):
+    debounce(5.0)
+    p = Prefetcher()
+    p.schedule("a", A)
+    first = job(p, "a")
+    p.schedule("b", B)
+    assert was_cancelled(first)
+    assert not job(p, "b").done()
+
+    # A -> B -> A: 취소된 A는 다시 실행
+    p.schedule("a", A)
+    assert job(p, "a") is not first
+    assert was_cancelled(job(p, "b"))
+    p.take("none")
+    assert was_cancelled(job(p, "a"))
+
+
+def test_same_input_keeps_running_job(debounce, fake_search):
+    debounce(5.0)
+    p = Prefetcher()
+    p.schedule("a", A)
+    first = job(p, "a")
+    p.schedule("a", A)
+    assert job(p, "a") is first and not first.done()
+    assert p.take("a") is None
+    assert was_cancelled(first)
+
+
+def test_take_returns_finished_result_once(debounce, fake_llm, fake_search):
+    p = Prefetcher()
+    p.schedule("a", A)
+    finished(job(p, "a"))
+    p.schedule("a", A)      # 성공한 작업은 다시 실행하지 않음
+    out = p.take("a")
+    assert out["results"]["plan"]["parsed"]["recommendations"]
+    assert p.take("a") is None
+
+
+def test_failed_job_is_resubmitted(debounce, fake_search, monkeypatch):
+    real = prefetch.search_candidates
+    calls = []
+
+    def flaky(prefs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("search down")
+        return real(prefs)
+
+    monkeypatch.setattr(prefetch, "search_candidates", flaky)
+    p = Prefetcher()
+    p.schedule("a", A)
+    failed = finished(job(p, "a"))
+    assert isinstance(failed.exception(), RuntimeError)
+    p.schedule("a", A)
+    retried = finished(job(p, "a"))
+    assert retried is not failed and retried.exception() is None
+    assert len(calls) == 2 and p.take("a")["candidates"]
+
+
+def test_keeps_recent_entries_only(debounce, fake_search):
+    p = Prefetcher(max_entries=2)
+    for key, budget in (("a", 50000), ("b", 60000), ("c", 70000)):
+        p.schedule(key, UserPrefs(budget=budget))
+        finished(job(p, key))
+    assert list(p._jobs) == ["b", "c"]
@@ -0,0 +1,57 @@
+import buddy_core
+from buddy_core import UserPrefs
+from ranker import rank_plans, rank_devices, describe
+
+
+def test_fast_path_skips_llm_and_keeps_score_order(fake_llm, fake_search):
+    prefs = UserPrefs(data_gb=30, budget=60000, brand_pref=("Samsung",), device_budget=1000000)
+    result = buddy_core.recommend(prefs)
+    assert fake_llm.calls == 0
+    plan_ids = [r["plan"]["planId"] for r in result["plan"]["parsed"]["recommendations"]]
+    assert plan_ids == [d["planId"] for d in result["plan"]["candidates"][:3]]
+    snty = [r["device"]["sntyNo"] for r in result["device"]["parsed"]["recommendations"]]
+    assert snty == [d["sntyNo"] for d in result["device"]["candidates"][:3]]
+    assert result["plan"]["reply"].startswith("기타 요구사항이 없어")
+    assert len(result["combinations"]) == 3
+
+
+def test_notes_or_disabled_fast_path_call_llm(monkeypatch, fake_llm, fake_search):
+    buddy_core.recommend(UserPrefs(notes="가벼운 폰"))
+    assert fake_llm.calls > 0
+    calls = fake_llm.calls
+    monkeypatch.setattr(buddy_core, "FAST_PATH", False)
+    buddy_core.recommend(UserPrefs())
+    assert fake_llm.calls > calls
+
+
+def test_rank_plans_reasons_and_unlimited_filter():
+    candidates = [
+        {"planId": "1", "plan_name": "슬림", "monthly_fee": "55000", "data_gb": "20GB", "throttling": "1Mbps"},
+        {"planId": "2", "plan_name": "초이스", "monthly_fee": "90000", "data_gb": "무제한", "benefit_1": "OTT"},
+        {"planId": "3", "plan_name": "베이직", "monthly_fee": "80000", "data_gb": "110GB"},
+    ]
+    parsed = rank_plans(candidates, data_gb=30, budget=60000, data_unlimited=False, k=2)
+    first, second = parsed["recommendations"]
+    assert (first["rank"], first["plan"]["planId"], first["monthly_total"]) == (1, "1", 55000)
+    assert first["reasons"] == ["월정액 55,000원으로 예산 60,000원보다 5,000원 저렴해요"]
+    assert first["caveats"] == ["데이터 20GB로 희망 사용량 30GB보다 적어요", "데이터 소진 시: 1Mbps"]
+    assert "혜택: OTT" in second["reasons"] and "월정액 90,000원으로 예산보다 30,000원 비싸요" in second["caveats"]
+    assert parsed["alternatives"] == ["베이직 (월 80,000원, 데이터 110GB)"]
+
+    unlimited = rank_plans(candidates, data_gb=None, budget=90000, data_unlimited=True)
+    assert [r["plan"]["planId"] for r in unlimited["recommendations"]] == ["2"]
+
+
+def test_rank_devices_brand_and_weight():
+    candidates = [
+        {"sntyNo": "a", "brand": "Apple", "model": "iPhone", "storage_gb": "256GB", "price": "1300000", "weight_g": "171"},
+        {"sntyNo": "b", "brand": "Samsung", "model": "Galaxy", "storage_gb": "512GB", "price": "1100000", "weight_g": "232"},
+    ]
+    parsed = rank_devices(candidates, device_budget=1200000, brand_pref=["samsung"])
+    apple, samsung = parsed["recommendations"]
+    assert "선호 브랜드가 아닌 Apple 단말이에요" in apple["caveats"]
+    assert "무게 171g으로 후보 중 가장 가벼워요" in apple["reasons"]
+    assert "선호 브랜드(Samsung)와 일치해요" in samsung["reasons"]
+    assert "무게 232g으로 무거운 편이에요" in samsung["caveats"]
+    text = describe(parsed, "device")
+    assert "**1. Apple iPhone 256GB**" in text and "- ⚠️ 출고가 1,300,000원으로 예산보다 100,000원 비싸요" in text
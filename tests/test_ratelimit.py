@@ -0,0 +1,161 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import ratelimit
+from fakes import FakeRateLimitError, FakeServiceError
+from ratelimit import AdaptiveLimiter, RateLimitExceeded, TokenBucket, throttle_delay, usage_tokens
+
+
+def flaky(*errors, result="ok"):
+    """
+    errors를 차례로 던진 뒤 result 반환하는 호출
+    """
+    pending = list(errors)
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if pending:
+            raise pending.pop(0)
+        return result
+    return call, calls
+
+
+def wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def hold_slot(limiter):
+    """
+    다른 스레드에서 호출 자리 하나를 차지. release.set()으로 반납
+    """
+    release, entered = threading.Event(), threading.Event()
+
+    def run():
+        with limiter.request(lambda: None, tokens=1):
+            entered.set()
+            release.wait(5)
+
+    t = threading.Thread(target=run)
+    t.start()
+    entered.wait(5)
+    return release, t
+
+
+def test_throttle_delay():
+    assert throttle_delay(FakeRateLimitError(1.5)) == 1.5
+    err = SimpleNamespace(status_code=429, response=SimpleNamespace(headers={"retry-after": "2"}))
+    assert throttle_delay(err) == 2.0
+    err.response.headers = {"retry-after-ms": "soon", "retry-after": "3"}
+    assert throttle_delay(err) == 3.0
+    assert throttle_delay(SimpleNamespace(status_code=429, response=None)) == 0.0
+    assert throttle_delay(FakeServiceError("boom")) is None
+
+
+def test_429_halves_window_and_retries_after_delay():
+    limiter = AdaptiveLimiter(max_concurrency=8, max_retries=2)
+    call, calls = flaky(FakeRateLimitError(0.05))
+    with limiter.request(call, tokens=10) as result:
+        assert result == "ok"
+        assert limiter.window == 4.0 and limiter.in_flight == 1
+    assert calls[1] - calls[0] >= 0.05
+    # 성공하면 창이 1/창 만큼 늘어남
+    assert limiter.window == pytest.approx(4.25) and limiter.in_flight == 0
+
+
+def test_429_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(ratelimit, "LLM_BACKOFF_BASE", 0.001)
+    limiter = AdaptiveLimiter(max_concurrency=8, max_retries=1)
+    call, calls = flaky(FakeRateLimitError(0.0), FakeRateLimitError(0.0), FakeRateLimitError(0.0))
+    with pytest.raises(FakeRateLimitError):
+        with limiter.request(call, tokens=10):
+            pass
+    assert len(calls) == 2 and limiter.in_flight == 0 and limiter.window >= 1
+
+
+def test_concurrent_429s_halve_window_once():
+    limiter = AdaptiveLimiter(max_concurrency=8)
+    limiter.in_flight = 2
+    limiter._throttle(0.0)
+    limiter._throttle(0.0)
+    assert limiter.window == 4.0 and limiter.in_flight == 0
+
+
+def test_other_errors_release_without_shrinking():
+    limiter = AdaptiveLimiter(max_concurrency=8)
+    call, calls = flaky(FakeServiceError("boom"))
+    with pytest.raises(FakeServiceError):
+        with limiter.request(call, tokens=10):
+            pass
+    assert len(calls) == 1 and limiter.window == 8.0 and limiter.in_flight == 0
+
+
+def test_queue_full_rejects_immediately():
+    limiter = AdaptiveLimiter(max_concurrency=1, queue_size=1)
+    release, holder = hold_slot(limiter)
+    admitted = []
+
+    def wait_in_queue():
+        with limiter.request(lambda: None, tokens=1):
+            admitted.append(1)
+
+    waiting = threading.Thread(target=wait_in_queue)
+    waiting.start()
+    wait_for(lambda: len(limiter._queue) == 1)
+
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded, match="대기열"):
+        with limiter.request(lambda: None, tokens=1):
+            pass
+    assert time.monotonic() - started < 1.0
+    release.set()
+    holder.join(5)
+    waiting.join(5)
+    assert admitted == [1] and not limiter._queue and limiter.in_flight == 0
+
+
+def test_timeout_rejects_when_no_slot_frees():
+    limiter = AdaptiveLimiter(max_concurrency=1)
+    release, holder = hold_slot(limiter)
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded, match="초 안에"):
+        with limiter.request(lambda: None, tokens=1, timeout=0.05):
+            pass
+    assert 0.05 <= time.monotonic() - started < 1.0
+    assert not limiter._queue
+    release.set()
+    holder.join(5)
+    assert limiter.in_flight == 0
+
+
+def test_token_bucket_waits_and_settles():
+    bucket = TokenBucket(600)   # 초당 10개
+    now = bucket.updated
+    assert bucket.wait_time(600, now) == 0.0
+    bucket.take(600)
+    assert bucket.wait_time(100, now) == pytest.approx(10.0)
+    # 예약(600)보다 적게(100) 쓰면 차이를 돌려받음
+    bucket.settle(600, 100)
+    assert bucket.tokens == 500 and bucket.wait_time(100, now) == 0.0
+    bucket.settle(0, 700)
+    assert bucket.tokens == -200
+    # 버킷 용량보다 큰 요청은 가득 찬 상태에서 허용
+    bucket.tokens = 600
+    assert bucket.wait_time(5000, now) == 0.0
+    bucket.drain()
+    assert bucket.tokens == 0
+
+
+def test_limiter_settles_bucket_with_usage():
+    limiter = AdaptiveLimiter(tokens_per_minute=1000)
+    with limiter.request(lambda: None, tokens=800):
+        assert limiter.bucket.tokens == pytest.approx(200, abs=1)
+    limiter.settle(800, SimpleNamespace(prompt_tokens=150, completion_tokens=50))
+    assert limiter.bucket.tokens == pytest.approx(800, abs=1)
+    assert usage_tokens(None) is None
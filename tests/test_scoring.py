@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from buddy_core import score_plan, score_device
+from catalog import CATALOG_DIR, PlanTable, DeviceTable, load_csv_catalog
+from scoring import score_plans, score_devices, top_k
+
+EXTRA_PLANS = [
+    {"planId": "x1", "monthly_fee": None, "data_gb": "무제한"},
+    {"planId": "x2", "monthly_fee": "69,000", "data_gb": None},
+    {"planId": "x3", "monthly_fee": "요금 문의", "data_gb": "완전무제한(속도제어)"},
+    {"planId": "x4", "monthly_fee": 55000, "data_gb": "11.5GB"},
+    {"planId": "x5", "monthly_fee": "33000원", "data_gb": "Unlimited 5G"},
+]
+EXTRA_DEVICES = [
+    {"sntyNo": "y1", "brand": None, "price": None},
+    {"sntyNo": "y2", "brand": "APPLE", "price": "1,250,000"},
+    {"sntyNo": "y3", "brand": "Samsung", "price": 990000.0},
+    {"sntyNo": "y4", "brand": "xiaomi", "price": "가격 미정"},
+]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return load_csv_catalog(CATALOG_DIR)
+
+
+@pytest.mark.parametrize("target_gb, target_price, want_unlimited", [
+    (50.0, 90000.0, False),
+    (1.0, 20000.0, False),
+    (None, 60000.0, False),
+    (30.0, None, False),
+    (None, 110000.0, True),
+    (None, None, True),
+])
+def test_score_plans_matches_score_plan(catalog, target_gb, target_price, want_unlimited):
+    docs = list(catalog.plans.docs) + EXTRA_PLANS
+    scores = score_plans(PlanTable.from_docs(docs), target_gb, target_price, want_unlimited)
+    expected = [score_plan(d, target_gb, target_price, want_unlimited) for d in docs]
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("target_price, brand_pref", [
+    (1500000.0, ["Samsung"]),
+    (800000.0, ["apple", "Xiaomi"]),
+    (300000.0, []),
+    (None, ["Samsung"]),
+])
+def test_score_devices_matches_score_device(catalog, target_price, brand_pref):
+    docs = list(catalog.devices.docs) + EXTRA_DEVICES
+    scores = score_devices(DeviceTable.from_docs(docs), target_price, brand_pref)
+    expected = [score_device(d, target_price, brand_pref) for d in docs]
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-9)
+
+
+def test_top_k_matches_stable_sort_with_ties():
+    rng = random.Random(7)
+    for _ in range(200):
+        n = rng.randint(0, 40)
+        # 동점과 inf가 많이 나오도록 작은 정수 범위 사용
+        scores = np.array([rng.choice([rng.randint(0, 5), np.inf]) for _ in range(n)], dtype=np.float64)
+        k = rng.randint(0, n + 3)
+        expected = sorted(range(n), key=lambda i: scores[i])[:k]
+        assert top_k(scores, k).tolist() == expected
+
+
+def test_top_k_empty_and_non_positive_k():
+    assert top_k(np.array([]), 3).tolist() == []
+    assert top_k(np.array([1.0, 0.5]), 0).tolist() == []
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+import search_cache
+from catalog import AzureSearchBackend
+from fakes import fake_search_clients
+from search_cache import SearchResultCache, bucket, bucket_data_gb, plan_query_key, device_query_key
+
+
+class CountingClient:
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+
+    def search(self, **kwargs):
+        self.calls += 1
+        return self.client.search(**kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(search_cache, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_bucketing():
+    assert bucket(None, 10000) is None
+    assert bucket(84000, 10000) == bucket(76000, 10000) == 80000
+    assert bucket(1000, 10000) == 10000
+    assert bucket_data_gb(3) == 3
+    assert bucket_data_gb(48) == bucket_data_gb(52) == 50
+    assert plan_query_key(48, 84000, False) == plan_query_key(52, 76000, False)
+    assert plan_query_key(10, 50000, True) == plan_query_key(100, 90000, True)
+    assert device_query_key(1_240_000, ["Samsung", " apple"]) == device_query_key(1_160_000, ["Apple", "samsung", "Samsung"])
+
+
+def test_cache_lru_ttl_and_version(clock):
+    cache = SearchResultCache(max_entries=2, ttl_seconds=10)
+    cache.put("a", "v1", 1)
+    cache.put("b", "v1", 2)
+    assert cache.get("a", "v1") == 1
+    cache.put("c", "v1", 3)
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == 1 and cache.get("c", "v1") == 3
+    assert cache.get("a", "v2") is None
+    assert cache.get("a", "v1") is None  # 다른 버전 조회 시 삭제
+    clock.value += 11
+    assert cache.get("c", "v1") is None
+    assert (cache.hits, cache.misses) == (3, 4)
+
+
+def test_backend_reuses_results_within_bucket():
+    plan_client, device_client = (CountingClient(c) for c in fake_search_clients())
+    backend = AzureSearchBackend(lambda: plan_client, lambda: device_client, cache=SearchResultCache(), catalog_version="v")
+    first = backend.search_plans(48, 84000, False)
+    second = backend.search_plans(52, 76000, False)
+    assert plan_client.calls == 1 and second is first
+    backend.search_plans(30, 84000, False)
+    assert plan_client.calls == 2
+
+    devices = backend.search_devices(1_240_000, ["Samsung"])
+    calls = device_client.calls
+    assert backend.search_devices(1_160_000, ["samsung "]) is devices
+    assert device_client.calls == calls
+    backend.search_devices(1_240_000, ["Apple"])
+    assert device_client.calls > calls
+
+
+def test_backend_without_cache_searches_every_time():
+    plan_client, device_client = (CountingClient(c) for c in fake_search_clients())
+    backend = AzureSearchBackend(lambda: plan_client, lambda: device_client)
+    backend.search_plans(50, 90000, False)
+    backend.search_plans(50, 90000, False)
+    assert plan_client.calls == 2
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+import buddy_core
+from bench import random_prefs
+from buddy_core import CANDIDATE_TOPN, fetch_plan_candidates, fetch_device_candidates, score_plan, score_device
+from catalog import AzureSearchBackend, LocalCatalogBackend, load_csv_catalog, CATALOG_DIR
+from fakes import fake_search_clients, parse_odata_filter
+from search_filters import plan_filter
+
+SEEDS = range(40)
+
+
+@pytest.fixture(scope="module")
+def clients():
+    return fake_search_clients()
+
+
+@pytest.fixture
+def use_backend(monkeypatch):
+    def use(backend):
+        monkeypatch.setattr(buddy_core, "get_candidate_backend", lambda: backend)
+    return use
+
+
+def filter_backend(clients):
+    plan_client, device_client = clients
+    return AzureSearchBackend(lambda: plan_client, lambda: device_client, mode="filter", min_results=CANDIDATE_TOPN)
+
+
+def assert_same_top(got, expected, score, key):
+    """
+    점수 목록이 같고, N번째 점수보다 낮은 후보는 같은 문서 (N번째 점수 동점은 조회 순서에 따라 다를 수 있음)
+    """
+    got_scores, expected_scores = [score(d) for d in got], [score(d) for d in expected]
+    assert got_scores == pytest.approx(expected_scores)
+    if expected:
+        kth = expected_scores[-1]
+        assert {key(d) for d in got if score(d) < kth} == {key(d) for d in expected if score(d) < kth}
+
+
+def prefs_cases():
+    for seed in SEEDS:
+        yield random_prefs(random.Random(seed))
+    yield buddy_core.UserPrefs(data_gb=None, budget=300000, device_budget=5_000_000)
+    yield buddy_core.UserPrefs(data_gb=0, budget=10000, device_budget=100000, brand_pref=["Xiaomi"])
+
+
+@pytest.mark.parametrize("prefs", list(prefs_cases()))
+def test_filter_mode_plans_match_local_catalog(clients, use_backend, prefs):
+    data_gb = None if prefs.data_unlimited else prefs.data_gb
+    args = (data_gb, prefs.budget, prefs.data_unlimited, CANDIDATE_TOPN)
+    use_backend(LocalCatalogBackend(load_csv_catalog(CATALOG_DIR)))
+    expected = fetch_plan_candidates(*args)
+    use_backend(filter_backend(clients))
+    got = fetch_plan_candidates(*args)
+    target_gb = float(data_gb) if data_gb is not None else None
+    assert_same_top(got, expected, lambda d: score_plan(d, target_gb, float(prefs.budget), prefs.data_unlimited),
+                    lambda d: d["planId"])
+
+
+@pytest.mark.parametrize("prefs", list(prefs_cases()))
+def test_filter_mode_devices_match_local_catalog(clients, use_backend, prefs):
+    args = (prefs.device_budget, prefs.brand_pref, CANDIDATE_TOPN)
+    use_backend(LocalCatalogBackend(load_csv_catalog(CATALOG_DIR)))
+    expected = fetch_device_candidates(*args)
+    use_backend(filter_backend(clients))
+    got = fetch_device_candidates(*args)
+    assert_same_top(got, expected, lambda d: score_device(d, float(prefs.device_budget), prefs.brand_pref),
+                    lambda d: d["sntyNo"])
+
+
+def test_filter_mode_fetches_fewer_documents(clients):
+    backend = filter_backend(clients)
+    cat = load_csv_catalog(CATALOG_DIR)
+    assert len(backend.search_plans(30, 60000, False)) < len(cat.plans)
+    assert len(backend.search_devices(1_000_000, ["Samsung"])) < len(cat.devices)
+
+
+def test_plan_filter_ranges():
+    assert plan_filter(None, 60000, True, None) == "data_unlimited eq true"
+    assert plan_filter(30, 60000, False, None) == ""
+    # 0.6 * 데이터 편차 + 0.4 * 가격 편차(만원) <= 6 이면 포함, 경계 문서가 빠지지 않도록 바깥쪽으로 반올림
+    match = parse_odata_filter(plan_filter(30, 60000, False, 6.0))
+    doc = lambda gb, fee: {"data_gb_value": gb, "monthly_fee_value": fee}
+    assert match(doc(20, 60000)) and match(doc(40, 60000)) and match(doc(30, 210000)) and match(doc(None, 60000))
+    assert not match(doc(45, 60000)) and not match(doc(30, 220000))
+    assert plan_filter(None, 60000, False, 1.0) is None
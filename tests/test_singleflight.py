@@ -0,0 +1,111 @@
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import buddy_core
+import singleflight
+from singleflight import SingleFlight
+
+FOLLOWERS = 4
+
+
+@pytest.fixture
+def roles(monkeypatch):
+    """
+    호출별 역할(leader/follower) 기록. follower가 모두 기다리기 시작한 뒤 leader를 끝내기 위해 사용
+    """
+    seen = []
+    fake = SimpleNamespace(inc=lambda name, value=1, **labels: seen.append(labels["role"]),
+                           span=lambda *a, **kw: contextlib.nullcontext())
+    monkeypatch.setattr(singleflight, "telemetry", fake)
+    return seen
+
+
+def wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def run_concurrently(flight, key, fn, roles):
+    release = threading.Event()
+    calls = []
+
+    def leader_fn():
+        calls.append(1)
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=FOLLOWERS + 1) as pool:
+        leader = pool.submit(flight.do, key, leader_fn)
+        wait_for(lambda: calls)
+        followers = [pool.submit(flight.do, key, leader_fn) for _ in range(FOLLOWERS)]
+        wait_for(lambda: roles.count("follower") == FOLLOWERS)
+        release.set()
+    return leader, followers, calls
+
+
+def test_followers_share_leader_result(roles):
+    flight = SingleFlight("test")
+    result = object()
+    leader, followers, calls = run_concurrently(flight, "k", lambda: result, roles)
+    assert calls == [1]
+    assert leader.result() == (result, False)
+    assert all(f.result() == (result, True) for f in followers)
+    assert flight._calls == {}
+
+
+def test_followers_get_leader_exception(roles):
+    flight = SingleFlight("test")
+    error = ValueError("search failed")
+
+    def fail():
+        raise error
+
+    leader, followers, calls = run_concurrently(flight, "k", fail, roles)
+    assert calls == [1]
+    for f in [leader, *followers]:
+        assert f.exception() is error
+    assert flight._calls == {}
+
+
+def test_sequential_calls_and_other_keys_run_separately():
+    flight = SingleFlight("test")
+    calls = []
+    assert flight.do("a", lambda: calls.append("a") or 1) == (1, False)
+    assert flight.do("a", lambda: calls.append("a") or 2) == (2, False)
+    assert flight.do(("b", 1), lambda: calls.append("b") or 3) == (3, False)
+    assert calls == ["a", "a", "b"]
+
+    with pytest.raises(KeyError):
+        flight.do("a", lambda: {}["x"])
+    # 실패한 뒤에도 같은 키로 다시 실행 가능
+    assert flight.do("a", lambda: 4) == (4, False)
+
+
+def test_coalesced_search_gives_followers_copies(roles):
+    release = threading.Event()
+    docs = [{"planId": "1"}]
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        release.wait(5)
+        return docs
+
+    key = ("plan", "test-coalesced")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(buddy_core.coalesced, key, fetch)
+        wait_for(lambda: fetches)
+        followers = [pool.submit(buddy_core.coalesced, key, fetch) for _ in range(2)]
+        wait_for(lambda: roles.count("follower") == 2)
+        release.set()
+    assert fetches == [1]
+    assert leader.result() is docs
+    a, b = (f.result() for f in followers)
+    assert a == b == docs and a[0] is not docs[0] and a[0] is not b[0]
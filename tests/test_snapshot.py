@@ -0,0 +1,89 @@
+import shutil
+
+import numpy as np
+import pytest
+
+import catalog
+import snapshot
+from catalog import CATALOG_DIR, latest_catalog_files, load_csv_catalog
+from snapshot import SnapshotWatcher, compile_snapshot, open_snapshot
+
+
+def copy_catalog(src_dir, dst_dir, version):
+    _, plan_path, device_path = latest_catalog_files(src_dir)
+    dst_dir.mkdir(exist_ok=True)
+    shutil.copy(plan_path, dst_dir / f"kt_plans_{version}.csv")
+    shutil.copy(device_path, dst_dir / f"kt_devices_{version}.csv")
+    return str(dst_dir)
+
+
+def test_snapshot_matches_csv_catalog(tmp_path):
+    path = compile_snapshot(CATALOG_DIR, str(tmp_path))
+    snap, csv = open_snapshot(path), load_csv_catalog(CATALOG_DIR)
+    assert snap.version == csv.version
+    assert list(snap.plans.docs) == csv.plans.docs
+    assert list(snap.devices.docs) == csv.devices.docs
+    assert snap.plans.docs[-1] == csv.plans.docs[-1] and snap.plans.docs[1:3] == csv.plans.docs[1:3]
+    np.testing.assert_array_equal(snap.plans.monthly_fee, csv.plans.monthly_fee)
+    np.testing.assert_array_equal(snap.plans.data_gb, csv.plans.data_gb)
+    np.testing.assert_array_equal(snap.plans.unlimited, csv.plans.unlimited)
+    np.testing.assert_array_equal(snap.devices.price, csv.devices.price)
+    np.testing.assert_array_equal(snap.devices.weight_g, csv.devices.weight_g)
+    assert snap.devices.brand.tolist() == csv.devices.brand.tolist()
+    assert snap.devices.dedupe_indices.tolist() == csv.devices.dedupe_indices.tolist()
+    # 같은 행은 같은 딕셔너리 (CSV 카탈로그와 동일한 규약)
+    assert snap.plans.docs[0] is snap.plans.docs[0]
+    assert list(tmp_path.iterdir()) == [tmp_path / f"catalog_{snap.version}.bin"]
+
+
+def test_open_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "catalog_000000.bin"
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        open_snapshot(str(path))
+
+
+def test_watcher_switches_to_newer_snapshot(tmp_path):
+    src, out = tmp_path / "docs", tmp_path / "snap"
+    compile_snapshot(copy_catalog(CATALOG_DIR, src, "250101"), str(out))
+    watcher = SnapshotWatcher(str(out), interval=0)
+    old = watcher.get()
+    assert old.version == "250101"
+    assert watcher.get() is old
+
+    compile_snapshot(copy_catalog(CATALOG_DIR, src, "250201"), str(out))
+    assert watcher.get().version == "250201"
+    # 교체 전 Catalog를 참조하던 요청은 계속 사용 가능
+    assert old.plans.docs[0]["planId"]
+
+
+def test_watcher_waits_for_interval(tmp_path):
+    src, out = tmp_path / "docs", tmp_path / "snap"
+    compile_snapshot(copy_catalog(CATALOG_DIR, src, "250101"), str(out))
+    watcher = SnapshotWatcher(str(out), interval=3600)
+    assert watcher.get().version == "250101"
+    compile_snapshot(copy_catalog(CATALOG_DIR, src, "250201"), str(out))
+    assert watcher.get().version == "250101"
+    assert SnapshotWatcher(str(tmp_path / "empty"), interval=0).get() is None
+
+
+def test_csv_catalog_rechecks_version_after_interval(tmp_path, monkeypatch):
+    src = copy_catalog(CATALOG_DIR, tmp_path / "docs", "250101")
+    monkeypatch.setattr(catalog, "CATALOG_RELOAD_INTERVAL", 3600)
+    assert load_csv_catalog(src).version == "250101"
+    copy_catalog(CATALOG_DIR, tmp_path / "docs", "250201")
+    assert load_csv_catalog(src).version == "250101"
+
+    monkeypatch.setattr(catalog, "CATALOG_RELOAD_INTERVAL", 0)
+    assert load_csv_catalog(src).version == "250201"
+
+
+def test_load_catalog_prefers_snapshot_not_older_than_csv(tmp_path, monkeypatch):
+    snap = open_snapshot(compile_snapshot(CATALOG_DIR, str(tmp_path)))
+    monkeypatch.setattr(catalog, "CATALOG_SNAPSHOT", True)
+    monkeypatch.setattr(snapshot, "current_snapshot", lambda: snap)
+    assert catalog.load_catalog() is snap
+
+    stale = catalog.Catalog(version="000101", plans=snap.plans, devices=snap.devices)
+    monkeypatch.setattr(snapshot, "current_snapshot", lambda: stale)
+    assert catalog.load_catalog() is load_csv_catalog(CATALOG_DIR)
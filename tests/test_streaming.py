@@ -0,0 +1,124 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import buddy_core
+from buddy_core import safe_parse_json
+from fakes import FakeOpenAI
+from streaming import RecommendationStreamParser, iter_stream_text, strip_json_blocks
+
+RECS = [
+    {"rank": 1, "plan": {"name": "5G 초이스 {베이직}", "monthly_fee": 90000}, "reasons": ["데이터 \"넉넉\"", "가격 ]적정["]},
+    {"rank": 2, "plan": {"name": "슬림 `플러스`", "monthly_fee": 61000}, "reasons": ["역슬래시 \\ 포함"]},
+    {"rank": 3, "plan": {"name": "Y 무제한", "monthly_fee": 69000}, "reasons": [], "caveats": ["유의: {}"]},
+]
+PAYLOAD = {"explanation": "조건에 맞춰 \"세 가지\"를 골랐어요.\n가격 순이에요 😀", "recommendations": RECS, "alternatives": ["x"]}
+
+
+def fenced_text() -> str:
+    body = {k: v for k, v in PAYLOAD.items() if k != "explanation"}
+    return f"{PAYLOAD['explanation']}\n```json\n{json.dumps(body, ensure_ascii=False, indent=2)}\n```\n추가 설명"
+
+
+def chunks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 64, 10_000])
+def test_fenced_stream_matches_full_parse(size):
+    text = fenced_text()
+    parser = RecommendationStreamParser()
+    emitted = []
+    for chunk in chunks(text, size):
+        emitted += parser.feed(chunk)
+    assert emitted == RECS
+    assert parser.recommendations == safe_parse_json(text)["recommendations"]
+    assert parser.prose.startswith("조건에 맞춰") and "```" not in parser.prose
+
+
+def test_fenced_items_are_emitted_before_block_closes():
+    text = fenced_text()
+    parser = RecommendationStreamParser()
+    first_end = text.index('"rank": 2')
+    parser.feed(text[:first_end])
+    assert parser.recommendations == RECS[:1]
+
+
+def test_last_fenced_block_wins():
+    old = {"recommendations": [{"rank": 9}]}
+    text = f"```json\n{json.dumps(old)}\n```\n수정했어요\n```json\n{json.dumps({'recommendations': RECS})}\n```"
+    parser = RecommendationStreamParser()
+    for chunk in chunks(text, 5):
+        parser.feed(chunk)
+    assert parser.recommendations == RECS == safe_parse_json(text)["recommendations"]
+
+
+@pytest.mark.parametrize("size", [1, 4, 13, 10_000])
+def test_unfenced_stream_and_explanation(size):
+    text = json.dumps(PAYLOAD, ensure_ascii=False)
+    parser = RecommendationStreamParser(fenced=False)
+    explanations = []
+    for chunk in chunks(text, size):
+        parser.feed(chunk)
+        explanations.append(parser.explanation)
+    assert parser.recommendations == RECS
+    assert parser.explanation == PAYLOAD["explanation"]
+    # 중간 값은 항상 최종 설명의 앞부분 (잘린 이스케이프는 다음 조각까지 보류)
+    assert all(PAYLOAD["explanation"].startswith(e) for e in explanations)
+    if size < len(text):
+        assert any(0 < len(e) < len(PAYLOAD["explanation"]) for e in explanations)
+
+
+def test_unfenced_ignores_nested_recommendations_and_explanation():
+    payload = {"meta": {"explanation": "nested", "recommendations": [{"rank": 0}]}, **PAYLOAD}
+    parser = RecommendationStreamParser(fenced=False)
+    for chunk in chunks(json.dumps(payload, ensure_ascii=False), 3):
+        parser.feed(chunk)
+    assert parser.recommendations == RECS
+    assert parser.explanation == PAYLOAD["explanation"]
+
+
+@pytest.mark.parametrize("size", [1, 9, 10_000])
+def test_section_parser_reads_joint_payload(size):
+    device_recs = [{"rank": 1, "device": {"model": "Galaxy"}}, {"rank": 2, "device": {"model": "iPhone"}}]
+    payload = {"plan": PAYLOAD, "device": {"explanation": "단말 설명", "recommendations": device_recs, "alternatives": []}}
+    parsers = {k: RecommendationStreamParser(fenced=False, section=k) for k in ("plan", "device")}
+    for chunk in chunks(json.dumps(payload, ensure_ascii=False), size):
+        for p in parsers.values():
+            p.feed(chunk)
+    assert parsers["plan"].recommendations == RECS
+    assert parsers["plan"].explanation == PAYLOAD["explanation"]
+    assert parsers["device"].recommendations == device_recs
+    assert parsers["device"].explanation == "단말 설명"
+
+
+def test_strip_json_blocks_cuts_unclosed_block():
+    assert strip_json_blocks("설명\n```json\n{\"a\": 1}\n```\n끝") == "설명\n\n끝"
+    assert strip_json_blocks("설명\n```json\n{\"a\":") == "설명"
+
+
+def test_iter_stream_text_skips_empty_choices_and_reports_usage():
+    llm = FakeOpenAI(chunk_chars=5)
+    msgs = [{"role": "user", "content": "hello"}]
+    usages = []
+    stream = llm.chat.completions.create(messages=msgs, stream=True, stream_options={"include_usage": True})
+    first = SimpleNamespace(choices=[], usage=None)
+    text = "".join(iter_stream_text([first, *stream], on_usage=usages.append))
+    full = llm.chat.completions.create(messages=msgs).choices[0].message.content
+    assert text == full
+    assert len(usages) == 1 and usages[0].completion_tokens > 0
+
+
+@pytest.mark.parametrize("structured", [True, False], ids=["structured", "fenced"])
+def test_plan_pipeline_reports_progress_while_streaming(monkeypatch, fake_llm, fake_search, structured):
+    monkeypatch.setattr(buddy_core, "STRUCTURED_OUTPUT", structured)
+    fake_llm.chunk_chars = 8
+    updates = []
+    result = buddy_core.run_plan_pipeline(buddy_core.UserPrefs(notes="OTT 혜택"), on_progress=updates.append)
+    counts = [len(u["recommendations"]) for u in updates]
+    assert counts == sorted(counts) and counts[-1] == 3
+    # 첫 추천 항목이 완성된 시점은 응답이 끝나기 전
+    assert counts.index(1) < len(counts) - 1
+    assert [u["reply"] for u in updates][-1] == result["reply"]
+    assert updates[-1]["recommendations"] == result["parsed"]["recommendations"]
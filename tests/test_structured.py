@@ -0,0 +1,94 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import buddy_core
+from buddy_core import UserPrefs
+from structured import PlanRecommendations, JointRecommendations, ValidationError, parse_structured, response_format
+
+
+def walk_objects(node):
+    if isinstance(node, dict):
+        if node.get("type") == "object" and "properties" in node:
+            yield node
+        for v in node.values():
+            yield from walk_objects(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from walk_objects(v)
+
+
+def test_response_format_is_strict():
+    fmt = response_format(JointRecommendations, "joint_recommendations")
+    assert fmt["type"] == "json_schema" and fmt["json_schema"]["strict"] is True
+    schema = fmt["json_schema"]["schema"]
+    objects = list(walk_objects(schema))
+    assert len(objects) >= 7
+    for obj in objects:
+        assert obj["additionalProperties"] is False
+        assert obj["required"] == list(obj["properties"])
+        assert "title" not in obj
+
+
+def test_parse_structured_validates():
+    ok = {"explanation": "e", "alternatives": [], "recommendations": [
+        {"rank": 1, "plan": {"planId": "1", "name": "n", "monthly_fee": 1000, "data_gb": "10GB", "voice": "무제한"},
+         "monthly_total": 1000, "tco": 12000, "reasons": [], "caveats": []}]}
+    assert parse_structured(PlanRecommendations, json.dumps(ok))["recommendations"][0]["plan"]["monthly_fee"] == 1000.0
+    with pytest.raises(ValidationError):
+        parse_structured(PlanRecommendations, json.dumps({"explanation": "e", "recommendations": [{"rank": "x"}]}))
+
+
+class ScriptedLLM:
+    """
+    앞의 응답들은 scripted 텍스트로 대신하고, 이후는 FakeOpenAI 응답 사용
+    """
+    def __init__(self, llm, replies):
+        self.llm = llm
+        self.replies = list(replies)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        self.requests.append(messages)
+        if self.replies:
+            text = self.replies.pop(0)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+        return self.llm.chat.completions.create(messages=messages, **kwargs)
+
+
+def test_invalid_reply_is_repaired_once(monkeypatch, fake_llm, fake_search):
+    llm = ScriptedLLM(fake_llm, ['{"explanation": "누락"}'])
+    monkeypatch.setattr(buddy_core, "get_openai", lambda: llm)
+    prefs = UserPrefs(notes="OTT")
+    candidates, _ = buddy_core.search_plan_candidates(prefs)
+    result = buddy_core.recommend_plans(prefs, candidates)
+    assert result["errors"] == []
+    assert len(result["parsed"]["recommendations"]) == 3
+    assert len(llm.requests) == 2
+    repair = llm.requests[1]
+    assert repair[-2] == {"role": "assistant", "content": '{"explanation": "누락"}'}
+    assert "JSON 스키마 검증에 실패" in repair[-1]["content"]
+
+
+def test_repair_limit_reports_validation_error(monkeypatch, fake_llm, fake_search):
+    llm = ScriptedLLM(fake_llm, ["{}"] * (buddy_core.STRUCTURED_MAX_REPAIRS + 1))
+    monkeypatch.setattr(buddy_core, "get_openai", lambda: llm)
+    prefs = UserPrefs(notes="OTT")
+    candidates, _ = buddy_core.search_plan_candidates(prefs)
+    result = buddy_core.recommend_plans(prefs, candidates)
+    assert result["parsed"] == {}
+    assert len(result["errors"]) == 1 and "응답 검증 오류" in result["errors"][0]
+
+
+def test_structured_stream_shows_explanation_text(fake_llm, fake_search):
+    fake_llm.chunk_chars = 4
+    updates = []
+    result = buddy_core.run_device_pipeline(UserPrefs(notes="가벼운 폰"), on_progress=updates.append)
+    replies = [u["reply"] for u in updates]
+    assert result["reply"] == result["parsed"]["explanation"] != ""
+    assert replies[-1] == result["reply"]
+    # 응답이 끝나기 전부터 설명 텍스트(JSON이 아닌)를 보여줌
+    partial = [r for r in replies if 0 < len(r) < len(result["reply"])]
+    assert partial and all(result["reply"].startswith(r) for r in partial)
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import buddy_core
+import telemetry
+from buddy_core import UserPrefs
+from telemetry import Registry
+
+
+def test_registry_renders_counters_and_cumulative_histograms():
+    reg = Registry(buckets=(0.1, 1.0))
+    reg.describe("x_total", "counter", "테스트 카운터")
+    reg.inc("x_total", kind="plan")
+    reg.inc("x_total", 2, kind="plan")
+    reg.inc("x_total", kind=None)
+    for v in (0.05, 0.5, 5.0):
+        reg.observe("y_seconds", v, stage="llm")
+    lines = reg.render().splitlines()
+    assert lines[:4] == ["# HELP x_total 테스트 카운터", "# TYPE x_total counter", "x_total 1", 'x_total{kind="plan"} 3']
+    assert 'y_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+    assert 'y_seconds_bucket{stage="llm",le="1"} 2' in lines
+    assert 'y_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+    assert 'y_seconds_sum{stage="llm"} 5.550000' in lines
+    assert 'y_seconds_count{stage="llm"} 3' in lines
+
+
+def test_trace_collects_from_bound_threads():
+    def work(kind):
+        with telemetry.span("search", kind=kind):
+            telemetry.inc("buddy_search_docs_total", 5, kind=kind)
+        telemetry.record_cache("search", kind == "plan")
+
+    with telemetry.trace("test") as t:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(telemetry.bind(work), ["plan", "device"]))
+        telemetry.record_usage(SimpleNamespace(prompt_tokens=2000, completion_tokens=100,
+                                               prompt_tokens_details=SimpleNamespace(cached_tokens=1536)), kind="joint")
+    assert telemetry.current_trace() is None
+    summary = t.summary()
+    assert sorted(s["kind"] for s in summary["spans"]) == ["device", "plan"]
+    assert summary["search_docs"] == {"plan": 5, "device": 5}
+    assert summary["cache"]["search"] == {"hit": 1, "miss": 1, "hit_ratio": 0.5}
+    assert summary["tokens"]["joint"] == {"prompt": 2000, "completion": 100, "cached": 1536, "cached_ratio": 0.768}
+    assert summary["total_ms"] > 0
+
+
+def test_unbound_thread_does_not_see_trace():
+    with telemetry.trace("test") as t:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(telemetry.inc, "buddy_search_docs_total", 1, kind="plan").result()
+    assert t.summary()["search_docs"] == {}
+
+
+def test_recommend_trace_has_stage_spans_and_tokens(fake_llm, fake_search):
+    with telemetry.trace("test") as t:
+        buddy_core.recommend(UserPrefs(notes="넷플릭스 혜택"))
+    summary = t.summary()
+    stages = {s["name"] for s in summary["spans"]}
+    assert {"search", "score", "llm"} <= stages
+    assert set(summary["search_docs"]) == {"plan", "device"}
+    assert all(v["prompt"] > 0 and v["completion"] > 0 for v in summary["tokens"].values())
+
+
+def test_write_prometheus(tmp_path):
+    telemetry.inc("buddy_llm_calls_total", kind="plan")
+    path = tmp_path / "buddy.prom"
+    telemetry.write_prometheus(str(path))
+    text = path.read_text(encoding="utf-8")
+    assert "# TYPE buddy_llm_calls_total counter" in text
+    assert list(tmp_path.iterdir()) == [path]